@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+AgriVoice Normalization Backfill
+Fills quantity_kg and price_per_kg_inr for products stored before normalization existed
+
+Usage (from the backend directory):
+    python backfill_normalization.py [--batch-size 500] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from utils.normalize import normalize_product_info
+from utils.storage import create_storage_client
+
+async def backfill(batch_size: int, dry_run: bool) -> None:
+    """Normalize every product missing canonical quantity/price columns"""
+    storage_client = create_storage_client()
+
+    after_id = ""
+    scanned = updated = unparsed = 0
+    started = time.perf_counter()
+
+    while True:
+        # Keyset pagination visits each row once, even rows that never normalize
+        rows = await storage_client.get_products_for_normalization(after_id=after_id, limit=batch_size)
+        if not rows:
+            break
+
+        updates = []
+        for row in rows:
+            product_info = row["product_info"]
+            if isinstance(product_info, str):
+                product_info = json.loads(product_info)
+            normalized = normalize_product_info(product_info or {}, row.get("transcribed_text", ""))
+            if normalized["quantity_kg"] is None and normalized["price_per_kg_inr"] is None:
+                unparsed += 1
+                continue
+            updates.append({"product_id": row["id"], **normalized})
+
+        if updates and not dry_run:
+            updated += await storage_client.bulk_update_product_normalization(updates)
+        elif dry_run:
+            updated += len(updates)
+
+        scanned += len(rows)
+        after_id = rows[-1]["id"]
+        rate = scanned / max(time.perf_counter() - started, 1e-9)
+        print(f"📦 Scanned {scanned} products, normalized {updated}, unparsed {unparsed} ({rate:.0f} rows/s)")
+
+    print(f"✅ Backfill {'dry run ' if dry_run else ''}complete: {updated} of {scanned} products normalized")
+
+def main():
+    """Run the normalization backfill"""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Backfill normalized quantity and price columns")
+    parser.add_argument("--batch-size", type=int, default=500, help="Products per page and bulk update")
+    parser.add_argument("--dry-run", action="store_true", help="Parse rows without writing")
+    args = parser.parse_args()
+
+    asyncio.run(backfill(args.batch_size, args.dry_run))
+
+if __name__ == "__main__":
+    main()
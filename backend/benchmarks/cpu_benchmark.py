@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+AgriVoice CPU Micro-Benchmarks
+Times the pure-CPU steps of a voice request across all languages, against a saved baseline
+
+Covers prompt building, Gemini response parsing, base64 audio decoding and
+validation, request validation, quantity/price normalization and response
+assembly and serialization. No network, Gemini or database is involved.
+Each benchmark is calibrated to a loop count that runs for at least
+--min-time, then timed --runs times with the garbage collector off (as
+timeit does); the median time per call is reported.
+
+Usage (from the backend directory):
+    python benchmarks/cpu_benchmark.py run
+    python benchmarks/cpu_benchmark.py run --filter prompt. --save-baseline
+    python benchmarks/cpu_benchmark.py compare
+    python benchmarks/cpu_benchmark.py compare --current results.json --threshold 0.15
+"""
+
+import argparse
+import base64
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Callable, Tuple
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+# The REST transport builds no SDK objects and makes no calls until used
+os.environ.setdefault("GEMINI_API_ENDPOINT", "http://127.0.0.1:9")
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from models.product import VoiceProcessRequest
+from utils.ai_client import GeminiAIClient
+from utils.audio_tools import AudioProcessor
+from utils.normalize import normalize_product_info
+from utils.voice_pipeline import build_voice_response
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baselines" / "cpu_benchmark.json"
+AUDIO_SIZES = {"16k": 16 * 1024, "256k": 256 * 1024, "1m": 1024 * 1024, "5m": 5 * 1024 * 1024}
+
+def benchmark_cases() -> List[Tuple[str, Callable[[], Any]]]:
+    """(name, zero-argument callable) for every benchmark"""
+    ai = GeminiAIClient()
+    audio = AudioProcessor()
+    cases = []
+
+    for language in audio.get_supported_languages():
+        text = audio._get_mock_transcription(language)
+        product_info = {"product": "tomato", "quantity": "10 kg", "price": "₹40", "price_per_unit": "₹40/kg"}
+        suggestions = {
+            "description": f"{text} {text}",
+            "price_range": "₹35-45 per kg",
+            "where_to_sell": text,
+            "selling_tip": f"{text} {text} {text}"
+        }
+        improvements = {key: text for key in ("pricing_suggestions", "presentation_tips",
+                                              "marketing_ideas", "alternative_channels")}
+        # Gemini usually wraps the JSON in a fenced block with some prose around it
+        extraction_reply = f"Here is the extracted information:\n```json\n{json.dumps(product_info, ensure_ascii=False)}\n```"
+        suggestions_reply = f"```json\n{json.dumps(suggestions, ensure_ascii=False, indent=2)}\n```"
+        improvements_reply = f"```json\n{json.dumps(improvements, ensure_ascii=False, indent=2)}\n```"
+        text_body = {"transcribed_text": text, "language": language, "farmer_mobile": "9876543210"}
+        stored = {"id": "8c1f5d1e-4a37-4c0e-9a36-2f5d1c9b7e10"}
+
+        def render_response(language=language, text=text, product_info=product_info, suggestions=suggestions,
+                            stored=stored):
+            response = build_voice_response(text, language, product_info, suggestions, stored, [])
+            return JSONResponse(jsonable_encoder(response)).body
+
+        cases += [
+            (f"prompt.extraction[{language}]", lambda t=text, l=language: ai._create_extraction_prompt(t, l)),
+            (f"prompt.suggestions[{language}]",
+             lambda p=product_info, t=text, l=language: ai._create_suggestions_prompt(p, t, l)),
+            (f"prompt.improvement[{language}]", lambda p=product_info, l=language: ai._create_improvement_prompt(p, l)),
+            (f"parse.extraction[{language}]", lambda r=extraction_reply, t=text: ai._parse_product_extraction(r, t)),
+            (f"parse.suggestions[{language}]", lambda r=suggestions_reply, l=language: ai._parse_ai_suggestions(r, l)),
+            (f"parse.improvement[{language}]",
+             lambda r=improvements_reply, l=language: ai._parse_improvement_suggestions(r, l)),
+            (f"parse.fallback[{language}]", lambda t=text, l=language: ai._parse_ai_suggestions(t, l)),
+            (f"request.validate_text[{language}]", lambda b=text_body: VoiceProcessRequest(**b)),
+            (f"normalize.product_info[{language}]", lambda p=product_info, t=text: normalize_product_info(p, t)),
+            (f"response.render[{language}]", render_response)
+        ]
+
+    rng = random.Random(0)
+    for label, size in AUDIO_SIZES.items():
+        encoded = base64.b64encode(rng.randbytes(size)).decode("ascii")
+        body = {"audio_data": encoded, "language": "hi", "farmer_mobile": "9876543210"}
+
+        def decode_and_validate(encoded=encoded):
+            return audio.validate_audio_format(base64.b64decode(encoded))
+
+        cases += [
+            (f"audio.decode_validate[{label}]", decode_and_validate),
+            (f"request.validate_audio[{label}]", lambda b=body: VoiceProcessRequest(**b))
+        ]
+    return cases
+
+def time_case(func: Callable[[], Any], runs: int, min_time: float) -> Dict[str, Any]:
+    """Calibrate a loop count, then time runs of it; times are per call in microseconds"""
+    loops = 1
+    while True:
+        elapsed = _time_loops(func, loops)
+        if elapsed >= min_time or loops >= 10 ** 7:
+            break
+        loops *= 10 if elapsed < min_time / 10 else 2
+
+    samples = [_time_loops(func, loops) / loops * 1e6 for _ in range(runs)]
+    return {
+        "loops": loops,
+        "median_us": round(statistics.median(samples), 4),
+        "min_us": round(min(samples), 4),
+        "stdev_us": round(statistics.stdev(samples), 4) if len(samples) > 1 else 0.0
+    }
+
+def _time_loops(func: Callable[[], Any], loops: int) -> float:
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        return time.perf_counter() - started
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+def environment() -> Dict[str, Any]:
+    """Where the numbers came from; comparisons across machines are only indicative"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=backend_dir,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    }
+
+def run_benchmarks(args) -> Dict[str, Any]:
+    """Run every benchmark whose name contains one of the --filter strings"""
+    results = {}
+    for name, func in benchmark_cases():
+        if args.filter and not any(f in name for f in args.filter):
+            continue
+        results[name] = time_case(func, args.runs, args.min_time)
+        print(f"  {name:<40} {results[name]['median_us']:>12.3f}µs  ±{results[name]['stdev_us']:.3f}")
+    return {"environment": environment(), "runs": args.runs, "benchmarks": results}
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """Print each benchmark's change against the baseline and return the regressed names"""
+    regressions = []
+    base_env, current_env = baseline["environment"], current["environment"]
+    if (base_env["python"], base_env["machine"]) != (current_env["python"], current_env["machine"]):
+        print(f"⚠️  Baseline is from Python {base_env['python']} on {base_env['machine']}, "
+              f"this run is Python {current_env['python']} on {current_env['machine']}")
+
+    print(f"\n{'benchmark':<40} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, result in current["benchmarks"].items():
+        previous = baseline["benchmarks"].get(name)
+        if previous is None:
+            print(f"{name:<40} {'-':>12} {result['median_us']:>10.3f}µs {'new':>9}")
+            continue
+        change = result["median_us"] / previous["median_us"] - 1 if previous["median_us"] else 0.0
+        # A change inside the run-to-run noise of either side is not a regression
+        noise = max(previous["stdev_us"], result["stdev_us"]) / previous["median_us"] if previous["median_us"] else 0.0
+        marker = ""
+        if change > max(threshold, 2 * noise):
+            marker = " ❌"
+            regressions.append(name)
+        elif change < -threshold:
+            marker = " ✅"
+        print(f"{name:<40} {previous['median_us']:>10.3f}µs {result['median_us']:>10.3f}µs {change:>+8.1%}{marker}")
+    return regressions
+
+def main():
+    """Run the CPU benchmarks or compare them with a baseline"""
+    parser = argparse.ArgumentParser(description="Benchmark AgriVoice's per-request CPU work")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    def add_run_options(subparser):
+        subparser.add_argument("--filter", action="append", help="Only run benchmarks containing this (repeatable)")
+        subparser.add_argument("--runs", type=int, default=7, help="Timed runs per benchmark")
+        subparser.add_argument("--min-time", type=float, default=0.05, help="Seconds each run lasts at least")
+
+    run_parser = subcommands.add_parser("run", help="Run the benchmarks")
+    add_run_options(run_parser)
+    run_parser.add_argument("--output", help="Write results as JSON to this file")
+    run_parser.add_argument("--save-baseline", nargs="?", const=str(DEFAULT_BASELINE), metavar="PATH",
+                            help=f"Also save the results as the baseline (default: {DEFAULT_BASELINE.name})")
+
+    compare_parser = subcommands.add_parser("compare", help="Run (or load) results and compare with a baseline")
+    add_run_options(compare_parser)
+    compare_parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline results file")
+    compare_parser.add_argument("--current", help="Compare this results file instead of running now")
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="Slowdown (fraction) that counts as a regression")
+    args = parser.parse_args()
+
+    if args.command == "compare" and args.current:
+        with open(args.current, encoding="utf-8") as f:
+            current = json.load(f)
+    else:
+        print("⏱️  Running CPU benchmarks")
+        current = run_benchmarks(args)
+
+    if args.command == "run":
+        for path in filter(None, (args.output, args.save_baseline)):
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(current, f, indent=2, ensure_ascii=False)
+        if args.save_baseline:
+            print(f"\n💾 Baseline saved to {args.save_baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"❌ No baseline at {args.baseline}; create one with: run --save-baseline")
+        sys.exit(2)
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0%}")
+        sys.exit(1)
+    print("\n✅ No CPU regressions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+AgriVoice Load Test
+Drives open-loop traffic through /api/complete-voice-process against local Gemini and Supabase stubs
+
+The server is started as a subprocess (start_server.py) pointed at stub
+servers whose latency and error rates are set on the command line.
+Requests arrive as a Poisson process at --rps regardless of how fast the
+server answers, and latency is measured from each request's scheduled
+arrival, so queueing inside the client is not hidden.
+
+Usage (from the backend directory):
+    python benchmarks/load_test.py --rps 20 --duration 60 --output results.json
+    python benchmarks/load_test.py --languages hi:4,en:2,ta:1 --payloads text:6,audio-16k:3,audio-256k:1
+    python benchmarks/load_test.py --storage sqlite --gemini-error-rate 0.05 --baseline results.json
+    python benchmarks/load_test.py --replay cassettes --time-scale 0.5
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
+
+import httpx
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from stub_servers import LatencyProfile, start_gemini_stub, start_supabase_stub
+
+ROUTE = "/api/complete-voice-process"
+SIZE_SUFFIXES = {"k": 1024, "m": 1024 * 1024}
+
+TEXTS = {
+    "en": "I have 10 kg of fresh tomatoes, selling at ₹40 per kg",
+    "hi": "मेरे पास 10 किलो ताजे टमाटर हैं, ₹40 प्रति किलो में बेच रहा हूं",
+    "ta": "என்னிடம் 10 கிலோ புதிய தக்காளிகள் உள்ளன, கிலோவுக்கு ₹40 விற்கிறேன்",
+    "te": "నా వద్ద 10 కిలోల తాజా టమాటాలు ఉన్నాయి, కిలోకి ₹40 చొప్పున అమ్ముతున్నాను",
+    "kn": "ನನ್ನ ಬಳಿ 10 ಕಿಲೋ ತಾಜಾ ಟೊಮೇಟೊಗಳಿವೆ, ಕಿಲೋಗೆ ₹40 ರಂತೆ ಮಾರಾಟ ಮಾಡುತ್ತಿದ್ದೇನೆ",
+    "ml": "എന്റെ കൈയിൽ 10 കിലോ പുതിയ തക്കാളികൾ ഉണ്ട്, കിലോയ്ക്ക് ₹40 നിരക്കിൽ വിൽക്കുന്നു",
+    "gu": "મારી પાસે 10 કિલો તાજા ટામેટા છે, કિલો દીઠ ₹40 માં વેચું છું",
+    "mr": "माझ्याकडे 10 किलो ताजे टोमॅटो आहेत, किलोला ₹40 दराने विकत आहे",
+    "bn": "আমার কাছে 10 কিলো তাজা টমেটো আছে, কিলো প্রতি ₹40 দরে বিক্রি করছি",
+    "or": "ମୋ ପାଖରେ 10 କିଲୋ ତାଜା ଟମାଟୋ ଅଛି, କିଲୋ ପିଛା ₹40 ଦରରେ ବିକ୍ରି କରୁଛି",
+    "pa": "ਮੇਰੇ ਕੋਲ 10 ਕਿਲੋ ਤਾਜ਼ੇ ਟਮਾਟਰ ਹਨ, ਕਿਲੋ ਪ੍ਰਤੀ ₹40 ਵਿੱਚ ਵੇਚ ਰਿਹਾ ਹਾਂ"
+}
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    """Parse "hi:4,en:2,ta" into (name, weight) pairs; a missing weight is 1"""
+    mix = []
+    for item in spec.split(","):
+        name, _, weight = item.strip().partition(":")
+        if name:
+            mix.append((name, float(weight or 1)))
+    if not mix:
+        raise argparse.ArgumentTypeError(f"empty mix: {spec!r}")
+    return mix
+
+def parse_size(size: str) -> int:
+    """Parse "16k" or "1m" into bytes"""
+    size = size.lower()
+    if size[-1:] in SIZE_SUFFIXES:
+        return int(float(size[:-1]) * SIZE_SUFFIXES[size[-1]])
+    return int(size)
+
+def build_payloads(payload_mix: List[Tuple[str, float]]) -> Dict[str, Dict[str, Any]]:
+    """Request body template per payload kind: "text" or "audio-<size>" of random audio bytes"""
+    templates = {}
+    rng = random.Random(0)
+    for kind, _ in payload_mix:
+        if kind == "text":
+            templates[kind] = {}
+        elif kind.startswith("audio-"):
+            audio = rng.randbytes(parse_size(kind[len("audio-"):]))
+            templates[kind] = {"audio_data": base64.b64encode(audio).decode("ascii")}
+        else:
+            raise SystemExit(f"❌ Unknown payload kind {kind!r}, use text or audio-<size> (e.g. audio-16k)")
+    return templates
+
+def percentiles(samples: List[float]) -> Dict[str, Any]:
+    """Latency summary in milliseconds (nearest-rank percentiles)"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def rank(p: float) -> float:
+        return round(ordered[max(int(round(p * len(ordered))) - 1, 0)] * 1000, 2)
+
+    return {
+        "count": len(ordered),
+        "p50_ms": rank(0.50),
+        "p95_ms": rank(0.95),
+        "p99_ms": rank(0.99),
+        "max_ms": round(ordered[-1] * 1000, 2),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2)
+    }
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_app(args, services: Dict[str, str], tmp: str) -> Tuple[subprocess.Popen, str]:
+    """Start start_server.py with the service settings and wait until /api/health answers"""
+    port = args.port or free_port()
+    env = dict(
+        os.environ,
+        HOST="127.0.0.1",
+        PORT=str(port),
+        DEBUG="False",
+        SERVER_MODE=args.server_mode,
+        GEMINI_API_KEY="stub-key",
+        STORAGE_BACKEND=args.storage,
+        # The test measures the pipeline, not the per-farmer rate limits
+        ADMISSION_RATE_PER_MINUTE="1000000",
+        ADMISSION_DEMO_RATE_PER_MINUTE="1000000",
+        ADMISSION_BURST="1000000"
+    )
+    if args.workers:
+        env["WEB_CONCURRENCY"] = str(args.workers)
+    env.update(services)
+    if args.storage == "sqlite":
+        env["SQLITE_PATH"] = os.path.join(tmp, "load_test.db")
+
+    log = open(os.path.join(tmp, "server.log"), "w")
+    process = subprocess.Popen([sys.executable, "start_server.py"], cwd=backend_dir, env=env,
+                               stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            if httpx.get(f"{base_url}/api/health", timeout=1).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+
+    process.kill()
+    log.close()
+    with open(os.path.join(tmp, "server.log")) as f:
+        print(f.read()[-3000:])
+    raise SystemExit("❌ Server did not become healthy")
+
+def stop_app(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=40)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+async def drive(base_url: str, args, languages, payload_mix, templates) -> Dict[str, Any]:
+    """Send Poisson arrivals for the test duration and collect per-request results"""
+    rng = random.Random(args.seed)
+    language_names, language_weights = zip(*languages)
+    payload_names, payload_weights = zip(*payload_mix)
+    results: List[Dict[str, Any]] = []
+
+    async def one(client: httpx.AsyncClient, scheduled: float, language: str, kind: str, farmer: str):
+        body = {**templates[kind], "language": language, "farmer_mobile": farmer}
+        if kind == "text":
+            body["transcribed_text"] = TEXTS.get(language, TEXTS["en"])
+        if args.latency_budget_ms:
+            body["latency_budget_ms"] = args.latency_budget_ms
+        result = {"language": language, "payload": kind}
+        try:
+            response = await client.post(ROUTE, json=body)
+            result["status"] = response.status_code
+            if response.status_code == 200:
+                result["partial"] = bool(response.json().get("partial"))
+        except httpx.TimeoutException:
+            result["status"] = "timeout"
+        except httpx.HTTPError as e:
+            result["status"] = type(e).__name__
+        result["latency"] = time.perf_counter() - scheduled
+        results.append(result)
+
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        tasks = []
+        started = time.perf_counter()
+        next_arrival = started
+        while next_arrival - started < args.duration:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            language = rng.choices(language_names, language_weights)[0]
+            kind = rng.choices(payload_names, payload_weights)[0]
+            farmer = f"9{rng.randrange(args.farmers):09d}"
+            tasks.append(asyncio.create_task(one(client, next_arrival, language, kind, farmer)))
+            next_arrival += rng.expovariate(args.rps)
+        sent_seconds = time.perf_counter() - started
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    return {"results": results, "sent_seconds": sent_seconds, "elapsed_seconds": elapsed}
+
+def summarize(run: Dict[str, Any]) -> Dict[str, Any]:
+    """Overall and per-language / per-payload latency, throughput and status counts"""
+    results = run["results"]
+    ok = [r for r in results if r["status"] == 200]
+    by_language = defaultdict(list)
+    by_payload = defaultdict(list)
+    for r in ok:
+        by_language[r["language"]].append(r["latency"])
+        by_payload[r["payload"]].append(r["latency"])
+
+    return {
+        "requests": len(results),
+        "offered_rps": round(len(results) / run["sent_seconds"], 2) if run["sent_seconds"] else 0.0,
+        "achieved_rps": round(len(ok) / run["elapsed_seconds"], 2) if run["elapsed_seconds"] else 0.0,
+        "error_rate": round(1 - len(ok) / len(results), 4) if results else 0.0,
+        "partial_responses": sum(1 for r in ok if r.get("partial")),
+        "status_counts": dict(Counter(str(r["status"]) for r in results)),
+        "latency": percentiles([r["latency"] for r in ok]),
+        "latency_all": percentiles([r["latency"] for r in results]),
+        "by_language": {name: percentiles(samples) for name, samples in sorted(by_language.items())},
+        "by_payload": {name: percentiles(samples) for name, samples in sorted(by_payload.items())}
+    }
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print the change in headline numbers against an earlier report"""
+    print("\n🔁 Against baseline")
+    pairs = [("achieved_rps", report["summary"]["achieved_rps"], baseline["summary"]["achieved_rps"]),
+             ("error_rate", report["summary"]["error_rate"], baseline["summary"]["error_rate"])]
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        pairs.append((key, report["summary"]["latency"].get(key), baseline["summary"]["latency"].get(key)))
+    for name, current, previous in pairs:
+        if current is None or previous is None:
+            continue
+        change = f"{(current - previous) / previous * 100:+.1f}%" if previous else "n/a"
+        print(f"  {name:<14} {previous:>10} -> {current:<10} ({change})")
+
+def main():
+    """Run the load test"""
+    parser = argparse.ArgumentParser(description="Load test /api/complete-voice-process against local stubs")
+    parser.add_argument("--rps", type=float, default=10, help="Mean arrival rate (requests per second)")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to send traffic for")
+    parser.add_argument("--languages", type=parse_mix, default=parse_mix("hi:4,en:2,ta:1,te:1,bn:1,mr:1"),
+                        help="Weighted language mix, e.g. hi:4,en:2,ta:1")
+    parser.add_argument("--payloads", type=parse_mix, default=parse_mix("text:6,audio-16k:3,audio-256k:1"),
+                        help="Weighted payload mix: text or audio-<size>, e.g. text:6,audio-16k:3")
+    parser.add_argument("--farmers", type=int, default=200, help="Distinct farmer_mobile values to spread load over")
+    parser.add_argument("--latency-budget-ms", type=int, help="latency_budget_ms sent with each request")
+    parser.add_argument("--timeout", type=float, default=60, help="Client timeout per request in seconds")
+    parser.add_argument("--max-connections", type=int, default=500, help="Client connection pool size")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for arrivals and the request mix")
+    parser.add_argument("--storage", choices=["supabase", "sqlite"], default="supabase",
+                        help="supabase uses the PostgREST stub, sqlite a temporary database file")
+    parser.add_argument("--server-mode", choices=["development", "production"], default="development")
+    parser.add_argument("--workers", type=int, help="WEB_CONCURRENCY for --server-mode production")
+    parser.add_argument("--port", type=int, help="Port for the app (default: a free port)")
+    parser.add_argument("--startup-timeout", type=float, default=30)
+    parser.add_argument("--gemini-latency-ms", type=float, default=800, help="Median Gemini latency")
+    parser.add_argument("--gemini-sigma", type=float, default=0.5, help="Lognormal spread of Gemini latency")
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0, help="Fraction of Gemini calls that fail")
+    parser.add_argument("--db-latency-ms", type=float, default=20, help="Median Supabase latency")
+    parser.add_argument("--db-sigma", type=float, default=0.3, help="Lognormal spread of Supabase latency")
+    parser.add_argument("--db-error-rate", type=float, default=0.0, help="Fraction of Supabase calls that fail")
+    parser.add_argument("--replay", metavar="DIR", help="Replay cassettes from DIR instead of starting the stubs")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiplier on replayed latencies")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    parser.add_argument("--baseline", help="Earlier --output report to compare against")
+    args = parser.parse_args()
+
+    templates = build_payloads(args.payloads)
+    gemini = supabase = None
+    if args.replay:
+        # Recorded Gemini and Supabase traffic stands in for the stubs
+        services = {"CASSETTE_MODE": "replay", "CASSETTE_DIR": os.path.abspath(args.replay),
+                    "CASSETTE_TIME_SCALE": str(args.time_scale)}
+    else:
+        gemini = start_gemini_stub(LatencyProfile(args.gemini_latency_ms, args.gemini_sigma,
+                                                  args.gemini_error_rate, seed=args.seed))
+        services = {"GEMINI_API_ENDPOINT": gemini.url}
+        if args.storage == "supabase":
+            supabase = start_supabase_stub(LatencyProfile(args.db_latency_ms, args.db_sigma,
+                                                          args.db_error_rate, seed=args.seed))
+            services.update(SUPABASE_URL=supabase.url, SUPABASE_ANON_KEY="stub.stub.stub")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        process, base_url = start_app(args, services, tmp)
+        print(f"🚀 {args.rps} req/s for {args.duration}s against {base_url} ({args.storage}, {args.server_mode})")
+        try:
+            run = asyncio.run(drive(base_url, args, args.languages, args.payloads, templates))
+            cassettes = httpx.get(f"{base_url}/api/maintenance/cassettes").json()["cassettes"] if args.replay else None
+        finally:
+            stop_app(process)
+            for stub in (gemini, supabase):
+                if stub:
+                    stub.stop()
+
+    report = {
+        "route": ROUTE,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {
+            "rps": args.rps, "duration": args.duration, "seed": args.seed, "farmers": args.farmers,
+            "languages": dict(args.languages), "payloads": dict(args.payloads),
+            "latency_budget_ms": args.latency_budget_ms, "storage": args.storage,
+            "server_mode": args.server_mode, "workers": args.workers,
+            "replay": args.replay, "time_scale": args.time_scale if args.replay else None
+        },
+        "summary": summarize(run),
+        "stubs": {"gemini": gemini.get_stats() if gemini else None,
+                  "supabase": supabase.get_stats() if supabase else None},
+        "cassettes": cassettes
+    }
+
+    summary = report["summary"]
+    latency = summary["latency"]
+    print(f"\n📊 {summary['requests']} requests | offered {summary['offered_rps']} req/s | "
+          f"achieved {summary['achieved_rps']} req/s | errors {summary['error_rate'] * 100:.2f}%")
+    if latency["count"]:
+        print(f"  latency  p50={latency['p50_ms']}ms p95={latency['p95_ms']}ms "
+              f"p99={latency['p99_ms']}ms max={latency['max_ms']}ms")
+    print(f"  statuses {summary['status_counts']} | partial {summary['partial_responses']}")
+    for group in ("by_language", "by_payload"):
+        print(f"\n  {group.replace('_', ' ')}")
+        for name, stats in summary[group].items():
+            print(f"    {name:<12} n={stats['count']:<6} p50={stats['p50_ms']}ms "
+                  f"p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+AgriVoice Startup Benchmark
+Measures how long `import main` and the lifespan startup take, using python -X importtime
+
+Usage (from the backend directory):
+    python benchmarks/startup_benchmark.py --runs 5 --top 15
+    python benchmarks/startup_benchmark.py --max-import-ms 400   # fail if import regresses
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, Any, List
+
+backend_dir = Path(__file__).resolve().parent.parent
+
+# Lines look like "import time:       145 |        892 |   package.module"
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+# Runs in a fresh interpreter: import the app, then run the lifespan startup
+STARTUP_SCRIPT = """
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def startup():
+    async with main.app.router.lifespan_context(main.app):
+        return time.perf_counter()
+
+ready = asyncio.run(startup())
+print(json.dumps({"import_ms": (imported - started) * 1000, "startup_ms": (ready - imported) * 1000}))
+"""
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Parse python -X importtime output into per-module timings"""
+    modules = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append({
+                "module": name,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+                "depth": len(indent) // 2
+            })
+    return modules
+
+def run_once() -> Dict[str, Any]:
+    """Start a fresh interpreter and time the import and lifespan startup"""
+    env = dict(os.environ, STORAGE_BACKEND=os.getenv("STORAGE_BACKEND", "sqlite"))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT],
+        cwd=backend_dir, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "startup failed")
+
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["modules"] = parse_importtime(result.stderr)
+    return timings
+
+def main():
+    """Run the startup benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark AgriVoice import and startup time")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to start")
+    parser.add_argument("--top", type=int, default=15, help="Slowest top-level imports to report")
+    parser.add_argument("--max-import-ms", type=float, help="Exit with an error if the median import exceeds this")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    import_ms = [run["import_ms"] for run in runs]
+    startup_ms = [run["startup_ms"] for run in runs]
+
+    # Top-level imports (depth 0 and 1) from the last run, slowest first
+    slowest = sorted((m for m in runs[-1]["modules"] if m["depth"] <= 1),
+                     key=lambda m: m["cumulative_ms"], reverse=True)[:args.top]
+
+    report = {
+        "runs": args.runs,
+        "import_main_ms": {"median": round(statistics.median(import_ms), 2), "max": round(max(import_ms), 2)},
+        "lifespan_startup_ms": {"median": round(statistics.median(startup_ms), 2), "max": round(max(startup_ms), 2)},
+        "slowest_imports": slowest
+    }
+
+    print(f"📊 import main        median={report['import_main_ms']['median']}ms max={report['import_main_ms']['max']}ms")
+    print(f"📊 lifespan startup   median={report['lifespan_startup_ms']['median']}ms max={report['lifespan_startup_ms']['max']}ms")
+    print("\n🐢 Slowest imports (cumulative)")
+    for module in slowest:
+        print(f"  {module['cumulative_ms']:>9.2f}ms  {module['module']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.max_import_ms is not None and report["import_main_ms"]["median"] > args.max_import_ms:
+        print(f"\n❌ import main took {report['import_main_ms']['median']}ms, over the {args.max_import_ms}ms budget")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
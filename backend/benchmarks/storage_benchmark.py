@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+AgriVoice Storage Benchmark
+Compares read/write latency of the embedded SQLite and remote Supabase backends
+
+Usage (from the backend directory):
+    python benchmarks/storage_benchmark.py --backend sqlite --products 2000
+    python benchmarks/storage_benchmark.py --backend sqlite --backend supabase
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Any, List
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from utils.storage import create_storage_client
+
+FARMERS = [f"98765{i:05d}" for i in range(50)]
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Summarize latency samples in milliseconds"""
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "p50_ms": round(statistics.median(ordered) * 1000, 4),
+        "p95_ms": round(ordered[int(len(ordered) * 0.95) - 1] * 1000, 4),
+        "p99_ms": round(ordered[int(len(ordered) * 0.99) - 1] * 1000, 4),
+        "max_ms": round(ordered[-1] * 1000, 4),
+    }
+
+async def run_backend(backend: str, products: int, reads: int) -> Dict[str, Any]:
+    """Benchmark writes and reads against one storage backend"""
+    client = create_storage_client(backend)
+
+    writes = []
+    for i in range(products):
+        start = time.perf_counter()
+        await client.store_product(
+            product_info={"product": "tomato", "quantity": f"{i % 50 + 1} kg", "price": "₹40"},
+            ai_suggestions={"description": "Fresh tomatoes", "price_range": "₹35-45"},
+            transcribed_text="I have fresh tomatoes",
+            language="en",
+            farmer_mobile=FARMERS[i % len(FARMERS)]
+        )
+        writes.append(time.perf_counter() - start)
+
+    lookups = []
+    for i in range(reads):
+        start = time.perf_counter()
+        await client.get_products_by_mobile(FARMERS[i % len(FARMERS)])
+        lookups.append(time.perf_counter() - start)
+
+    concurrent_start = time.perf_counter()
+    await asyncio.gather(*(client.get_products_by_mobile(mobile) for mobile in FARMERS))
+    concurrent_elapsed = time.perf_counter() - concurrent_start
+
+    if hasattr(client, "close"):
+        client.close()
+
+    return {
+        "backend": backend,
+        "connection": client.get_connection_status(),
+        "store_product": summarize(writes),
+        "get_products_by_mobile": summarize(lookups),
+        "concurrent_reads_total_ms": round(concurrent_elapsed * 1000, 4),
+    }
+
+def main():
+    """Run the storage benchmark"""
+    parser = argparse.ArgumentParser(description="Benchmark AgriVoice storage backends")
+    parser.add_argument("--backend", action="append", choices=["sqlite", "supabase"],
+                        help="Backend to benchmark (repeatable, default: sqlite)")
+    parser.add_argument("--products", type=int, default=1000, help="Products to insert")
+    parser.add_argument("--reads", type=int, default=1000, help="Lookups by mobile to perform")
+    parser.add_argument("--sqlite-path", help="SQLite file to use (default: a temporary file)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault("SQLITE_PATH", args.sqlite_path or os.path.join(tmp, "benchmark.db"))
+
+        results = []
+        for backend in args.backend or ["sqlite"]:
+            if backend == "supabase" and not os.getenv("SUPABASE_URL"):
+                print("⚠️  Skipping supabase: SUPABASE_URL is not configured")
+                continue
+            results.append(asyncio.run(run_backend(backend, args.products, args.reads)))
+
+    for result in results:
+        print(f"\n📊 {result['backend']}")
+        for operation in ("store_product", "get_products_by_mobile"):
+            stats = result[operation]
+            print(f"  {operation:<24} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms "
+                  f"p99={stats['p99_ms']}ms max={stats['max_ms']}ms")
+        print(f"  concurrent reads ({len(FARMERS)})  {result['concurrent_reads_total_ms']}ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+Stub Servers for AgriVoice Load Tests
+Local stand-ins for the Gemini REST API and Supabase's PostgREST with configurable latency and errors
+
+Run on their own to point a manually started server at them:
+    python benchmarks/stub_servers.py --gemini-port 8601 --supabase-port 8602 --gemini-latency-ms 800
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import urlsplit, parse_qsl
+
+class LatencyProfile:
+    """Response delay drawn from a lognormal distribution plus an error rate
+
+    median_ms is the 50th percentile delay; sigma widens the tail (0 gives a
+    constant delay, 0.5 puts p99 at about 3.2x the median). Failed requests
+    are delayed the same way before the error is returned.
+    """
+
+    def __init__(self, median_ms: float = 0.0, sigma: float = 0.0, error_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> Tuple[float, bool]:
+        """(delay in seconds, whether to fail) for one request"""
+        with self._lock:
+            delay = self.median_ms * math.exp(self.sigma * self._random.gauss(0.0, 1.0)) if self.median_ms else 0.0
+            return delay / 1000, self._random.random() < self.error_rate
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"median_ms": self.median_ms, "sigma": self.sigma, "error_rate": self.error_rate}
+
+class StubServer(ThreadingHTTPServer):
+    """Threaded HTTP server that counts requests and injected errors"""
+
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, handler, profile: LatencyProfile, port: int = 0, host: str = "127.0.0.1"):
+        super().__init__((host, port), handler)
+        self.profile = profile
+        self.counts = {"requests": 0, "errors": 0}
+        self.delay_total = 0.0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def record(self, delay: float, failed: bool) -> None:
+        with self._lock:
+            self.counts["requests"] += 1
+            self.counts["errors"] += int(failed)
+            self.delay_total += delay
+
+    def get_stats(self) -> Dict[str, Any]:
+        requests = self.counts["requests"]
+        return {
+            **self.counts,
+            "avg_injected_delay_ms": round(self.delay_total / requests * 1000, 2) if requests else 0.0,
+            "profile": self.profile.to_dict()
+        }
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self) -> Any:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        return json.loads(body) if body else None
+
+    def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _delay(self) -> bool:
+        """Sleep for the sampled latency; True when this request should fail"""
+        delay, failed = self.server.profile.sample()
+        if delay:
+            time.sleep(delay)
+        self.server.record(delay, failed)
+        return failed
+
+GEMINI_PATH = re.compile(r"^/v1beta/models/[^/:]+:generateContent$")
+
+EXTRACTION_RESPONSE = {"product": "tomato", "quantity": "10 kg", "price": "₹40", "price_per_unit": "₹40/kg"}
+SUGGESTIONS_RESPONSE = {
+    "description": "Fresh, farm-picked tomatoes harvested this week",
+    "price_range": "₹35-45 per kg",
+    "where_to_sell": "Local mandi, nearby grocery stores and weekly markets",
+    "selling_tip": "Sell early in the morning while the produce is fresh"
+}
+IMPROVEMENT_RESPONSE = {
+    "pricing_suggestions": "Offer a small discount on bulk purchases",
+    "presentation_tips": "Sort by size and keep the produce clean and dry",
+    "marketing_ideas": "Share photos with local buyers and shop owners",
+    "alternative_channels": "Try hotels, restaurants and online marketplaces"
+}
+
+class GeminiStubHandler(_StubHandler):
+    """Answers generateContent with canned JSON matching the prompt kind"""
+
+    def do_POST(self):
+        if not GEMINI_PATH.match(urlsplit(self.path).path):
+            self._send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+            return
+        request = self._read_json() or {}
+        if self._delay():
+            self._send_json(503, {"error": {"code": 503, "message": "The model is overloaded", "status": "UNAVAILABLE"}})
+            return
+
+        prompt = "".join(part.get("text", "") for content in request.get("contents", [])
+                         for part in content.get("parts", []))
+        if '"where_to_sell"' in prompt:
+            answer = SUGGESTIONS_RESPONSE
+        elif '"presentation_tips"' in prompt:
+            answer = IMPROVEMENT_RESPONSE
+        else:
+            answer = EXTRACTION_RESPONSE
+        self._send_json(200, {
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"text": json.dumps(answer, ensure_ascii=False)}]},
+                "finishReason": "STOP"
+            }],
+            "usageMetadata": {"promptTokenCount": len(prompt) // 4}
+        })
+
+class PostgRESTStubHandler(_StubHandler):
+    """In-memory subset of PostgREST covering the queries SupabaseClient makes
+
+    Supports inserts and upserts (on_conflict with ignore-duplicates), selects
+    with eq/neq/lt/lte/gt/gte/in filters, order and limit, updates filtered by
+    eq, and the RPCs in supabase_config/schema.sql answered with simple stand-ins.
+    """
+
+    def _route(self) -> Tuple[Optional[str], Optional[str], List[Tuple[str, str]]]:
+        parts = urlsplit(self.path)
+        match = re.match(r"^/rest/v1/(rpc/)?([A-Za-z_][A-Za-z0-9_]*)$", parts.path)
+        if not match:
+            return None, None, []
+        return ("rpc" if match.group(1) else "table"), match.group(2), parse_qsl(parts.query, keep_blank_values=True)
+
+    def _handle(self, method: str) -> None:
+        kind, name, params = self._route()
+        body = self._read_json() if method in ("POST", "PATCH") else None
+        if kind is None:
+            self._send_json(404, {"message": "Not found"})
+            return
+        if self._delay():
+            self._send_json(503, {"message": "upstream database unavailable", "code": "PGRST000"})
+            return
+
+        tables = self.server.tables
+        with self.server.data_lock:
+            if kind == "rpc":
+                self._send_json(200, self._rpc(name, body or {}, tables))
+                return
+            rows = tables.setdefault(name, [])
+            if method == "GET":
+                self._send_json(200, self._select(rows, params))
+            elif method == "POST":
+                self._send_json(201, self._insert(rows, body, params))
+            elif method == "PATCH":
+                self._send_json(200, self._update(rows, body or {}, params))
+            elif method == "DELETE":
+                matched = self._filter(rows, params)
+                rows[:] = [row for row in rows if row not in matched]
+                self._send_json(200, matched)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+    @staticmethod
+    def _matches(row: Dict[str, Any], column: str, expression: str) -> bool:
+        operator, _, expected = expression.partition(".")
+        actual = row.get(column)
+        if operator == "is":
+            return actual is None if expected == "null" else str(actual).lower() == expected
+        if operator == "in":
+            # in.(a,"b,c") as sent by postgrest-py
+            values = [value.strip('"') for value in re.findall(r'"[^"]*"|[^,]+', expected.strip("()"))]
+            return actual is not None and str(actual) in values
+        if actual is None:
+            return False
+        if isinstance(actual, (int, float)) and not isinstance(actual, bool):
+            try:
+                expected = type(actual)(expected)
+            except ValueError:
+                return False
+        else:
+            actual = str(actual)
+        comparisons = {
+            "eq": lambda: actual == expected, "neq": lambda: actual != expected,
+            "lt": lambda: actual < expected, "lte": lambda: actual <= expected,
+            "gt": lambda: actual > expected, "gte": lambda: actual >= expected
+        }
+        return comparisons.get(operator, lambda: False)()
+
+    def _filter(self, rows: List[Dict[str, Any]], params: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        filters = [(column, value) for column, value in params
+                   if column not in ("select", "order", "limit", "offset", "on_conflict", "columns")]
+        return [row for row in rows if all(self._matches(row, column, value) for column, value in filters)]
+
+    def _select(self, rows: List[Dict[str, Any]], params: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        options = dict(params)
+        result = self._filter(rows, params)
+        for term in reversed((options.get("order") or "").split(",")):
+            if term:
+                column, _, direction = term.partition(".")
+                result.sort(key=lambda row: (row.get(column) is None, str(row.get(column))),
+                            reverse=direction.startswith("desc"))
+        offset = int(options.get("offset", 0))
+        limit = int(options["limit"]) if options.get("limit") else None
+        result = result[offset:offset + limit if limit is not None else None]
+        columns = options.get("select", "*")
+        if columns != "*":
+            names = [column.strip() for column in columns.split(",")]
+            result = [{name: row.get(name) for name in names} for row in result]
+        return result
+
+    def _insert(self, rows: List[Dict[str, Any]], body: Any, params: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        # A unique constraint over one or more columns, e.g. "farmer_mobile,idempotency_key"
+        conflict_columns = [column for column in (dict(params).get("on_conflict") or "").split(",") if column]
+        ignore_duplicates = "ignore-duplicates" in (self.headers.get("Prefer") or "")
+        inserted = []
+        for record in body if isinstance(body, list) else [body or {}]:
+            # As in Postgres, a NULL in any of the columns never conflicts
+            if conflict_columns and all(record.get(column) is not None for column in conflict_columns):
+                existing = next((row for row in rows
+                                 if all(row.get(column) == record[column] for column in conflict_columns)), None)
+                if existing is not None:
+                    if not ignore_duplicates:
+                        existing.update(record)
+                        inserted.append(existing)
+                    continue
+            row = {"id": str(uuid.uuid4()), "created_at": datetime.now(timezone.utc).isoformat(), **record}
+            rows.append(row)
+            inserted.append(row)
+        return inserted
+
+    def _update(self, rows: List[Dict[str, Any]], body: Dict[str, Any], params: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        matched = self._filter(rows, params)
+        for row in matched:
+            row.update(body)
+        return matched
+
+    @staticmethod
+    def _rpc(name: str, args: Dict[str, Any], tables: Dict[str, List[Dict[str, Any]]]) -> Any:
+        products = tables.setdefault("products", [])
+        if name == "try_acquire_lease":
+            return True
+        if name == "search_products":
+            limit = int(args.get("result_limit") or args.get("limit_count") or 20)
+            return sorted(products, key=lambda row: row.get("created_at", ""), reverse=True)[:limit]
+        if name in ("bulk_update_product_status", "bulk_update_product_normalization"):
+            by_id = {row["id"]: row for row in products}
+            updated = 0
+            for update in args.get("updates") or []:
+                row = by_id.get(update.get("id"))
+                if row is not None:
+                    row.update({key: value for key, value in update.items() if key != "id"})
+                    updated += 1
+            return updated
+        return 0
+
+class PostgRESTStubServer(StubServer):
+    """Stub server holding the PostgREST tables in memory"""
+
+    def __init__(self, profile: LatencyProfile, port: int = 0, host: str = "127.0.0.1"):
+        super().__init__(PostgRESTStubHandler, profile, port, host)
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.data_lock = threading.Lock()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**super().get_stats(), "rows": {name: len(rows) for name, rows in self.tables.items()}}
+
+def start_gemini_stub(profile: LatencyProfile, port: int = 0) -> StubServer:
+    """Start a Gemini stub in a background thread"""
+    return StubServer(GeminiStubHandler, profile, port).start()
+
+def start_supabase_stub(profile: LatencyProfile, port: int = 0) -> PostgRESTStubServer:
+    """Start a PostgREST stub in a background thread"""
+    return PostgRESTStubServer(profile, port).start()
+
+def main():
+    """Run both stub servers until interrupted"""
+    parser = argparse.ArgumentParser(description="Run local Gemini and Supabase stand-ins")
+    parser.add_argument("--gemini-port", type=int, default=8601)
+    parser.add_argument("--supabase-port", type=int, default=8602)
+    parser.add_argument("--gemini-latency-ms", type=float, default=800, help="Median Gemini latency")
+    parser.add_argument("--gemini-sigma", type=float, default=0.5, help="Lognormal spread of Gemini latency")
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0, help="Fraction of Gemini calls that fail")
+    parser.add_argument("--db-latency-ms", type=float, default=20, help="Median Supabase latency")
+    parser.add_argument("--db-sigma", type=float, default=0.3, help="Lognormal spread of Supabase latency")
+    parser.add_argument("--db-error-rate", type=float, default=0.0, help="Fraction of Supabase calls that fail")
+    args = parser.parse_args()
+
+    gemini = start_gemini_stub(LatencyProfile(args.gemini_latency_ms, args.gemini_sigma, args.gemini_error_rate),
+                               args.gemini_port)
+    supabase = start_supabase_stub(LatencyProfile(args.db_latency_ms, args.db_sigma, args.db_error_rate),
+                                   args.supabase_port)
+    print(f"🤖 Gemini stub:   GEMINI_API_ENDPOINT={gemini.url}")
+    print(f"🗄️  Supabase stub: SUPABASE_URL={supabase.url} SUPABASE_ANON_KEY=stub.stub.stub")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"\n📊 Gemini {gemini.get_stats()}")
+        print(f"📊 Supabase {supabase.get_stats()}")
+        gemini.stop()
+        supabase.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+AgriVoice Bulk Ingest
+Onboards listings from spreadsheets and folders of recordings through extract, suggest and store
+
+Sources are read as streams, one record at a time:
+    CSV    one listing per row, with a header
+    JSONL  one listing (JSON object) per line
+    a directory of recordings (.wav, .mp3, .ogg, .webm, .m4a), walked in name order
+
+A record has transcribed_text (or text), or a recording: audio_data
+(base64) in JSONL, or audio_file (a path relative to the source) in CSV or
+JSONL. language and farmer_mobile come from the record or the --language and
+--farmer-mobile defaults. Recordings named <farmer_mobile>_<language>[_...].ext
+carry both in the file name.
+
+Records are processed by a pool of workers and stored with bulk inserts.
+The reader waits while the workers are busy, so memory use does not grow
+with the size of the source. Progress is saved in a checkpoint after each
+bulk insert, and a rerun resumes after the last record that was saved. Every
+record is stored with an idempotency key, so records processed again after
+a crash are not stored twice. Records that fail are written to an errors
+file and skipped.
+
+Usage (from the backend directory):
+    python bulk_ingest.py listings.csv --farmer-mobile 9876543210 --language hi
+    python bulk_ingest.py recordings/ --workers 16 --batch-size 200
+    python bulk_ingest.py listings.jsonl --restart --dry-run --limit 1000
+"""
+
+import argparse
+import asyncio
+import base64
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Set, Tuple
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from utils.ai_dispatcher import ai_work
+from utils.clients import get_ai_client, get_audio_processor, get_storage_client
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".ogg", ".webm", ".m4a")
+
+# <farmer_mobile>_<language>[_anything].ext
+AUDIO_NAME = re.compile(r"^(?P<farmer_mobile>\d{10})_(?P<language>[a-z]{2})(?:_.*)?$")
+
+def detect_format(source: Path) -> str:
+    if source.is_dir():
+        return "audio"
+    if source.suffix.lower() in (".jsonl", ".ndjson"):
+        return "jsonl"
+    return "csv"
+
+def read_csv(source: Path) -> Iterator[Dict[str, Any]]:
+    with open(source, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            yield {key.strip(): value.strip() for key, value in row.items() if key and value}
+
+def read_jsonl(source: Path) -> Iterator[Dict[str, Any]]:
+    with open(source, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                record = {"_error": f"Invalid JSON: {e}"}
+            yield record if isinstance(record, dict) else {"_error": "Line is not a JSON object"}
+
+def read_audio_dir(source: Path) -> Iterator[Dict[str, Any]]:
+    for directory, subdirectories, files in os.walk(source):
+        # Sorted so that a resumed run sees the recordings in the same order
+        subdirectories.sort()
+        for name in sorted(files):
+            if not name.lower().endswith(AUDIO_EXTENSIONS):
+                continue
+            path = Path(directory, name)
+            record = {"audio_file": str(path.relative_to(source))}
+            match = AUDIO_NAME.match(path.stem)
+            if match:
+                record.update(match.groupdict())
+            yield record
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl, "audio": read_audio_dir}
+
+class Checkpoint:
+    """Ingest progress for one source, saved as JSON after each bulk insert
+
+    completed is a watermark: every record before it has been stored or
+    written to the errors file. Records finish out of order, so those past
+    the watermark are held in a set until the gap before them closes. The
+    set holds every record finished since the oldest unfinished one, so a
+    record stalled on a slow Gemini call makes it grow with everything
+    finished meanwhile. It only holds record numbers, and it is not saved;
+    a resumed run starts again at the watermark.
+    """
+
+    def __init__(self, path: Path, source: Path):
+        self.path = path
+        self.source = str(source.resolve())
+        self.completed = 0
+        self.stats = {"stored": 0, "failed": 0}
+        self._done: Set[int] = set()
+
+    def load(self) -> bool:
+        """Resume from the saved checkpoint, returning whether there was one for this source"""
+        if not self.path.exists():
+            return False
+        with open(self.path, encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("source") != self.source:
+            raise SystemExit(f"❌ {self.path} is a checkpoint for {saved.get('source')}; "
+                             f"pass --checkpoint or --restart")
+        self.completed = saved["completed"]
+        self.stats.update(saved.get("stats", {}))
+        return True
+
+    def mark_done(self, numbers: List[int]) -> None:
+        self._done.update(numbers)
+        while self.completed in self._done:
+            self._done.remove(self.completed)
+            self.completed += 1
+
+    def save(self) -> None:
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"source": self.source, "completed": self.completed, "stats": self.stats,
+                       "saved_at": time.strftime("%Y-%m-%dT%H:%M:%S%z")}, f)
+        # Atomic, so a crash mid-write leaves the previous checkpoint intact
+        os.replace(temporary, self.path)
+
+class BulkIngest:
+    """Reads a source, runs each record through the listing pipeline and bulk stores the results"""
+
+    def __init__(self, source: Path, args):
+        self.source = source
+        self.args = args
+        self.format = args.format or detect_format(source)
+        self.checkpoint = Checkpoint(Path(args.checkpoint or f"{str(source).rstrip('/')}.ingest.json"), source)
+        self.errors_path = Path(args.errors or f"{str(source).rstrip('/')}.ingest-errors.jsonl")
+        # Keys stay the same across runs, so a record processed twice is stored once
+        self.key_prefix = "ingest-" + hashlib.sha256(self.checkpoint.source.encode()).hexdigest()[:12]
+        self.read = 0
+        self.in_flight = 0
+        self._buffer: List[Tuple[int, Dict[str, Any]]] = []
+
+    async def run(self) -> None:
+        if self.args.restart:
+            for path in (self.checkpoint.path, self.errors_path):
+                if path.exists():
+                    path.unlink()
+        elif self.checkpoint.load():
+            print(f"↩️  Resuming {self.source} after record {self.checkpoint.completed}")
+
+        print(f"📥 Ingesting {self.source} ({self.format}) with {self.args.workers} workers, "
+              f"bulk inserts of {self.args.batch_size}{' (dry run)' if self.args.dry_run else ''}")
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.args.workers * 2)
+        started = time.perf_counter()
+        reporter = asyncio.create_task(self._report(started))
+        workers = [asyncio.create_task(self._work(queue)) for _ in range(self.args.workers)]
+        try:
+            await self._produce(queue)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+            await self._flush()
+        finally:
+            reporter.cancel()
+            for worker in workers:
+                worker.cancel()
+            self.checkpoint.save()
+
+        elapsed = time.perf_counter() - started
+        stats = self.checkpoint.stats
+        print(f"✅ Ingest complete: {stats['stored']} stored, {stats['failed']} failed, "
+              f"{self.read} read in {elapsed:.1f}s ({self.read / max(elapsed, 1e-9):.1f} records/s)")
+        if stats["failed"]:
+            print(f"⚠️  Failed records are listed in {self.errors_path}")
+
+    async def _produce(self, queue: asyncio.Queue) -> None:
+        records = READERS[self.format](self.source)
+        number = 0
+        while True:
+            # File reads are small and buffered; a blocked put is what keeps memory flat
+            record = next(records, None)
+            if record is None or (self.args.limit and self.read >= self.args.limit):
+                break
+            if number >= self.checkpoint.completed:
+                await queue.put((number, record))
+                self.read += 1
+            number += 1
+
+    async def _work(self, queue: asyncio.Queue) -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            number, record = item
+            self.in_flight += 1
+            try:
+                product = await self._process(number, record)
+            except Exception as e:
+                self._record_error(number, record, e)
+                self.checkpoint.mark_done([number])
+                continue
+            finally:
+                self.in_flight -= 1
+            self._buffer.append((number, product))
+            if len(self._buffer) >= self.args.batch_size:
+                await self._flush()
+
+    async def _process(self, number: int, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Transcribe (for recordings), extract and suggest; returns store_product's arguments"""
+        if "_error" in record:
+            raise ValueError(record["_error"])
+        language = record.get("language") or self.args.language
+        farmer_mobile = record.get("farmer_mobile") or self.args.farmer_mobile
+        if not farmer_mobile:
+            raise ValueError("No farmer_mobile in the record and no --farmer-mobile default")
+
+        transcribed_text = record.get("transcribed_text") or record.get("text")
+        if not transcribed_text:
+            audio_data = record.get("audio_data")
+            if not audio_data and record.get("audio_file"):
+                audio_data = await asyncio.to_thread(self._read_audio, record["audio_file"])
+            if not audio_data:
+                raise ValueError("Record has no transcribed_text, audio_data or audio_file")
+            transcribed_text = await get_audio_processor().process_audio(audio_data, language)
+
+        # Batch class: a running ingest never takes the slots kept for farmers using the app
+        with ai_work("batch", language, farmer_mobile):
+            ai_client = get_ai_client()
+            product_info = await ai_client.extract_product_info(transcribed_text, language)
+            ai_suggestions = await ai_client.generate_suggestions(product_info, transcribed_text, language)
+
+        return {
+            "product_info": product_info,
+            "ai_suggestions": ai_suggestions,
+            "transcribed_text": transcribed_text,
+            "language": language,
+            "farmer_mobile": farmer_mobile,
+            "audio_url": record.get("audio_url"),
+            "idempotency_key": f"{self.key_prefix}-{number}"
+        }
+
+    def _read_audio(self, audio_file: str) -> str:
+        base = self.source if self.format == "audio" else self.source.parent
+        with open(base / audio_file, "rb") as f:
+            return base64.b64encode(f.read()).decode("ascii")
+
+    async def _flush(self) -> None:
+        """Store the buffered products in one bulk insert and save the checkpoint"""
+        batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        numbers = [number for number, _ in batch]
+        if self.args.dry_run:
+            self.checkpoint.stats["stored"] += len(batch)
+        else:
+            try:
+                await get_storage_client().bulk_store_products([product for _, product in batch])
+                self.checkpoint.stats["stored"] += len(batch)
+            except Exception as e:
+                for number, product in batch:
+                    self._record_error(number, product, e)
+        self.checkpoint.mark_done(numbers)
+        self.checkpoint.save()
+
+    def _record_error(self, number: int, record: Dict[str, Any], error: Exception) -> None:
+        self.checkpoint.stats["failed"] += 1
+        # Recordings are referenced by file, not repeated in the errors file
+        record = {key: value for key, value in record.items() if key not in ("audio_data", "_error")}
+        with open(self.errors_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"record": number, "error": str(error), "data": record}, ensure_ascii=False) + "\n")
+
+    async def _report(self, started: float) -> None:
+        last_time, last_done = started, 0
+        while True:
+            await asyncio.sleep(self.args.progress_interval)
+            now = time.perf_counter()
+            done = self.checkpoint.stats["stored"] + self.checkpoint.stats["failed"]
+            rate = (done - last_done) / max(now - last_time, 1e-9)
+            print(f"📦 Read {self.read}, stored {self.checkpoint.stats['stored']}, "
+                  f"failed {self.checkpoint.stats['failed']}, in flight {self.in_flight}, "
+                  f"buffered {len(self._buffer)} ({rate:.1f} records/s, checkpoint at {self.checkpoint.completed})")
+            last_time, last_done = now, done
+
+def main():
+    """Run a bulk ingest"""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Ingest listings from CSV, JSONL or a directory of recordings")
+    parser.add_argument("source", help="CSV or JSONL file, or a directory of recordings")
+    parser.add_argument("--format", choices=sorted(READERS), help="Source format (default: from the path)")
+    parser.add_argument("--language", default="en", help="Language of records that do not name one")
+    parser.add_argument("--farmer-mobile", help="Farmer of records that do not name one")
+    parser.add_argument("--workers", type=int, default=8, help="Records processed at once")
+    parser.add_argument("--batch-size", type=int, default=200, help="Products per bulk insert")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <source>.ingest.json)")
+    parser.add_argument("--errors", help="Failed records file (default: <source>.ingest-errors.jsonl)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start from the first record")
+    parser.add_argument("--limit", type=int, help="Stop after reading this many records")
+    parser.add_argument("--progress-interval", type=float, default=5, help="Seconds between progress lines")
+    parser.add_argument("--dry-run", action="store_true", help="Process records without storing them")
+    args = parser.parse_args()
+
+    source = Path(args.source)
+    if not source.exists():
+        parser.error(f"{source} does not exist")
+
+    try:
+        asyncio.run(BulkIngest(source, args).run())
+    except KeyboardInterrupt:
+        print("\n🛑 Interrupted; run the same command again to resume from the checkpoint")
+        sys.exit(130)
+
+if __name__ == "__main__":
+    main()
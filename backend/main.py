@@ -3,35 +3,120 @@ AgriVoice - Main FastAPI Application
 Orchestrates the complete voice-to-product workflow
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request, Response, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse, PlainTextResponse
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
 import asyncio
+import json
 import logging
+import os
+import time
 from typing import Optional, Dict, Any
 from pathlib import Path
 
 # Import our modules
-from models.farmer import FarmerCreate, FarmerResponse
-from models.product import ProductCreate, ProductResponse, VoiceProcessRequest
+from models.farmer import FarmerCreate, FarmerResponse, FarmerStats
+from models.product import (ProductCreate, ProductResponse, VoiceProcessRequest, BulkProductStatusUpdate,
+                            CatalogSearchRequest)
 from routes import transcribe, generate, store, status
-from utils.ai_client import GeminiAIClient
-from utils.audio_tools import AudioProcessor
-from utils.supabase_client import SupabaseClient
+from utils.clients import get_ai_client, get_audio_processor, get_storage_client
+from utils.catalog_index import CatalogIndex, summarize_product
+from utils.page_cache import PageCache
+from utils.asset_manifest import AssetManifest, FingerprintedStaticFiles
+from utils.shutdown import GracefulDrain
+from utils.job_queue import JobManager, QueueFullError, TERMINAL_STATUSES
+from utils.voice_pipeline import run_voice_pipeline
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.scheduler import UnsoldProductSweeper
+from utils.admission import AdmissionController, AdmissionMiddleware
+from utils.idempotency import get_idempotency_manager
+from utils.metrics import REGISTRY, STARTED_AT, MetricsMiddleware
+from utils.tracing import TracingMiddleware, get_tracer, start_span
+from utils.profiling import RequestProfiler, ProfilingMiddleware
+from utils.loop_monitor import LoopMonitor
+from utils.memory import MemoryTracker, MemoryMiddleware, GROUPINGS
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Seconds between reconciliations of the farmer stats counters
+FARMER_STATS_RECONCILE_INTERVAL = int(os.getenv("FARMER_STATS_RECONCILE_INTERVAL", 3600))
+# Default latency budget for /api/complete-voice-process in ms (0 disables it)
+VOICE_LATENCY_BUDGET_MS = int(os.getenv("VOICE_LATENCY_BUDGET_MS", 8000))
+# Seconds between catalog index rebuilds, bounding staleness across workers
+CATALOG_INDEX_REFRESH_INTERVAL = int(os.getenv("CATALOG_INDEX_REFRESH_INTERVAL", 300))
+
+async def reconcile_farmer_stats_periodically():
+    """Correct any drift in the incremental farmer stats counters"""
+    while True:
+        await asyncio.sleep(FARMER_STATS_RECONCILE_INTERVAL)
+        try:
+            corrected = await get_storage_client().reconcile_farmer_stats()
+            logger.info(f"Farmer stats reconciliation finished, {corrected} rows corrected")
+        except Exception as e:
+            logger.error(f"Farmer stats reconciliation error: {str(e)}")
+
+async def refresh_catalog_index_periodically():
+    """Rebuild the catalog index to pick up listings stored by other workers"""
+    while True:
+        await catalog_index.warm(get_storage_client())
+        await asyncio.sleep(CATALOG_INDEX_REFRESH_INTERVAL)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build clients and caches, start background maintenance tasks and stop them on shutdown"""
+    started = time.perf_counter()
+    storage_client = get_storage_client()
+    get_ai_client()
+    get_audio_processor()
+    asset_manifest.build()
+    page_cache.preload()
+    logger.info(f"Startup finished in {(time.perf_counter() - started) * 1000:.0f}ms")
+    tasks = [
+        asyncio.create_task(reconcile_farmer_stats_periodically()),
+        asyncio.create_task(refresh_catalog_index_periodically())
+    ]
+    loop_monitor.start()
+    if os.getenv("MEMORY_TRACE_ON_START", "False").lower() == "true":
+        memory_tracker.start()
+    voice_jobs.start()
+    unsold_sweeper.start()
+    graceful_drain.register_flush(unsold_sweeper.stop)
+    graceful_drain.register_flush(lambda: voice_jobs.stop(timeout=graceful_drain.timeout))
+    graceful_drain.register_flush(lambda: asyncio.to_thread(get_tracer().flush))
+    if hasattr(storage_client, "close"):
+        graceful_drain.register_flush(lambda: asyncio.to_thread(storage_client.close))
+    yield
+    for task in tasks:
+        task.cancel()
+    await graceful_drain.drain()
+    await loop_monitor.stop()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="AgriVoice API",
     description="Multilingual AI-powered voice product catalog for Indian farmers",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Opt-in per-request profiles (signed X-Profile-Token or PROFILE_SAMPLE_RATE);
+# innermost, so only admitted requests are profiled
+profiler = RequestProfiler()
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+# Traced memory change per route while tracemalloc is on (see /api/maintenance/memory)
+memory_tracker = MemoryTracker()
+app.add_middleware(MemoryMiddleware, tracker=memory_tracker)
+
+# Per-farmer rate limits and load shedding for the expensive routes; added
+# before CORS so rejections still carry CORS headers
+admission = AdmissionController()
+app.add_middleware(AdmissionMiddleware, controller=admission)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -41,16 +126,79 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request counts and latency per route for /metrics; added last so it also
+# sees requests rejected by admission control
+app.add_middleware(MetricsMiddleware)
+
+# Server spans continuing the caller's traceparent; sampled traces are written
+# by the TRACE_EXPORTER
+app.add_middleware(TracingMiddleware)
+
 # Get frontend path
 frontend_path = Path(__file__).resolve().parent.parent / "frontend"
 
-# Serve static files (CSS, JS, images)
-app.mount("/static", StaticFiles(directory=frontend_path), name="static")
+# Content-hashed static assets, referenced from the pages by fingerprinted URL
+asset_manifest = AssetManifest(frontend_path)
+
+# In-memory HTML pages with precompressed variants and ETags
+page_cache = PageCache(frontend_path, assets=asset_manifest)
+
+# Serve static files (CSS, JS, images); fingerprinted URLs are cached immutably
+app.mount("/static", FingerprintedStaticFiles(directory=frontend_path, manifest=asset_manifest), name="static")
 
 # Initialize clients
-ai_client = GeminiAIClient()
-audio_processor = AudioProcessor()
-supabase_client = SupabaseClient()
+# AI, audio and storage clients are built lazily through the utils.clients
+# accessors, so importing this module stays cheap
+catalog_index = CatalogIndex()
+# Routers reach the index through the app (see routes/store.py)
+app.state.catalog_index = catalog_index
+graceful_drain = GracefulDrain()
+
+async def run_voice_job(payload: Dict[str, Any], on_stage) -> Dict[str, Any]:
+    """Run a queued voice job through the full pipeline
+
+    Jobs are already off the request path, so they run without a latency
+    budget and their Gemini calls yield to interactive requests.
+    """
+    payload = {key: value for key, value in payload.items() if key != "latency_budget_ms"}
+    return await run_voice_pipeline(**payload, catalog_index=catalog_index, on_stage=on_stage, priority="batch")
+
+voice_jobs = JobManager(run_voice_job)
+unsold_sweeper = UnsoldProductSweeper()
+loop_monitor = LoopMonitor()
+
+def collect_component_metrics():
+    """Gauges read from the caches, pools and queues on each /metrics scrape"""
+    yield ("agrivoice_uptime_seconds", "gauge", "Seconds since this worker started",
+           [({}, time.time() - STARTED_AT)])
+    yield ("agrivoice_cache_bytes", "gauge", "Bytes held by in-memory caches", [
+        ({"cache": "pages"}, page_cache.get_stats()["bytes"]),
+        ({"cache": "assets"}, asset_manifest.get_stats()["bytes"])
+    ])
+    yield ("agrivoice_catalog_index_documents", "gauge", "Listings in the catalog search index",
+           [({}, catalog_index.get_stats()["documents"])])
+    job_stats = voice_jobs.get_stats()
+    yield ("agrivoice_voice_jobs_queued", "gauge", "Voice jobs waiting for a worker", [({}, job_stats["queued"])])
+    yield ("agrivoice_background_tasks", "gauge", "Background completions still running",
+           [({}, graceful_drain.in_flight)])
+    classes = get_ai_client().dispatcher.get_stats()["classes"]
+    yield ("agrivoice_gemini_slots_active", "gauge", "Gemini calls in flight by work class",
+           [({"priority": name}, stats["active"]) for name, stats in classes.items()])
+    yield ("agrivoice_gemini_slots_waiting", "gauge", "Gemini calls waiting for a slot by work class",
+           [({"priority": name}, stats["waiting"]) for name, stats in classes.items()])
+    routes = admission.get_stats()["routes"]
+    yield ("agrivoice_admission_waiting", "gauge", "Requests queued behind a route's concurrency ceiling",
+           [({"route": path}, stats["waiting"]) for path, stats in routes.items() if "waiting" in stats])
+    storage_status = get_storage_client().get_connection_status()
+    yield ("agrivoice_storage_connected", "gauge", "Whether the storage backend is connected",
+           [({"backend": storage_status["backend"]}, int(bool(storage_status["connected"])))])
+    if "pending_reads" in storage_status:
+        yield ("agrivoice_storage_pending", "gauge", "Storage calls queued or running on the thread pools", [
+            ({"kind": "read"}, storage_status["pending_reads"]),
+            ({"kind": "write"}, storage_status["pending_writes"])
+        ])
+
+REGISTRY.register_collector(collect_component_metrics)
 
 # Include routers
 app.include_router(transcribe.router, prefix="/api", tags=["transcribe"])
@@ -65,139 +213,171 @@ class HealthResponse(BaseModel):
 
 # Frontend Routes
 @app.get("/", response_class=HTMLResponse)
-async def get_index():
+async def get_index(request: Request):
     """Serve the main index.html page"""
-    try:
-        with open(frontend_path / "index.html", "r", encoding="utf-8") as f:
-            return f.read()
-    except FileNotFoundError:
-        return HTMLResponse(content="<h1>Frontend files not found</h1>", status_code=404)
+    return page_cache.response(request, "index.html", "<h1>Frontend files not found</h1>")
 
 @app.get("/login", response_class=HTMLResponse)
-async def get_login():
+async def get_login(request: Request):
     """Serve the login page"""
-    try:
-        with open(frontend_path / "login.html", "r", encoding="utf-8") as f:
-            return f.read()
-    except FileNotFoundError:
-        return HTMLResponse(content="<h1>Login page not found</h1>", status_code=404)
+    return page_cache.response(request, "login.html", "<h1>Login page not found</h1>")
 
 @app.get("/register", response_class=HTMLResponse)
-async def get_register():
+async def get_register(request: Request):
     """Serve the register page"""
-    try:
-        with open(frontend_path / "register.html", "r", encoding="utf-8") as f:
-            return f.read()
-    except FileNotFoundError:
-        return HTMLResponse(content="<h1>Register page not found</h1>", status_code=404)
+    return page_cache.response(request, "register.html", "<h1>Register page not found</h1>")
 
 @app.get("/dashboard", response_class=HTMLResponse)
-async def get_dashboard():
+async def get_dashboard(request: Request):
     """Serve the dashboard page"""
-    try:
-        with open(frontend_path / "dashboard.html", "r", encoding="utf-8") as f:
-            return f.read()
-    except FileNotFoundError:
-        return HTMLResponse(content="<h1>Dashboard page not found</h1>", status_code=404)
+    return page_cache.response(request, "dashboard.html", "<h1>Dashboard page not found</h1>")
 
 @app.get("/upload", response_class=HTMLResponse)
-async def get_upload():
+async def get_upload(request: Request):
     """Serve the upload page"""
-    try:
-        with open(frontend_path / "upload.html", "r", encoding="utf-8") as f:
-            return f.read()
-    except FileNotFoundError:
-        return HTMLResponse(content="<h1>Upload page not found</h1>", status_code=404)
+    return page_cache.response(request, "upload.html", "<h1>Upload page not found</h1>")
 
 @app.get("/status", response_class=HTMLResponse)
-async def get_status():
+async def get_status(request: Request):
     """Serve the status page"""
-    try:
-        with open(frontend_path / "status.html", "r", encoding="utf-8") as f:
-            return f.read()
-    except FileNotFoundError:
-        return HTMLResponse(content="<h1>Status page not found</h1>", status_code=404)
+    return page_cache.response(request, "status.html", "<h1>Status page not found</h1>")
 
 # API Routes
 @app.get("/api/health", response_model=HealthResponse)
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint
+
+    Returns 503 while the worker drains for shutdown, so load balancers stop
+    routing to it, and reports "degraded" when storage is not connected.
+    """
+    if graceful_drain.draining:
+        return JSONResponse(
+            HealthResponse(status="draining", message="AgriVoice API is shutting down", version="1.0.0").dict(),
+            status_code=503
+        )
+    if not get_storage_client().get_connection_status()["connected"]:
+        return HealthResponse(status="degraded", message="Storage backend is not connected", version="1.0.0")
     return HealthResponse(
         status="healthy",
         message="AgriVoice API is running",
         version="1.0.0"
     )
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics for this worker"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.post("/api/complete-voice-process")
-async def complete_voice_process(request: VoiceProcessRequest):
+async def complete_voice_process(request: VoiceProcessRequest, response: Response,
+                                 idempotency_key: Optional[str] = Header(None, max_length=255)):
     """
     Complete voice processing workflow:
     1. Speech-to-Text conversion
     2. Product information extraction
     3. AI-powered suggestions generation
     4. Data storage in Supabase
+
+    Retries sent with the same Idempotency-Key replay the first response.
     """
+    budget_ms = request.latency_budget_ms or VOICE_LATENCY_BUDGET_MS
+
+    async def process():
+        with start_span("complete_voice_process", language=request.language,
+                        audio_base64_bytes=len(request.audio_data or ""),
+                        text_chars=len(request.transcribed_text or ""),
+                        latency_budget_ms=budget_ms) as span:
+            try:
+                response_data = await run_voice_pipeline(
+                    audio_data=request.audio_data,
+                    transcribed_text=request.transcribed_text,
+                    language=request.language,
+                    farmer_mobile=request.farmer_mobile,
+                    catalog_index=catalog_index,
+                    deadline=Deadline.after(budget_ms / 1000) if budget_ms else None,
+                    spawn=lambda coro: graceful_drain.track(asyncio.create_task(coro)),
+                    idempotency_key=idempotency_key
+                )
+                span.set_attribute("outcome", "partial" if response_data["partial"] else "complete")
+                logger.info("Voice processing completed successfully")
+                return response_data
+
+            except DeadlineExceeded as e:
+                span.set_attribute("outcome", "deadline")
+                raise HTTPException(
+                    status_code=504,
+                    detail=f"{e}. Retry with a larger latency_budget_ms, or submit to /api/voice-jobs"
+                )
+            except Exception as e:
+                span.set_attribute("outcome", "error")
+                logger.error(f"Error in complete voice process: {str(e)}")
+                raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+
+    return await get_idempotency_manager().respond(
+        "complete-voice-process", idempotency_key, request.dict(), response, process,
+        owner=request.farmer_mobile or "demo"
+    )
+
+@app.post("/api/voice-jobs", status_code=202)
+async def submit_voice_job(request: VoiceProcessRequest):
+    """Queue a voice listing for background processing and return its job id right away"""
+    if not request.audio_data and not request.transcribed_text:
+        raise HTTPException(status_code=400, detail="Either audio_data or transcribed_text must be provided")
     try:
-        logger.info(f"Processing voice input in language: {request.language}")
-        
-        # Step 1: Speech-to-Text conversion
-        if request.audio_data:
-            transcribed_text = await audio_processor.process_audio(request.audio_data, request.language)
-        elif request.transcribed_text:
-            transcribed_text = request.transcribed_text
-        else:
-            raise HTTPException(status_code=400, detail="Either audio_data or transcribed_text must be provided")
-        
-        logger.info(f"Transcribed text: {transcribed_text}")
-        
-        # Step 2: Extract product information
-        product_info = await ai_client.extract_product_info(transcribed_text, request.language)
-        logger.info(f"Extracted product info: {product_info}")
-        
-        # Step 3: Generate AI suggestions
-        ai_suggestions = await ai_client.generate_suggestions(
-            product_info, 
-            transcribed_text, 
-            request.language
-        )
-        logger.info(f"Generated AI suggestions: {ai_suggestions}")
-        
-        # Step 4: Store in Supabase
-        stored_product = await supabase_client.store_product(
-            product_info=product_info,
-            ai_suggestions=ai_suggestions,
-            transcribed_text=transcribed_text,
-            language=request.language,
-            farmer_mobile=request.farmer_mobile or "demo"
-        )
-        
-        # Step 5: Return complete response
-        response_data = {
-            "success": True,
-            "transcribed_text": transcribed_text,
-            "product": product_info.get("product", ""),
-            "quantity": product_info.get("quantity", ""),
-            "price": product_info.get("price", ""),
-            "description": ai_suggestions.get("description", ""),
-            "suggested_price_range": ai_suggestions.get("price_range", ""),
-            "market_suggestion": ai_suggestions.get("where_to_sell", ""),
-            "selling_tip": ai_suggestions.get("selling_tip", ""),
-            "product_id": stored_product.get("id"),
-            "language": request.language
-        }
-        
-        logger.info("Voice processing completed successfully")
-        return response_data
-        
-    except Exception as e:
-        logger.error(f"Error in complete voice process: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+        job = await voice_jobs.submit(request.dict())
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return {
+        "success": True,
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": f"/api/voice-jobs/{job['id']}",
+        "events_url": f"/api/voice-jobs/{job['id']}/events"
+    }
+
+@app.get("/api/voice-jobs/{job_id}")
+async def get_voice_job(job_id: str):
+    """Poll a voice job; the result is included once it has succeeded"""
+    job = await voice_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return {"success": True, "job": job}
+
+@app.get("/api/voice-jobs/{job_id}/events")
+async def stream_voice_job(job_id: str):
+    """Stream a voice job's progress as Server-Sent Events until it finishes"""
+    if await voice_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+
+    async def events():
+        last_state = None
+        idle_polls = 0
+        while True:
+            job = await voice_jobs.get(job_id)
+            if job is None:
+                yield "event: expired\ndata: {}\n\n"
+                return
+            state = (job["status"], job["stage"])
+            if state != last_state:
+                last_state = state
+                idle_polls = 0
+                yield f"event: {job['status']}\ndata: {json.dumps(job, ensure_ascii=False, default=str)}\n\n"
+            elif idle_polls % 15 == 14:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+            if job["status"] in TERMINAL_STATUSES:
+                return
+            idle_polls += 1
+            await voice_jobs.wait_for_change(job_id, timeout=1.0)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.post("/api/register")
 async def register_farmer(farmer: FarmerCreate):
     """Register a new farmer"""
     try:
-        result = await supabase_client.register_farmer(farmer.dict())
+        result = await get_storage_client().register_farmer(farmer.dict())
         return {"success": True, "message": "Farmer registered successfully", "user": result}
     except Exception as e:
         logger.error(f"Registration error: {str(e)}")
@@ -207,34 +387,41 @@ async def register_farmer(farmer: FarmerCreate):
 async def login_farmer(credentials: Dict[str, str]):
     """Login farmer"""
     try:
-        result = await supabase_client.login_farmer(credentials)
+        result = await get_storage_client().login_farmer(credentials)
         return {"success": True, "message": "Login successful", "user": result}
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
 @app.post("/api/store-product")
-async def store_product(product_data: Dict[str, Any]):
-    """Store product information"""
-    try:
-        result = await supabase_client.store_product(
-            product_info=product_data.get("product_info", {}),
-            ai_suggestions=product_data.get("ai_response", {}),
-            transcribed_text=product_data.get("transcribed_text", ""),
-            language=product_data.get("language", "en"),
-            farmer_mobile=product_data.get("farmer_mobile", "demo"),
-            audio_url=product_data.get("audio_url")
-        )
-        return {"success": True, "message": "Product stored successfully", "product_id": result.get("id")}
-    except Exception as e:
-        logger.error(f"Store product error: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+async def store_product(product_data: Dict[str, Any], response: Response,
+                        idempotency_key: Optional[str] = Header(None, max_length=255)):
+    """Store product information; retries with the same Idempotency-Key store once"""
+    async def store():
+        try:
+            result = await get_storage_client().store_product(
+                product_info=product_data.get("product_info", {}),
+                ai_suggestions=product_data.get("ai_response", {}),
+                transcribed_text=product_data.get("transcribed_text", ""),
+                language=product_data.get("language", "en"),
+                farmer_mobile=product_data.get("farmer_mobile", "demo"),
+                audio_url=product_data.get("audio_url"),
+                idempotency_key=idempotency_key
+            )
+            catalog_index.add_product(result)
+            return {"success": True, "message": "Product stored successfully", "product_id": result.get("id")}
+        except Exception as e:
+            logger.error(f"Store product error: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    return await get_idempotency_manager().respond("store-product", idempotency_key, product_data, response, store,
+                                                   owner=product_data.get("farmer_mobile", "demo"))
 
 @app.post("/api/check-status")
 async def check_product_status(request: Dict[str, str]):
     """Check product status by mobile number"""
     try:
-        products = await supabase_client.get_products_by_mobile(request.get("mobile", ""))
+        products = await get_storage_client().get_products_by_mobile(request.get("mobile", ""))
         return {"success": True, "products": products}
     except Exception as e:
         logger.error(f"Check status error: {str(e)}")
@@ -244,41 +431,179 @@ async def check_product_status(request: Dict[str, str]):
 async def update_product_status(product_id: str, status: str):
     """Update product status (sold/pending)"""
     try:
-        result = await supabase_client.update_product_status(product_id, status)
+        result = await get_storage_client().update_product_status(product_id, status)
+        if result.get("success"):
+            catalog_index.update_status(product_id, status)
         return {"success": True, "message": "Status updated successfully"}
     except Exception as e:
         logger.error(f"Update status error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/update-product-status/bulk")
+async def bulk_update_product_status(request: BulkProductStatusUpdate):
+    """Update the status of many products in a single database round-trip"""
+    try:
+        results = await get_storage_client().bulk_update_product_status(
+            [update.dict() for update in request.updates]
+        )
+        for result in results:
+            if result["success"]:
+                catalog_index.update_status(result["product_id"], result["status"])
+        updated = sum(1 for result in results if result["success"])
+        return {
+            "success": updated == len(results),
+            "message": f"Updated {updated} of {len(results)} products",
+            "updated": updated,
+            "failed": len(results) - updated,
+            "results": results
+        }
+    except Exception as e:
+        logger.error(f"Bulk update status error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/catalog/search")
+async def search_catalog(request: CatalogSearchRequest):
+    """Search product listings across all farmers"""
+    try:
+        filters = request.dict()
+        if catalog_index.complete:
+            products = catalog_index.search(**filters)
+            source = "index"
+        else:
+            products = [summarize_product(row) for row in await get_storage_client().search_products(filters)]
+            source = "database"
+        return {"success": True, "source": source, "count": len(products), "products": products}
+    except Exception as e:
+        logger.error(f"Catalog search error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/farmer-stats/{mobile}")
+async def get_farmer_stats(mobile: str):
+    """Get product statistics for a farmer from the incremental counters"""
+    try:
+        counters = await get_storage_client().get_farmer_stats(mobile)
+        return {"success": True, "stats": FarmerStats.from_counters(counters)}
+    except Exception as e:
+        logger.error(f"Farmer stats error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Background task for unsold product suggestions
 @app.post("/api/check-unsold-products")
-async def check_unsold_products(background_tasks: BackgroundTasks):
-    """Check for unsold products and generate improvement suggestions"""
+async def check_unsold_products():
+    """Run the unsold-product sweep now instead of waiting for the scheduler"""
     try:
-        # Get unsold products older than 7 days
-        unsold_products = await supabase_client.get_unsold_products(days=7)
-        
-        for product in unsold_products:
-            background_tasks.add_task(
-                generate_improvement_suggestions,
-                product["id"],
-                product["product_info"],
-                product["language"]
-            )
-        
-        return {"success": True, "message": f"Processing {len(unsold_products)} unsold products"}
+        if not unsold_sweeper.trigger():
+            return {"success": False, "message": "An unsold product sweep is already running",
+                    "status_url": "/api/maintenance/unsold-sweep"}
+        return {"success": True, "message": "Unsold product sweep started",
+                "status_url": "/api/maintenance/unsold-sweep"}
     except Exception as e:
         logger.error(f"Check unsold products error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def generate_improvement_suggestions(product_id: str, product_info: Dict, language: str):
-    """Generate improvement suggestions for unsold products"""
+@app.get("/api/maintenance/unsold-sweep")
+async def get_unsold_sweep_stats():
+    """Get unsold-product sweep configuration, totals and recent runs"""
+    return {"success": True, "sweep": unsold_sweeper.get_stats()}
+
+@app.get("/api/maintenance/ai-dispatcher")
+async def get_ai_dispatcher_stats():
+    """Get Gemini slot usage and queueing per work class"""
+    return {"success": True, "dispatcher": get_ai_client().dispatcher.get_stats()}
+
+@app.get("/api/maintenance/admission")
+async def get_admission_stats():
+    """Get rate limit settings and per-route admission counters"""
+    return {"success": True, "admission": admission.get_stats()}
+
+@app.get("/api/maintenance/idempotency")
+async def get_idempotency_stats():
+    """Get idempotency key executions, replays and conflicts on this worker"""
+    return {"success": True, "idempotency": get_idempotency_manager().get_stats()}
+
+@app.get("/api/maintenance/memory")
+async def get_memory_stats():
+    """Get RSS, traced memory, kept snapshots and allocation per route"""
+    return {"success": True, "memory": memory_tracker.get_stats()}
+
+def require_memory_admin(token: Optional[str]) -> None:
+    """Reject memory control requests unless X-Admin-Token matches MEMORY_ADMIN_TOKEN"""
+    if memory_tracker.admin_token is None:
+        raise HTTPException(status_code=403, detail="Memory instrumentation is disabled; set MEMORY_ADMIN_TOKEN to enable it")
+    if not memory_tracker.is_admin(token):
+        raise HTTPException(status_code=403, detail="Invalid or missing X-Admin-Token")
+
+@app.post("/api/maintenance/memory/tracemalloc/start")
+async def start_tracemalloc(frames: Optional[int] = None, x_admin_token: Optional[str] = Header(None)):
+    """Start tracing allocations, keeping this many frames per allocation"""
+    require_memory_admin(x_admin_token)
+    if frames is not None and not 1 <= frames <= 50:
+        raise HTTPException(status_code=400, detail="frames must be between 1 and 50")
+    return {"success": True, "memory": memory_tracker.start(frames)}
+
+@app.post("/api/maintenance/memory/tracemalloc/stop")
+async def stop_tracemalloc(x_admin_token: Optional[str] = Header(None)):
+    """Stop tracing allocations"""
+    require_memory_admin(x_admin_token)
+    return {"success": True, "memory": memory_tracker.stop()}
+
+@app.post("/api/maintenance/memory/snapshots")
+async def take_memory_snapshot(group_by: str = "lineno", limit: int = 20, x_admin_token: Optional[str] = Header(None)):
+    """Take a tracemalloc snapshot and return its largest allocation sites"""
+    require_memory_admin(x_admin_token)
+    if group_by not in GROUPINGS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(GROUPINGS)}")
     try:
-        suggestions = await ai_client.generate_improvement_suggestions(product_info, language)
-        await supabase_client.update_product_suggestions(product_id, suggestions)
-        logger.info(f"Generated improvement suggestions for product {product_id}")
-    except Exception as e:
-        logger.error(f"Error generating improvement suggestions: {str(e)}")
+        # Snapshots of a large heap take a while; keep them off the event loop
+        snapshot = await asyncio.to_thread(memory_tracker.take_snapshot)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"success": True, "snapshot": memory_tracker.top(snapshot["id"], group_by, limit)}
+
+@app.get("/api/maintenance/memory/snapshots/{snapshot_id}")
+async def get_memory_snapshot(snapshot_id: str, group_by: str = "lineno", limit: int = 20,
+                              x_admin_token: Optional[str] = Header(None)):
+    """Get the largest allocation sites of a kept snapshot"""
+    require_memory_admin(x_admin_token)
+    if group_by not in GROUPINGS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(GROUPINGS)}")
+    try:
+        return {"success": True, "snapshot": await asyncio.to_thread(memory_tracker.top, snapshot_id, group_by, limit)}
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+
+@app.get("/api/maintenance/memory/diff")
+async def diff_memory_snapshots(base: str, target: str = "now", group_by: str = "lineno", limit: int = 20,
+                                x_admin_token: Optional[str] = Header(None)):
+    """Compare two kept snapshots, or a kept snapshot with a new one (target "now")"""
+    require_memory_admin(x_admin_token)
+    if group_by not in GROUPINGS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(GROUPINGS)}")
+    try:
+        if target == "now":
+            target = (await asyncio.to_thread(memory_tracker.take_snapshot))["id"]
+        return {"success": True, "diff": await asyncio.to_thread(memory_tracker.diff, base, target, group_by, limit)}
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+
+@app.get("/api/maintenance/event-loop")
+async def get_event_loop_stats():
+    """Get event loop lag and the stacks of recent callbacks that blocked the loop"""
+    return {"success": True, "event_loop": loop_monitor.get_stats()}
+
+@app.get("/api/maintenance/profiling")
+async def get_profiling_stats():
+    """Get request profiling triggers, skips and profile files on disk for this worker"""
+    return {"success": True, "profiling": profiler.get_stats()}
+
+@app.get("/api/maintenance/cassettes")
+async def get_cassettes():
+    """Get record/replay cassette mode and recorded, replayed and missed requests"""
+    # Imported here to keep httpx out of startup when cassettes are off
+    from utils.cassette import get_cassette_stats
+    return {"success": True, "cassettes": get_cassette_stats()}
 
 if __name__ == "__main__":
     import uvicorn
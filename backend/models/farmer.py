@@ -4,7 +4,7 @@ Pydantic schemas for farmer data validation
 """
 
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional
+from typing import Optional, Dict, Any
 from datetime import datetime
 
 class FarmerCreate(BaseModel):
@@ -46,4 +46,17 @@ class FarmerStats(BaseModel):
     sold_products: int = Field(..., ge=0, description="Number of sold products")
     pending_products: int = Field(..., ge=0, description="Number of pending products")
     total_revenue: float = Field(..., ge=0, description="Total revenue from sold products")
-    success_rate: float = Field(..., ge=0, le=100, description="Success rate percentage") 
\ No newline at end of file
+    success_rate: float = Field(..., ge=0, le=100, description="Success rate percentage")
+
+    @classmethod
+    def from_counters(cls, counters: Dict[str, Any]) -> "FarmerStats":
+        """Build stats from a farmer_product_stats row"""
+        total = counters.get("total_products", 0)
+        sold = counters.get("sold_products", 0)
+        return cls(
+            total_products=total,
+            sold_products=sold,
+            pending_products=counters.get("pending_products", 0),
+            total_revenue=float(counters.get("total_revenue") or 0),
+            success_rate=round(sold / total * 100, 2) if total else 0.0
+        )
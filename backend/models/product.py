@@ -4,7 +4,7 @@ Pydantic schemas for product data validation
 """
 
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 class ProductCreate(BaseModel):
@@ -35,6 +35,8 @@ class VoiceProcessRequest(BaseModel):
     transcribed_text: Optional[str] = Field(None, description="Pre-transcribed text")
     language: str = Field(default="en", description="Language code")
     farmer_mobile: Optional[str] = Field(None, description="Farmer's mobile number")
+    latency_budget_ms: Optional[int] = Field(None, ge=100, le=120000,
+                                             description="Respond within this many ms, finishing slow stages in the background")
 
 class ProductInfo(BaseModel):
     """Schema for extracted product information"""
@@ -64,8 +66,22 @@ class ProductStatusUpdate(BaseModel):
     product_id: str
     status: str = Field(..., pattern="^(sold|pending|expired)$")
 
+class BulkProductStatusUpdate(BaseModel):
+    """Schema for updating the status of many products at once"""
+    updates: List[ProductStatusUpdate] = Field(..., min_length=1, max_length=500)
+
 class ProductSearchRequest(BaseModel):
     """Schema for searching products"""
     farmer_mobile: str
     status: Optional[str] = None
-    language: Optional[str] = None 
\ No newline at end of file
+    language: Optional[str] = None
+
+class CatalogSearchRequest(BaseModel):
+    """Schema for searching the product catalog across farmers"""
+    query: Optional[str] = Field(None, max_length=100, description="Product name or description text")
+    language: Optional[str] = Field(None, description="Language code")
+    status: Optional[str] = Field("pending", pattern="^(sold|pending|expired)$")
+    min_price: Optional[float] = Field(None, ge=0, description="Minimum price per kg in rupees")
+    max_price: Optional[float] = Field(None, ge=0, description="Maximum price per kg in rupees")
+    created_after: Optional[datetime] = Field(None, description="Only listings created after this time")
+    limit: int = Field(default=20, ge=1, le=100)
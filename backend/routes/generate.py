@@ -4,10 +4,15 @@ Handles AI-powered suggestions and descriptions
 """
 
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional
+import json
 import logging
 
+from utils.ai_dispatcher import ai_work
+from utils.batch import BATCH_MAX_ITEMS, run_batch, summarize_batch
+from utils.clients import get_ai_client
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
@@ -17,6 +22,7 @@ class GenerateRequest(BaseModel):
     product_info: Dict[str, Any]
     original_text: str
     language: str = "en"
+    farmer_mobile: Optional[str] = None
 
 class GenerateResponse(BaseModel):
     """Response model for AI generation"""
@@ -28,44 +34,48 @@ class GenerateResponse(BaseModel):
     language: str
     error: Optional[str] = None
 
+class BatchGenerateRequest(BaseModel):
+    """Request model for generating suggestions for many products at once"""
+    items: List[GenerateRequest] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
 @router.post("/generate", response_model=GenerateResponse)
 async def generate_ai_suggestions(request: GenerateRequest):
     """Generate AI-powered suggestions for product"""
     try:
-        # This would integrate with the GeminiAIClient
-        # For now, return mock response
-        mock_suggestions = {
-            'en': {
-                "description": "Fresh, high-quality tomatoes from local farm. Perfect for daily cooking needs!",
-                "price_range": "₹35 - ₹45 per kg",
-                "where_to_sell": "Local market, nearby towns, or online agri-portals",
-                "selling_tip": "Highlight freshness and organic quality to attract health-conscious buyers"
-            },
-            'hi': {
-                "description": "स्थानीय खेत से ताजे, उच्च गुणवत्ता वाले टमाटर। दैनिक खाना पकाने के लिए बिल्कुल सही!",
-                "price_range": "₹35 - ₹45 प्रति किलो",
-                "where_to_sell": "स्थानीय बाजार, पास के शहर, या ऑनलाइन कृषि पोर्टल",
-                "selling_tip": "स्वास्थ्य-जागरूक खरीदारों को आकर्षित करने के लिए ताजगी और जैविक गुणवत्ता पर जोर दें"
-            },
-            'ta': {
-                "description": "உள்ளூர் பண்ணையில் இருந்து புதிய, உயர்தர தக்காளிகள். தினசரி சமையல் தேவைகளுக்கு சரியானது!",
-                "price_range": "கிலோவுக்கு ₹35 - ₹45",
-                "where_to_sell": "உள்ளூர் சந்தை, அருகிலுள்ள நகரங்கள், அல்லது ஆன்லைன் விவசாய போர்டல்கள்",
-                "selling_tip": "ஆரோக்கியம் கவனிக்கும் வாங்குபவர்களை ஈர்க்க புதுமை மற்றும் கரிம தரத்தை முன்னிலைப்படுத்துங்கள்"
-            }
-        }
-        
-        suggestions = mock_suggestions.get(request.language, mock_suggestions['en'])
-        
+        with ai_work("interactive", request.language, request.farmer_mobile or "demo"):
+            suggestions = await get_ai_client().generate_suggestions(
+                request.product_info, request.original_text, request.language
+            )
         return GenerateResponse(
             success=True,
-            description=suggestions["description"],
-            price_range=suggestions["price_range"],
-            where_to_sell=suggestions["where_to_sell"],
-            selling_tip=suggestions["selling_tip"],
+            description=str(suggestions.get("description", "")),
+            price_range=str(suggestions.get("price_range", "")),
+            where_to_sell=str(suggestions.get("where_to_sell", "")),
+            selling_tip=str(suggestions.get("selling_tip", "")),
             language=request.language
         )
-        
+
     except Exception as e:
         logger.error(f"AI generation error: {e}")
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/generate/batch")
+async def generate_ai_suggestions_batch(request: BatchGenerateRequest):
+    """Generate suggestions for many products concurrently, with a result (or error) per item
+
+    Gemini calls run in the dispatcher's batch class, so a large upload never
+    holds the slots reserved for farmers waiting on the app. Identical items
+    share one call.
+    """
+    ai_client = get_ai_client()
+
+    async def generate(item: GenerateRequest):
+        with ai_work("batch", item.language, item.farmer_mobile or "demo"):
+            suggestions = await ai_client.generate_suggestions(item.product_info, item.original_text, item.language)
+        return {"language": item.language, **suggestions}
+
+    def same_prompt(item: GenerateRequest):
+        return json.dumps(item.product_info, sort_keys=True, ensure_ascii=False), item.original_text, item.language
+
+    results = await run_batch(request.items, generate, key=same_prompt)
+    return summarize_batch(results)
@@ -7,6 +7,10 @@ from fastapi import APIRouter
 from pydantic import BaseModel
 from typing import Dict, Any
 import logging
+import time
+
+from utils.clients import get_ai_client, get_audio_processor, get_storage_client
+from utils.metrics import STARTED_AT, HTTP_REQUESTS, VOICE_ERRORS, GEMINI_ERRORS, VOICE_PARTIAL
 
 logger = logging.getLogger(__name__)
 
@@ -21,30 +25,48 @@ class StatusResponse(BaseModel):
 
 @router.get("/status", response_model=StatusResponse)
 async def get_system_status():
-    """Get system status and health check"""
+    """Get system status and health check
+
+    Reports the configuration of the shared clients and this worker's
+    traffic and error counters; full series are at /metrics.
+    """
     try:
-        # Mock service status for demo
+        ai_client = get_ai_client()
+        storage_status = get_storage_client().get_connection_status()
+        audio_processor = get_audio_processor()
+        api_key_configured = ai_client.api_key != "demo_key"
+
         services = {
             "ai": {
-                "status": "available",
-                "model": "gemini-pro",
-                "api_key_configured": True
+                "status": "available" if api_key_configured else "demo",
+                "model": getattr(ai_client.model, "model_name", "gemini-pro"),
+                "api_key_configured": api_key_configured,
+                "errors": GEMINI_ERRORS.total(),
+                "dispatcher": ai_client.dispatcher.get_stats()
             },
             "database": {
-                "status": "connected",
-                "type": "supabase",
-                "url_configured": True
+                "status": "connected" if storage_status["connected"] else "disconnected",
+                "type": storage_status["backend"],
+                **{key: value for key, value in storage_status.items() if key not in ("connected", "backend")}
             },
             "audio": {
                 "status": "available",
                 "formats": ["wav", "mp3", "ogg"],
-                "languages": ["en", "hi", "ta", "te", "kn", "ml", "gu", "mr", "bn", "or", "pa"]
+                "languages": list(audio_processor.language_codes)
+            },
+            "traffic": {
+                "uptime_seconds": round(time.time() - STARTED_AT, 1),
+                "requests": HTTP_REQUESTS.total(),
+                "server_errors": sum(value for labels, value in HTTP_REQUESTS.items() if labels["status"].startswith("5")),
+                "voice_errors": VOICE_ERRORS.total(),
+                "partial_responses": VOICE_PARTIAL.total()
             }
         }
-        
+
+        healthy = storage_status["connected"]
         return StatusResponse(
-            status="healthy",
-            message="AgriVoice API is running",
+            status="healthy" if healthy else "degraded",
+            message="AgriVoice API is running" if healthy else "Storage backend is not connected",
             version="1.0.0",
             services=services
         )
@@ -56,4 +78,4 @@ async def get_system_status():
             message="System experiencing issues",
             version="1.0.0",
             services={}
-        ) 
\ No newline at end of file
+        ) 
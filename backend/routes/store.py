@@ -3,11 +3,16 @@ Store Routes
 Handles database storage operations
 """
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from fastapi import APIRouter, HTTPException, Request, Response, Header
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional
+import hashlib
 import logging
 
+from utils.batch import BATCH_MAX_ITEMS, summarize_batch
+from utils.clients import get_storage_client
+from utils.idempotency import get_idempotency_manager
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
@@ -28,22 +33,72 @@ class StoreResponse(BaseModel):
     message: str
     error: Optional[str] = None
 
+class BatchStoreItem(StoreRequest):
+    """One product of a batch; items with an idempotency_key already stored for their farmer are not stored again"""
+    idempotency_key: Optional[str] = Field(None, max_length=255)
+
+class BatchStoreRequest(BaseModel):
+    """Request model for storing many products at once"""
+    items: List[BatchStoreItem] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
+def _index_products(http_request: Request, products: List[Dict[str, Any]]) -> None:
+    """Make stored products searchable without waiting for the next catalog refresh"""
+    catalog_index = getattr(http_request.app.state, "catalog_index", None)
+    if catalog_index is not None:
+        for product in products:
+            catalog_index.add_product(product)
+
 @router.post("/store", response_model=StoreResponse)
-async def store_product(request: StoreRequest):
-    """Store product information in database"""
-    try:
-        # This would integrate with the SupabaseClient
-        # For now, return mock response
-        product_id = f"demo_product_{hash(request.transcribed_text) % 1000}"
-        
-        logger.info(f"Product stored successfully with ID: {product_id}")
-        
-        return StoreResponse(
-            success=True,
-            product_id=product_id,
-            message="Product stored successfully"
-        )
-        
-    except Exception as e:
-        logger.error(f"Store product error: {e}")
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+async def store_product(request: StoreRequest, http_request: Request, response: Response,
+                        idempotency_key: Optional[str] = Header(None, max_length=255)):
+    """Store product information in database; retries with the same Idempotency-Key store once"""
+    async def store():
+        try:
+            product = await get_storage_client().store_product(
+                product_info=request.product_info,
+                ai_suggestions=request.ai_suggestions,
+                transcribed_text=request.transcribed_text,
+                language=request.language,
+                farmer_mobile=request.farmer_mobile,
+                audio_url=request.audio_url,
+                idempotency_key=idempotency_key
+            )
+            _index_products(http_request, [product])
+
+            return StoreResponse(
+                success=True,
+                product_id=str(product["id"]),
+                message="Product stored successfully"
+            ).dict()
+
+        except Exception as e:
+            logger.error(f"Store product error: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    return await get_idempotency_manager().respond("store", idempotency_key, request.dict(), response, store,
+                                                   owner=request.farmer_mobile)
+
+@router.post("/store/batch")
+async def store_products_batch(request: BatchStoreRequest, http_request: Request, response: Response,
+                               idempotency_key: Optional[str] = Header(None, max_length=255)):
+    """Store many products in one bulk write, with a result per item
+
+    The write is a single transaction: either every item is stored or every
+    item fails with the same error. Per-item idempotency keys make a retried
+    batch store only the items that are not stored yet.
+    """
+    async def store():
+        try:
+            products = await get_storage_client().bulk_store_products([item.dict() for item in request.items])
+            _index_products(http_request, products)
+            results = [{"index": index, "success": True, "product_id": str(product["id"])}
+                       for index, product in enumerate(products)]
+        except Exception as e:
+            logger.error(f"Batch store error: {e}")
+            results = [{"index": index, "success": False, "error": str(e)} for index in range(len(request.items))]
+        return summarize_batch(results)
+
+    # A batch acts for every farmer in it
+    owner = ",".join(sorted({item.farmer_mobile for item in request.items}))
+    return await get_idempotency_manager().respond("store-batch", idempotency_key, request.dict(), response, store,
+                                                   owner=hashlib.sha256(owner.encode()).hexdigest()[:16])
@@ -4,10 +4,13 @@ Handles speech-to-text conversion
 """
 
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Optional
 import logging
 
+from utils.batch import BATCH_MAX_ITEMS, run_batch, summarize_batch
+from utils.clients import get_audio_processor
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
@@ -16,6 +19,8 @@ class TranscribeRequest(BaseModel):
     """Request model for transcription"""
     audio_data: str
     language: str = "en"
+    # Only read by admission control, which charges the farmer's rate limit
+    farmer_mobile: Optional[str] = None
 
 class TranscribeResponse(BaseModel):
     """Response model for transcription"""
@@ -25,35 +30,35 @@ class TranscribeResponse(BaseModel):
     confidence: Optional[float] = None
     error: Optional[str] = None
 
+class BatchTranscribeRequest(BaseModel):
+    """Request model for transcribing many recordings at once"""
+    items: List[TranscribeRequest] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
 @router.post("/transcribe", response_model=TranscribeResponse)
 async def transcribe_audio(request: TranscribeRequest):
     """Transcribe audio to text"""
     try:
-        # This would integrate with the AudioProcessor
-        # For now, return mock response
-        mock_texts = {
-            'en': "I have 10 kg of fresh tomatoes, selling at ₹40 per kg",
-            'hi': "मेरे पास 10 किलो ताजे टमाटर हैं, ₹40 प्रति किलो में बेच रहा हूं",
-            'ta': "என்னிடம் 10 கிலோ புதிய தக்காளிகள் உள்ளன, கிலோவுக்கு ₹40 விற்கிறேன்",
-            'te': "నా వద్ద 10 కిలోల తాజా టమాటాలు ఉన్నాయి, కిలోకి ₹40 చొప్పున అమ్ముతున్నాను",
-            'kn': "ನನ್ನ ಬಳಿ 10 ಕಿಲೋ ತಾಜಾ ಟೊಮೇಟೊಗಳಿವೆ, ಕಿಲೋಗೆ ₹40 ರಂತೆ ಮಾರಾಟ ಮಾಡುತ್ತಿದ್ದೇನೆ",
-            'ml': "എന്റെ കൈയിൽ 10 കിലോ പുതിയ തക്കാളികൾ ഉണ്ട്, കിലോയ്ക്ക് ₹40 നിരക്കിൽ വിൽക്കുന്നു",
-            'gu': "મારી પાસે 10 કિલો તાજા ટામેટા છે, કિલો દીઠ ₹40 માં વેચું છું",
-            'mr': "माझ्याकडे 10 किलो ताजे टोमॅटो आहेत, किलोला ₹40 दराने विकत आहे",
-            'bn': "আমার কাছে 10 কিলো তাজা টমেটো আছে, কিলো প্রতি ₹40 দরে বিক্রি করছি",
-            'or': "ମୋ ପାଖରେ 10 କିଲୋ ତାଜା ଟମାଟୋ ଅଛି, କିଲୋ ପିଛା ₹40 ଦରରେ ବିକ୍ରି କରୁଛି",
-            'pa': "ਮੇਰੇ ਕੋਲ 10 ਕਿਲੋ ਤਾਜ਼ੇ ਟਮਾਟਰ ਹਨ, ਕਿਲੋ ਪ੍ਰਤੀ ₹40 ਵਿੱਚ ਵੇਚ ਰਿਹਾ ਹਾਂ"
-        }
-        
-        transcribed_text = mock_texts.get(request.language, mock_texts['en'])
-        
+        transcribed_text = await get_audio_processor().process_audio(request.audio_data, request.language)
         return TranscribeResponse(
             success=True,
             transcribed_text=transcribed_text,
-            language=request.language,
-            confidence=0.95
+            language=request.language
         )
-        
+    except ValueError as e:
+        # Undecodable or out-of-range audio
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Transcription error: {e}")
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/transcribe/batch")
+async def transcribe_audio_batch(request: BatchTranscribeRequest):
+    """Transcribe many recordings concurrently, with a result (or error) per item"""
+    audio_processor = get_audio_processor()
+
+    async def transcribe(item: TranscribeRequest):
+        transcribed_text = await audio_processor.process_audio(item.audio_data, item.language)
+        return {"transcribed_text": transcribed_text, "language": item.language}
+
+    results = await run_batch(request.items, transcribe)
+    return summarize_batch(results)
@@ -2,38 +2,201 @@
 """
 AgriVoice Backend Server Startup Script
 Starts the FastAPI server with proper configuration
+
+SERVER_MODE=development (default) runs a single uvicorn process, reloading
+on code changes when DEBUG=True. SERVER_MODE=production preloads the app and
+forks a pool of uvicorn workers that share one listening socket.
 """
 
 import uvicorn
+import importlib.util
+import math
 import os
+import signal
+import socket
 import sys
+import threading
+import time
 from pathlib import Path
 
 # Add the backend directory to Python path
 backend_dir = Path(__file__).parent
 sys.path.insert(0, str(backend_dir))
 
+def default_workers() -> int:
+    """One worker per core available to this process"""
+    if hasattr(os, "sched_getaffinity"):
+        return max(len(os.sched_getaffinity(0)), 1)
+    return os.cpu_count() or 1
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    """Open the listening socket once so every worker accepts from it"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn server that reports draining on /api/health before it stops accepting
+
+    On the first SIGTERM or SIGINT, the drain is flagged right away and
+    uvicorn's own shutdown starts after the grace period. A second signal
+    skips the rest of the grace period.
+    """
+
+    def __init__(self, config: uvicorn.Config, drain, grace: float):
+        super().__init__(config)
+        self.drain = drain
+        self.grace = grace
+
+    def handle_exit(self, sig, frame) -> None:
+        if self.drain.draining or self.grace <= 0:
+            super().handle_exit(sig, frame)
+            return
+        self.drain.draining = True
+        timer = threading.Timer(self.grace, super().handle_exit, (sig, frame))
+        timer.daemon = True
+        timer.start()
+
+def run_worker(app, sock: socket.socket, settings: dict) -> None:
+    """Serve requests in a forked worker until told to stop"""
+    # uvicorn installs its own SIGINT/SIGTERM handlers: stop accepting,
+    # finish open requests, then run the lifespan shutdown drain
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    config = uvicorn.Config(
+        app,
+        loop=settings["loop"],
+        http=settings["http"],
+        timeout_keep_alive=settings["keep_alive"],
+        timeout_graceful_shutdown=settings["graceful_timeout"],
+        backlog=settings["backlog"],
+        log_level=settings["log_level"],
+        lifespan="on"
+    )
+    from main import graceful_drain
+    from utils.shutdown import HEALTH_GRACE_SECONDS
+    DrainingServer(config, graceful_drain, HEALTH_GRACE_SECONDS).run(sockets=[sock])
+
+def run_production(host: str, port: int) -> None:
+    """Preload the app, then fork and supervise a pool of workers"""
+    settings = {
+        "workers": int(os.getenv("WEB_CONCURRENCY", default_workers())),
+        "loop": "uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        "http": "httptools" if importlib.util.find_spec("httptools") else "h11",
+        "keep_alive": int(os.getenv("KEEP_ALIVE_TIMEOUT", 5)),
+        "backlog": int(os.getenv("BACKLOG", 2048)),
+        "graceful_timeout": int(os.getenv("GRACEFUL_TIMEOUT", 30)),
+        "log_level": os.getenv("LOG_LEVEL", "info").lower()
+    }
+
+    print(f"👷 Workers: {settings['workers']} | Loop: {settings['loop']} | HTTP: {settings['http']}")
+    print(f"⏱️  Keep-alive: {settings['keep_alive']}s | Backlog: {settings['backlog']} | Drain: {settings['graceful_timeout']}s")
+
+    if not hasattr(os, "fork"):
+        print("⚠️  fork() is unavailable on this platform, starting workers without preloading")
+        uvicorn.run("main:app", host=host, port=port, workers=settings["workers"], loop=settings["loop"],
+                    http=settings["http"], timeout_keep_alive=settings["keep_alive"], backlog=settings["backlog"],
+                    timeout_graceful_shutdown=settings["graceful_timeout"], log_level=settings["log_level"])
+        return
+
+    # Import the app and the heavy SDKs before forking so workers start with
+    # every module loaded; clients are built in each worker's lifespan
+    from utils.clients import preload_modules
+    preload_modules()
+    from main import app
+    from utils.shutdown import worker_exit_budget
+
+    sock = bind_socket(host, port, settings["backlog"])
+    workers = {}
+    stopping = False
+
+    def spawn() -> None:
+        sys.stdout.flush()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(app, sock, settings)
+            finally:
+                os._exit(0)
+        workers[pid] = time.monotonic()
+
+    def signal_workers(signum: int) -> None:
+        for pid in list(workers):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        if stopping:
+            return
+        stopping = True
+        print(f"\n🛑 Draining {len(workers)} workers...")
+        signal_workers(signal.SIGTERM)
+        # Workers still running after the longest clean exit (health grace,
+        # request drain, then the lifespan's task drain and flushes) are killed
+        signal.alarm(math.ceil(worker_exit_budget(settings["graceful_timeout"])))
+
+    def kill(signum, frame) -> None:
+        signal_workers(signal.SIGKILL)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGALRM, kill)
+
+    for _ in range(settings["workers"]):
+        spawn()
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = workers.pop(pid, None)
+        if started is None or stopping:
+            continue
+        print(f"⚠️  Worker {pid} exited with status {status}, restarting")
+        # Back off when a worker dies right after starting, to avoid a crash loop
+        if time.monotonic() - started < 1:
+            time.sleep(1)
+        spawn()
+
+    sock.close()
+    print("✅ All workers stopped")
+
 def main():
     """Start the AgriVoice backend server"""
-    
+
     # Load environment variables
     from dotenv import load_dotenv
     load_dotenv()
-    
+
     # Get configuration from environment
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", 8000))
     debug = os.getenv("DEBUG", "False").lower() == "true"
-    
+    mode = os.getenv("SERVER_MODE", "development").lower()
+
     print("🌾 Starting AgriVoice Backend Server...")
     print("=" * 60)
     print(f"📍 Server URL: http://{host}:{port}")
+    print(f"🏭 Mode: {mode}")
     print(f"🔧 Debug Mode: {debug}")
     print(f"📚 API Docs: http://{host}:{port}/docs")
     print(f"🔍 Health Check: http://{host}:{port}/api/health")
     print("=" * 60)
-    
+
     try:
+        if mode == "production":
+            run_production(host, port)
+            return
+
         # Start the server
         uvicorn.run(
             "main:app",
@@ -49,4 +212,4 @@ def main():
         print("💡 Check if port is available or try a different port")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,364 @@
+"""
+Admission Control for AgriVoice
+Per-farmer rate limits and per-route concurrency ceilings for the expensive endpoints
+"""
+
+import os
+import json
+import math
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+from utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Identity used when a request carries no farmer_mobile, matching the storage default
+DEFAULT_IDENTITY = "demo"
+
+class MemoryBucketStore:
+    """Token buckets per identity in this process, least recently used evicted first"""
+
+    def __init__(self, max_identities: int = 10000):
+        self.max_identities = max_identities
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    async def take(self, identity: str, rate: float, capacity: float, tokens: float = 1.0) -> float:
+        """Take tokens; returns 0 if admitted, else seconds until they are due
+
+        A charge above capacity is taken from a full bucket, leaving a debt.
+        """
+        bucket = self._buckets.pop(identity, None) or TokenBucket(rate=rate, capacity=capacity)
+        self._buckets[identity] = bucket
+        if len(self._buckets) > self.max_identities:
+            self._buckets.popitem(last=False)
+        minimum = min(tokens, capacity)
+        if bucket.try_acquire(tokens, minimum):
+            return 0.0
+        return bucket.wait_time(minimum)
+
+    async def give(self, identity: str, rate: float, capacity: float, tokens: float) -> None:
+        """Return tokens taken for a request that was then rejected"""
+        bucket = self._buckets.get(identity)
+        if bucket is not None:
+            bucket.give(tokens)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+class SQLiteBucketStore:
+    """Token buckets in a SQLite file, so every worker process on the host shares one limit"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS token_buckets (
+        identity TEXT PRIMARY KEY,
+        tokens REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def _update(self, identity: str, rate: float, capacity: float, change: float, minimum: float) -> float:
+        """Refill, then add change if at least minimum tokens are there; returns the shortfall"""
+        conn = self._connection()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM token_buckets WHERE identity = ?", (identity,)
+            ).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+            shortfall = max(minimum - tokens, 0.0)
+            if not shortfall:
+                tokens = min(capacity, tokens + change)
+            conn.execute(
+                "INSERT OR REPLACE INTO token_buckets (identity, tokens, updated_at) VALUES (?, ?, ?)",
+                (identity, tokens, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return shortfall
+
+    async def take(self, identity: str, rate: float, capacity: float, tokens: float = 1.0) -> float:
+        shortfall = await asyncio.to_thread(self._update, identity, rate, capacity, -tokens, min(tokens, capacity))
+        if not shortfall:
+            return 0.0
+        return shortfall / rate if rate > 0 else float("inf")
+
+    async def give(self, identity: str, rate: float, capacity: float, tokens: float) -> None:
+        await asyncio.to_thread(self._update, identity, rate, capacity, tokens, float("-inf"))
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM token_buckets").fetchone()[0]
+
+def create_bucket_store():
+    """Create the bucket store selected by ADMISSION_BUCKET_BACKEND (memory or sqlite)"""
+    backend = os.getenv("ADMISSION_BUCKET_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        return SQLiteBucketStore(os.getenv("ADMISSION_BUCKET_PATH", "admission.db"))
+    if backend != "memory":
+        logger.warning(f"Unknown ADMISSION_BUCKET_BACKEND '{backend}', falling back to memory")
+    return MemoryBucketStore()
+
+class RouteGate:
+    """Concurrency ceiling for one route with a bounded wait
+
+    Requests over the ceiling wait for a slot. A request is turned away
+    straight away when the expected wait (queue length times the average
+    service time, spread over the slots) already exceeds the latency target,
+    and after waiting the full target otherwise.
+    """
+
+    def __init__(self, limit: int, latency_target: float):
+        self.limit = limit
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self.waiting = 0
+        self.avg_seconds = 0.0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    def expected_wait(self) -> float:
+        if self.in_flight < self.limit:
+            return 0.0
+        return (self.waiting + 1) * self.avg_seconds / self.limit
+
+    async def enter(self) -> Optional[float]:
+        """Take a slot; returns None when admitted, else a Retry-After in seconds"""
+        expected = self.expected_wait()
+        if expected > self.latency_target:
+            return expected
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.latency_target)
+        except asyncio.TimeoutError:
+            return max(self.expected_wait(), 1.0)
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        return None
+
+    def leave(self, seconds: float) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+        # Exponentially weighted so the estimate follows Gemini latency shifts
+        self.avg_seconds = seconds if not self.avg_seconds else 0.8 * self.avg_seconds + 0.2 * seconds
+
+class AdmissionController:
+    """Decides whether a request to a guarded route runs, waits or is rejected
+
+    Each guarded POST route may have a per-identity token bucket (identity is
+    the X-Farmer-Mobile header, else the farmer_mobile field of the JSON body,
+    else "demo") and a concurrency ceiling. A farmer has one bucket shared by
+    all guarded routes. Batch routes cost one token per item, charged to each
+    item's farmer_mobile (else the request's identity); if any farmer in the
+    batch is over their rate, the tokens taken from the others are returned.
+    Rejections are 429 when a farmer is over their rate and 503 when the
+    route is saturated, both with Retry-After.
+    """
+
+    def __init__(self, store=None, rate_per_minute: Optional[float] = None, burst: Optional[float] = None,
+                 demo_rate_per_minute: Optional[float] = None, latency_target_ms: Optional[float] = None):
+        self.store = store or create_bucket_store()
+        self.rate = (rate_per_minute or float(os.getenv("ADMISSION_RATE_PER_MINUTE", 10))) / 60
+        self.burst = burst or float(os.getenv("ADMISSION_BURST", 5))
+        self.demo_rate = (demo_rate_per_minute or float(os.getenv("ADMISSION_DEMO_RATE_PER_MINUTE", 30))) / 60
+        latency_target = (latency_target_ms or float(os.getenv("ADMISSION_LATENCY_TARGET_MS", 10000))) / 1000
+        voice_concurrency = int(os.getenv("ADMISSION_VOICE_CONCURRENCY", 16))
+
+        # path -> (limit by identity, gate or None, charged per item)
+        self.routes: Dict[str, Tuple[bool, Optional[RouteGate], bool]] = {
+            "/api/complete-voice-process": (True, RouteGate(voice_concurrency, latency_target) if voice_concurrency else None, False),
+            "/api/voice-jobs": (True, None, False),
+            "/api/transcribe": (True, None, False),
+            "/api/transcribe/batch": (True, None, True),
+            "/api/generate": (True, None, False),
+            "/api/generate/batch": (True, None, True),
+            "/api/store": (True, None, False),
+            "/api/store/batch": (True, None, True)
+        }
+        self.counters = {path: {"admitted": 0, "rate_limited": 0, "overloaded": 0} for path in self.routes}
+
+    def guards(self, method: str, path: str) -> bool:
+        return method == "POST" and path in self.routes
+
+    def needs_identity(self, path: str) -> bool:
+        return self.routes[path][0]
+
+    def is_batch(self, path: str) -> bool:
+        return self.routes[path][2]
+
+    async def admit(self, path: str, identity: Optional[str],
+                    item_farmers: Optional[List[Optional[str]]] = None) -> Optional[JSONResponse]:
+        """Admit a request (returns None) or build its rejection response
+
+        item_farmers holds the farmer_mobile of each item of a batch request.
+        """
+        limit_identity, gate, batch = self.routes[path]
+        if limit_identity:
+            identity = identity or DEFAULT_IDENTITY
+            if batch and item_farmers:
+                charges = Counter(farmer or identity for farmer in item_farmers)
+            else:
+                charges = Counter({identity: 1})
+            taken = []
+            for farmer, tokens in charges.items():
+                retry_after = await self.store.take(farmer, self._rate(farmer), self.burst, tokens)
+                if retry_after:
+                    for taken_farmer, taken_tokens in taken:
+                        await self.store.give(taken_farmer, self._rate(taken_farmer), self.burst, taken_tokens)
+                    self.counters[path]["rate_limited"] += 1
+                    logger.warning(f"Rate limited {path} for {farmer}, retry in {retry_after:.1f}s")
+                    return self._reject(429, "Too many requests for this farmer, please retry later", retry_after)
+                taken.append((farmer, tokens))
+
+        if gate is not None:
+            retry_after = await gate.enter()
+            if retry_after is not None:
+                self.counters[path]["overloaded"] += 1
+                logger.warning(f"Shed {path}: {gate.in_flight} in flight, {gate.waiting} waiting")
+                return self._reject(503, "Server is busy, please retry later", retry_after)
+
+        self.counters[path]["admitted"] += 1
+        return None
+
+    def _rate(self, identity: str) -> float:
+        return self.demo_rate if identity == DEFAULT_IDENTITY else self.rate
+
+    def release(self, path: str, seconds: float) -> None:
+        gate = self.routes[path][1]
+        if gate is not None:
+            gate.leave(seconds)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get rates, tracked identities and per-route counters and queue state"""
+        routes = {}
+        for path, (limit_identity, gate, batch) in self.routes.items():
+            routes[path] = {"limit_by_farmer": limit_identity, "charged_per_item": batch, **self.counters[path]}
+            if gate is not None:
+                routes[path].update({
+                    "concurrency_limit": gate.limit,
+                    "in_flight": gate.in_flight,
+                    "waiting": gate.waiting,
+                    "avg_latency_ms": round(gate.avg_seconds * 1000, 1)
+                })
+        return {
+            "rate_per_minute": self.rate * 60,
+            "burst": self.burst,
+            "demo_rate_per_minute": self.demo_rate * 60,
+            "tracked_identities": len(self.store),
+            "routes": routes
+        }
+
+    @staticmethod
+    def _reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+        return JSONResponse(
+            {"detail": detail},
+            status_code=status_code,
+            headers={"Retry-After": str(max(math.ceil(retry_after), 1))}
+        )
+
+class AdmissionMiddleware:
+    """ASGI middleware applying an AdmissionController before the route runs
+
+    The request body of a guarded route is read here to find farmer_mobile
+    (and each batch item's farmer_mobile) and then replayed to the route
+    unchanged.
+    """
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.controller.guards(scope["method"], scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        identity = None
+        item_farmers = None
+        if self.controller.needs_identity(path):
+            headers = dict(scope["headers"])
+            identity = headers.get(b"x-farmer-mobile", b"").decode("latin-1") or None
+            batch = self.controller.is_batch(path)
+            if identity is None or batch:
+                messages, body = await self._read_body(receive)
+                receive = self._replay(messages, receive)
+                identity = identity or self._farmer_from_body(body)
+                if batch:
+                    item_farmers = self._item_farmers(body)
+
+        rejection = await self.controller.admit(path, identity, item_farmers)
+        if rejection is not None:
+            await rejection(scope, receive, send)
+            return
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(path, time.monotonic() - started)
+
+    @staticmethod
+    async def _read_body(receive):
+        messages = []
+        chunks = []
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        return messages, b"".join(chunks)
+
+    @staticmethod
+    def _replay(messages, receive):
+        pending = list(messages)
+
+        async def replay():
+            if pending:
+                return pending.pop(0)
+            return await receive()
+
+        return replay
+
+    @staticmethod
+    def _item_farmers(body: bytes) -> Optional[List[Optional[str]]]:
+        """farmer_mobile of each item of a batch body, None where an item has none"""
+        try:
+            items = json.loads(body).get("items")
+            return [str(item["farmer_mobile"]) if item.get("farmer_mobile") else None for item in items]
+        except (ValueError, AttributeError, TypeError):
+            return None
+
+    @staticmethod
+    def _farmer_from_body(body: bytes) -> Optional[str]:
+        try:
+            farmer_mobile = json.loads(body).get("farmer_mobile")
+        except (ValueError, AttributeError):
+            return None
+        return str(farmer_mobile) if farmer_mobile else None
@@ -3,43 +3,68 @@ Gemini AI Client for AgriVoice
 Handles AI-powered product analysis and suggestions
 """
 
-import google.generativeai as genai
 import json
+import time
 import logging
 from typing import Dict, Any, Optional
 import os
 
+from utils.ai_dispatcher import AIDispatcher, current_ai_work
+from utils.deadline import Deadline, DeadlineExceeded, run_within
+from utils.metrics import GEMINI_ERRORS
+from utils.tracing import start_span
+
 logger = logging.getLogger(__name__)
 
 class GeminiAIClient:
     """Client for interacting with Google's Gemini AI"""
     
-    def __init__(self):
+    def __init__(self, dispatcher: Optional[AIDispatcher] = None):
+        self.dispatcher = dispatcher or AIDispatcher()
         self.api_key = os.getenv("GEMINI_API_KEY")
         if not self.api_key:
             logger.warning("GEMINI_API_KEY not found in environment variables")
             self.api_key = "demo_key"  # For demo purposes
         
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-pro')
+        from utils.cassette import cassette_transport
+        endpoint = os.getenv("GEMINI_API_ENDPOINT")
+        transport = cassette_transport("gemini")
+        if endpoint or transport is not None:
+            # Plain REST, e.g. through a proxy, against a local stub in load tests
+            # or recorded to / replayed from a cassette
+            from utils.gemini_rest import GeminiRESTModel, DEFAULT_ENDPOINT
+            endpoint = endpoint or DEFAULT_ENDPOINT
+            self.model = GeminiRESTModel(endpoint, self.api_key, transport=transport)
+            logger.info(f"Using Gemini REST endpoint {endpoint}")
+        else:
+            # Imported here rather than at module level because it takes most of a second
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key)
+            self.model = genai.GenerativeModel('gemini-pro')
         
-    async def extract_product_info(self, text: str, language: str) -> Dict[str, Any]:
+    async def extract_product_info(self, text: str, language: str,
+                                   deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """Extract structured product information from transcribed text"""
         try:
             prompt = self._create_extraction_prompt(text, language)
-            response = await self._generate_text(prompt)
+            response = await self._generate_text(prompt, deadline)
             return self._parse_product_extraction(response, text)
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error extracting product info: {e}")
             return self._fallback_product_info(text)
     
     async def generate_suggestions(self, product_info: Dict[str, Any], 
-                                 original_text: str, language: str) -> Dict[str, Any]:
+                                 original_text: str, language: str,
+                                 deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """Generate AI-powered suggestions for the product"""
         try:
             prompt = self._create_suggestions_prompt(product_info, original_text, language)
-            response = await self._generate_text(prompt)
+            response = await self._generate_text(prompt, deadline)
             return self._parse_ai_suggestions(response, language)
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error generating suggestions: {e}")
             return self._fallback_suggestions(language)
@@ -129,14 +154,42 @@ class GeminiAIClient:
         }}
         """
     
-    async def _generate_text(self, prompt: str) -> str:
-        """Generate text using Gemini AI"""
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            logger.error(f"Error generating text with Gemini: {e}")
-            return ""
+    async def _generate_text(self, prompt: str, deadline: Optional[Deadline] = None) -> str:
+        """Generate text using Gemini AI
+
+        The call waits for a dispatcher slot in the work class set by the
+        caller's ai_work() block (interactive by default). With a deadline,
+        time spent queued counts against it, and the call is abandoned with
+        DeadlineExceeded when the budget runs out instead of falling back to
+        an empty response.
+        """
+        priority, language, _ = current_ai_work()
+
+        async def call():
+            queued = time.perf_counter()
+            async with self.dispatcher.slot():
+                span.set_attribute("queue_wait_ms", round((time.perf_counter() - queued) * 1000, 2))
+                request_options = None
+                if deadline is not None:
+                    deadline.check("Gemini call")
+                    request_options = {"timeout": deadline.remaining()}
+                return await self.model.generate_content_async(prompt, request_options=request_options)
+
+        with start_span("gemini.generate_content", language=language, priority=priority,
+                        prompt_chars=len(prompt)) as span:
+            try:
+                response = await run_within(deadline, call(), "Gemini call")
+                span.set_attributes(response_chars=len(response.text), outcome="ok")
+                return response.text
+            except DeadlineExceeded:
+                span.set_attribute("outcome", "deadline")
+                raise
+            except Exception as e:
+                logger.error(f"Error generating text with Gemini: {e}")
+                GEMINI_ERRORS.inc(language=language or "unknown", priority=priority)
+                span.record_error(e)
+                span.set_attribute("outcome", "fallback")
+                return ""
     
     def _parse_product_extraction(self, ai_response: str, original_text: str) -> Dict[str, Any]:
         """Parse AI response to extract structured product information"""
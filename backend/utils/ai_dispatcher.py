@@ -0,0 +1,193 @@
+"""
+AI Dispatcher for AgriVoice
+Priority-aware, fair admission of Gemini calls
+"""
+
+import os
+import heapq
+import asyncio
+import logging
+import itertools
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Work classes in strict priority order
+PRIORITIES = ("interactive", "batch", "maintenance")
+
+# (priority, language, farmer) of the work the current task is doing
+_current_work: ContextVar[Tuple[str, Optional[str], Optional[str]]] = ContextVar(
+    "ai_work", default=("interactive", None, None)
+)
+
+@contextmanager
+def ai_work(priority: str, language: Optional[str] = None, farmer: Optional[str] = None):
+    """Tag Gemini calls made inside the block (and tasks started from it) with a work class"""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown AI work priority: {priority}")
+    token = _current_work.set((priority, language, farmer))
+    try:
+        yield
+    finally:
+        _current_work.reset(token)
+
+def current_ai_work() -> Tuple[str, Optional[str], Optional[str]]:
+    return _current_work.get()
+
+class _Waiter:
+    __slots__ = ("future", "flow", "cancelled")
+
+    def __init__(self, future: asyncio.Future, flow: Tuple[Optional[str], Optional[str]]):
+        self.future = future
+        self.flow = flow
+        self.cancelled = False
+
+class AIDispatcher:
+    """Admits Gemini calls by priority class, fairly across languages and farmers
+
+    At most max_concurrency calls run at once, and batch plus maintenance
+    calls together never hold more than max_concurrency - reserved_interactive
+    slots. Whenever a slot frees up, queued interactive calls go first, then
+    batch, then maintenance.
+
+    Within a class, calls are ordered by start-time fair queuing over
+    (language, farmer) flows. A call's cost is the number of that language's
+    flows currently queued, so each language gets an equal share and its
+    share is split evenly between its farmers. One farmer retrying in a loop
+    only delays their own calls.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None, reserved_interactive: Optional[int] = None):
+        self.max_concurrency = max_concurrency or int(os.getenv("GEMINI_MAX_CONCURRENCY", 8))
+        reserved = reserved_interactive if reserved_interactive is not None else int(os.getenv("GEMINI_INTERACTIVE_RESERVED", 2))
+        self.reserved_interactive = min(max(reserved, 0), self.max_concurrency - 1)
+
+        self._active = {priority: 0 for priority in PRIORITIES}
+        self._queues: Dict[str, List] = {priority: [] for priority in PRIORITIES}
+        self._virtual_time = {priority: 0.0 for priority in PRIORITIES}
+        self._flow_finish: Dict[str, Dict[Tuple, float]] = {priority: {} for priority in PRIORITIES}
+        self._queued_flows: Dict[str, Dict[Tuple, int]] = {priority: {} for priority in PRIORITIES}
+        self._sequence = itertools.count()
+        self._stats = {priority: {"dispatched": 0, "queued": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+                       for priority in PRIORITIES}
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[str] = None, language: Optional[str] = None,
+                   farmer: Optional[str] = None):
+        """Hold one call slot for the block; defaults come from the current ai_work()"""
+        work_priority, work_language, work_farmer = current_ai_work()
+        priority = priority or work_priority
+        await self.acquire(priority, language or work_language, farmer or work_farmer)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    async def acquire(self, priority: str, language: Optional[str], farmer: Optional[str]) -> None:
+        """Wait for a call slot"""
+        started = time.monotonic()
+        if not self._has_waiters(up_to=priority) and self._can_start(priority):
+            self._start(priority, started)
+            return
+
+        flow = (language, farmer)
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), flow)
+        self._enqueue(priority, waiter)
+        self._stats[priority]["queued"] += 1
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted and cancelled in the same tick: hand the slot on
+                self.release(priority)
+            else:
+                waiter.cancelled = True
+                self._forget(priority, flow)
+            raise
+        self._record_wait(priority, time.monotonic() - started)
+
+    def release(self, priority: str) -> None:
+        """Return a call slot and admit whoever is next"""
+        self._active[priority] -= 1
+        self._dispatch()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get slot usage, queue depths and wait times per class"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "reserved_interactive": self.reserved_interactive,
+            "classes": {
+                priority: {
+                    "active": self._active[priority],
+                    "waiting": sum(self._queued_flows[priority].values()),
+                    **{key: round(value, 4) if isinstance(value, float) else value
+                       for key, value in self._stats[priority].items()}
+                }
+                for priority in PRIORITIES
+            }
+        }
+
+    def _can_start(self, priority: str) -> bool:
+        total = sum(self._active.values())
+        if total >= self.max_concurrency:
+            return False
+        if priority == "interactive":
+            return True
+        background = total - self._active["interactive"]
+        return background < self.max_concurrency - self.reserved_interactive
+
+    def _has_waiters(self, up_to: str) -> bool:
+        """Whether anyone of this priority or higher is queued"""
+        for priority in PRIORITIES[:PRIORITIES.index(up_to) + 1]:
+            if self._queued_flows[priority]:
+                return True
+        return False
+
+    def _enqueue(self, priority: str, waiter: _Waiter) -> None:
+        queued_flows = self._queued_flows[priority]
+        queued_flows[waiter.flow] = queued_flows.get(waiter.flow, 0) + 1
+        language_flows = sum(1 for flow in queued_flows if flow[0] == waiter.flow[0])
+
+        flow_finish = self._flow_finish[priority]
+        start_tag = max(self._virtual_time[priority], flow_finish.get(waiter.flow, 0.0))
+        flow_finish[waiter.flow] = start_tag + language_flows
+        heapq.heappush(self._queues[priority], (start_tag, next(self._sequence), waiter))
+
+    def _forget(self, priority: str, flow: Tuple) -> None:
+        queued_flows = self._queued_flows[priority]
+        queued_flows[flow] -= 1
+        if not queued_flows[flow]:
+            del queued_flows[flow]
+
+    def _start(self, priority: str, started: float) -> None:
+        self._active[priority] += 1
+        self._record_wait(priority, time.monotonic() - started)
+
+    def _record_wait(self, priority: str, waited: float) -> None:
+        stats = self._stats[priority]
+        stats["dispatched"] += 1
+        stats["wait_seconds"] += waited
+        stats["max_wait_seconds"] = max(stats["max_wait_seconds"], waited)
+
+    def _dispatch(self) -> None:
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            while queue and self._can_start(priority):
+                start_tag, _, waiter = heapq.heappop(queue)
+                if waiter.cancelled or waiter.future.done():
+                    # Cancelled while queued; acquire() cleans up its flow count
+                    continue
+                self._virtual_time[priority] = start_tag
+                self._forget(priority, waiter.flow)
+                self._active[priority] += 1
+                waiter.future.set_result(None)
+            if not queue:
+                # Idle class: reset fairness state so it cannot grow without bound
+                self._virtual_time[priority] = 0.0
+                self._flow_finish[priority].clear()
+            elif self._queued_flows[priority]:
+                # Strict priority: lower classes wait while this one has queued work
+                return
@@ -0,0 +1,168 @@
+"""
+Asset Manifest for AgriVoice
+Fingerprints frontend static assets and serves them with immutable caching
+"""
+
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from fastapi.responses import Response
+from starlette.datastructures import Headers
+from starlette.staticfiles import StaticFiles
+
+from utils.page_cache import compress_variants, negotiate_encoding, etag_matches
+
+logger = logging.getLogger(__name__)
+
+# File types that get fingerprinted; HTML pages are served by the page cache
+ASSET_EXTENSIONS = {".css", ".js", ".svg", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".ico", ".woff", ".woff2"}
+
+# src="..." and href="..." attributes in the served HTML
+ASSET_REFERENCE = re.compile(r"""(?P<attr>\b(?:src|href)=)(?P<quote>["'])(?P<url>[^"'#?]+)(?P=quote)""")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def fingerprint(path: str, digest: str) -> str:
+    """Insert a content hash before the extension, e.g. css/styles.css -> css/styles.1a2b3c4d5e6f.css"""
+    stem, extension = os.path.splitext(path)
+    return f"{stem}.{digest}{extension}"
+
+class Asset:
+    """One static asset held in memory with every encoding precomputed"""
+
+    def __init__(self, path: str, body: bytes, mtime: float):
+        self.path = path
+        self.mtime = mtime
+        self.digest = hashlib.sha256(body).hexdigest()[:12]
+        self.hashed_path = fingerprint(path, self.digest)
+        self.media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.variants = compress_variants(body)
+
+class AssetManifest:
+    """Content-hash manifest of the frontend static assets
+
+    build() fingerprints every asset under the frontend directory, and
+    rewrite() points the asset references in an HTML page at the hashed URLs.
+    A hashed URL changes whenever the file's content does, so those URLs can
+    be cached by browsers forever. With reload enabled (DEBUG=True), refresh()
+    re-hashes edited assets and bumps the version so pages are re-rendered.
+    """
+
+    def __init__(self, directory: Path, url_prefix: str = "/static", reload: Optional[bool] = None):
+        self.directory = Path(directory)
+        self.url_prefix = url_prefix.rstrip("/")
+        self.reload = reload if reload is not None else os.getenv("DEBUG", "False").lower() == "true"
+        self.version = 0
+        self._assets: Dict[str, Asset] = {}
+        self._hashed: Dict[str, Asset] = {}
+
+    def build(self) -> None:
+        """Fingerprint every asset in the frontend directory"""
+        self._assets.clear()
+        self._hashed.clear()
+        for path in sorted(self.directory.rglob("*")):
+            if path.is_file() and path.suffix.lower() in ASSET_EXTENSIONS and "node_modules" not in path.parts:
+                self._load(path)
+        self.version += 1
+        logger.info(f"Asset manifest built with {len(self._assets)} assets")
+
+    def refresh(self) -> int:
+        """Re-hash assets edited since the last build when reload is enabled, returning the version"""
+        if not self.reload:
+            return self.version
+
+        current = {}
+        for path in self.directory.rglob("*"):
+            if path.is_file() and path.suffix.lower() in ASSET_EXTENSIONS and "node_modules" not in path.parts:
+                current[path.relative_to(self.directory).as_posix()] = path.stat().st_mtime
+        known = {name: asset.mtime for name, asset in self._assets.items()}
+        if current != known:
+            self.build()
+        return self.version
+
+    def url_for(self, path: str) -> Optional[str]:
+        """Get the fingerprinted URL of an asset path relative to the frontend directory"""
+        asset = self._assets.get(path.lstrip("/"))
+        return f"{self.url_prefix}/{asset.hashed_path}" if asset else None
+
+    def rewrite(self, html: str) -> str:
+        """Point asset references in an HTML page at their fingerprinted URLs
+
+        Handles both /static/... references and bare relative ones such as
+        src="app.js", which resolve against the frontend directory. Other
+        links are left untouched.
+        """
+        def replace(match: "re.Match") -> str:
+            url = match.group("url")
+            if url.startswith(self.url_prefix + "/"):
+                path = url[len(self.url_prefix) + 1:]
+            elif "://" in url or url.startswith(("/", "data:", "mailto:")):
+                return match.group(0)
+            else:
+                path = url.removeprefix("./")
+            hashed_url = self.url_for(path)
+            if hashed_url is None:
+                return match.group(0)
+            return f"{match.group('attr')}{match.group('quote')}{hashed_url}{match.group('quote')}"
+
+        return ASSET_REFERENCE.sub(replace, html)
+
+    def get_hashed(self, hashed_path: str) -> Optional[Asset]:
+        """Look up an asset by its fingerprinted path"""
+        return self._hashed.get(hashed_path)
+
+    def get_manifest(self) -> Dict[str, str]:
+        """Map each asset path to its fingerprinted path"""
+        return {name: asset.hashed_path for name, asset in self._assets.items()}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get manifest size information"""
+        return {
+            "assets": len(self._assets),
+            "bytes": sum(len(variant["body"]) for asset in self._assets.values() for variant in asset.variants.values()),
+            "version": self.version
+        }
+
+    def _load(self, path: Path) -> None:
+        """Read an asset from disk and precompute its variants"""
+        name = path.relative_to(self.directory).as_posix()
+        asset = Asset(name, path.read_bytes(), path.stat().st_mtime)
+        self._assets[name] = asset
+        self._hashed[asset.hashed_path] = asset
+
+class FingerprintedStaticFiles(StaticFiles):
+    """StaticFiles that serves fingerprinted URLs from the manifest with immutable caching
+
+    Unhashed paths fall through to the regular StaticFiles behaviour.
+    """
+
+    def __init__(self, *args, manifest: AssetManifest, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.manifest = manifest
+
+    async def get_response(self, path: str, scope) -> Response:
+        asset = self.manifest.get_hashed(path.replace(os.sep, "/"))
+        if asset is None or scope["method"] not in ("GET", "HEAD"):
+            return await super().get_response(path, scope)
+
+        request_headers = Headers(scope=scope)
+        encoding = negotiate_encoding(request_headers.get("accept-encoding", ""), list(asset.variants))
+        variant = asset.variants[encoding]
+        headers = {
+            "ETag": variant["etag"],
+            "Vary": "Accept-Encoding",
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL
+        }
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, [v["etag"] for v in asset.variants.values()]):
+            return Response(status_code=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=variant["body"], media_type=asset.media_type, headers=headers)
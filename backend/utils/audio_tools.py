@@ -5,17 +5,20 @@ Handles audio processing, validation, and transcription
 
 import base64
 import logging
-import speech_recognition as sr
 from typing import Dict, Any, Optional
 import os
 
+from utils.deadline import Deadline
+from utils.metrics import stage_timer
+from utils.tracing import start_span
+
 logger = logging.getLogger(__name__)
 
 class AudioProcessor:
     """Handles audio processing and transcription"""
     
     def __init__(self):
-        self.recognizer = sr.Recognizer()
+        self._recognizer = None
         self.language_codes = {
             'en': 'en-US',
             'hi': 'hi-IN',
@@ -30,20 +33,34 @@ class AudioProcessor:
             'pa': 'pa-IN'
         }
     
-    async def process_audio(self, audio_data: str, language: str) -> str:
+    @property
+    def recognizer(self):
+        """Speech recognizer, imported and built on first use"""
+        if self._recognizer is None:
+            import speech_recognition as sr
+            self._recognizer = sr.Recognizer()
+        return self._recognizer
+
+    async def process_audio(self, audio_data: str, language: str, deadline: Optional[Deadline] = None) -> str:
         """Process base64 audio data and return transcribed text"""
         try:
-            # Decode base64 audio
-            audio_bytes = base64.b64decode(audio_data)
-            
-            # Validate audio format
-            validation = self.validate_audio_format(audio_bytes)
-            if not validation["valid"]:
-                raise ValueError(validation["error"])
-            
-            # For demo purposes, use mock transcription
-            # In production, integrate with Google STT or Whisper
-            transcribed_text = self._get_mock_transcription(language)
+            if deadline is not None:
+                deadline.check("transcription")
+
+            with stage_timer("decode", language), start_span("audio.decode", language=language) as span:
+                # Decode base64 audio
+                audio_bytes = base64.b64decode(audio_data)
+                span.set_attributes(encoded_bytes=len(audio_data), audio_bytes=len(audio_bytes))
+
+                # Validate audio format
+                validation = self.validate_audio_format(audio_bytes)
+                if not validation["valid"]:
+                    raise ValueError(validation["error"])
+
+            with stage_timer("stt", language), start_span("audio.stt", language=language):
+                # For demo purposes, use mock transcription
+                # In production, integrate with Google STT or Whisper
+                transcribed_text = self._get_mock_transcription(language)
             
             logger.info(f"Audio processed successfully for language: {language}")
             return transcribed_text
@@ -0,0 +1,59 @@
+"""
+Batch Processing for AgriVoice
+Bounded-concurrency fan-out over the items of a batch request, with per-item results
+"""
+
+import os
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Hashable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Items accepted in one batch request
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 100))
+
+async def run_batch(items: List[T], process: Callable[[T], Awaitable[Dict[str, Any]]],
+                    concurrency: Optional[int] = None,
+                    key: Optional[Callable[[T], Hashable]] = None) -> List[Dict[str, Any]]:
+    """Process items with a fixed pool of workers and return one result per item, in order
+
+    Each result is {"index", "success": True, **process(item)}, or
+    {"index", "success": False, "error"} when process raised, so one bad item
+    never fails the batch. At most concurrency items (default
+    BATCH_CONCURRENCY) are processed at once. With a key function, items
+    with equal keys are processed once and share the result.
+    """
+    concurrency = concurrency or int(os.getenv("BATCH_CONCURRENCY", 4))
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+
+    # Indexes of the items each unique item stands for
+    groups: Dict[Hashable, List[int]] = {}
+    for index, item in enumerate(items):
+        groups.setdefault(key(item) if key else index, []).append(index)
+    pending = iter(groups.values())
+
+    async def worker():
+        for indexes in pending:
+            try:
+                result = {"success": True, **await process(items[indexes[0]])}
+            except Exception as e:
+                logger.error(f"Batch item {indexes[0]} failed: {e}")
+                result = {"success": False, "error": str(e)}
+            for index in indexes:
+                results[index] = {"index": index, **result}
+
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, len(groups)))))
+    return results
+
+def summarize_batch(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Response body for a batch: overall success, counts and the per-item results"""
+    succeeded = sum(1 for result in results if result["success"])
+    return {
+        "success": succeeded == len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "results": results
+    }
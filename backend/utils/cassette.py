@@ -0,0 +1,271 @@
+"""
+Record/Replay Cassettes for AgriVoice
+httpx transports that record Gemini and Supabase HTTP exchanges once and replay them offline with their original timings
+"""
+
+import os
+import re
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, Any, List, Optional
+from urllib.parse import parse_qsl
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "record", "replay")
+
+# Values that change on every run and would otherwise make every request unique
+TIMESTAMP = re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(\.\d+)?([+-]\d{2}:?\d{2}|Z)?$")
+
+# Response headers that describe the recorded transfer rather than the content
+HOP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive", "date"}
+
+class CassetteMiss(httpx.TransportError):
+    """Raised in replay mode for a request that was never recorded
+
+    A transport error, so clients handle it like the network being down.
+    """
+
+def cassette_mode() -> str:
+    """Mode selected by CASSETTE_MODE (off, record or replay)"""
+    mode = os.getenv("CASSETTE_MODE", "off").lower()
+    if mode not in MODES:
+        logger.warning(f"Unknown CASSETTE_MODE '{mode}', cassettes disabled")
+        return "off"
+    return mode
+
+def _mask(value: Any, ignored: frozenset) -> Any:
+    if isinstance(value, dict):
+        return {key: "<ignored>" if key in ignored else _mask(item, ignored) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_mask(item, ignored) for item in value]
+    if isinstance(value, str):
+        # Filters carry values as "lt.2024-05-01T10:00:00"
+        operator, dot, rest = value.partition(".")
+        if TIMESTAMP.match(value):
+            return "<timestamp>"
+        if dot and operator.isalpha() and TIMESTAMP.match(rest):
+            return f"{operator}.<timestamp>"
+    return value
+
+def normalize_request(request: httpx.Request, ignored: frozenset = frozenset()) -> Dict[str, Any]:
+    """The parts of a request that identify it across runs
+
+    Host, headers (credentials, user agents) and timestamps are left out, and
+    fields named in ignored are masked, so a request recorded against the
+    real service matches the same request sent anywhere else later.
+    """
+    query = sorted(
+        (name, "<ignored>" if name in ignored else _mask(value, ignored))
+        for name, value in parse_qsl(request.url.query.decode("ascii"), keep_blank_values=True)
+    )
+    body: Any = None
+    content = request.read()
+    if content:
+        try:
+            body = _mask(json.loads(content), ignored)
+        except ValueError:
+            body = hashlib.sha256(content).hexdigest()
+    return {"method": request.method, "path": request.url.path, "query": query, "body": body}
+
+def request_key(normalized: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+class Cassette:
+    """Recorded exchanges of one service, stored as JSON lines in <directory>/<name>.jsonl
+
+    Each line holds the normalized request, its key, the response (status,
+    headers, body) and how long the exchange took. The same request recorded
+    several times is replayed in recorded order, starting over when the
+    recordings run out.
+    """
+
+    def __init__(self, name: str, directory: str, mode: str, time_scale: float = 1.0,
+                 ignored_fields: Optional[List[str]] = None):
+        self.name = name
+        self.path = os.path.join(directory, f"{name}.jsonl")
+        self.mode = mode
+        self.time_scale = time_scale
+        self.ignored = frozenset(ignored_fields or [])
+        self.stats = {"recorded": 0, "replayed": 0, "misses": 0}
+        self._interactions: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._positions: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        if mode == "record":
+            os.makedirs(directory, exist_ok=True)
+        else:
+            self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            logger.warning(f"Cassette {self.path} not found, every {self.name} request will miss")
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    interaction = json.loads(line)
+                    self._interactions[interaction["key"]].append(interaction)
+        logger.info(f"Loaded {sum(map(len, self._interactions.values()))} {self.name} interactions from {self.path}")
+
+    def key_for(self, request: httpx.Request):
+        normalized = normalize_request(request, self.ignored)
+        return request_key(normalized), normalized
+
+    def find(self, request: httpx.Request) -> Dict[str, Any]:
+        """The next recorded interaction for this request"""
+        key, normalized = self.key_for(request)
+        with self._lock:
+            recorded = self._interactions.get(key)
+            if not recorded:
+                self.stats["misses"] += 1
+                raise CassetteMiss(f"No {self.name} recording for {normalized['method']} {normalized['path']}",
+                                   request=request)
+            position = self._positions[key]
+            self._positions[key] = position + 1
+            self.stats["replayed"] += 1
+            return recorded[position % len(recorded)]
+
+    def record(self, request: httpx.Request, response: httpx.Response, elapsed: float) -> None:
+        key, normalized = self.key_for(request)
+        content = response.content
+        try:
+            body, encoding = content.decode("utf-8"), "utf-8"
+        except UnicodeDecodeError:
+            body, encoding = base64.b64encode(content).decode("ascii"), "base64"
+        interaction = {
+            "key": key,
+            "request": normalized,
+            "response": {
+                "status": response.status_code,
+                "headers": [(name, value) for name, value in response.headers.items() if name.lower() not in HOP_HEADERS],
+                "body": body,
+                "encoding": encoding
+            },
+            "elapsed_ms": round(elapsed * 1000, 3)
+        }
+        line = json.dumps(interaction, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._interactions[key].append(interaction)
+            self.stats["recorded"] += 1
+
+    def delay_for(self, interaction: Dict[str, Any]) -> float:
+        return interaction["elapsed_ms"] / 1000 * self.time_scale
+
+    @staticmethod
+    def build_response(interaction: Dict[str, Any], request: httpx.Request) -> httpx.Response:
+        recorded = interaction["response"]
+        body = recorded["body"]
+        content = base64.b64decode(body) if recorded["encoding"] == "base64" else body.encode("utf-8")
+        return httpx.Response(recorded["status"], headers=recorded["headers"], content=content, request=request)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "path": self.path,
+            "time_scale": self.time_scale,
+            "recorded_requests": len(self._interactions),
+            **self.stats
+        }
+
+class CassetteTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """httpx transport that records through an inner transport or replays from a cassette
+
+    Works for both sync clients (Supabase's PostgREST session) and async
+    clients (the Gemini REST model). Replayed responses are delayed by the
+    recorded time multiplied by the cassette's time scale.
+    """
+
+    def __init__(self, cassette: Cassette, inner=None):
+        self.cassette = cassette
+        self.inner = inner
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self.cassette.mode == "replay":
+            interaction = self.cassette.find(request)
+            delay = self.cassette.delay_for(interaction)
+            if delay:
+                time.sleep(delay)
+            return self.cassette.build_response(interaction, request)
+
+        if self.inner is None:
+            self.inner = httpx.HTTPTransport()
+        started = time.perf_counter()
+        response = self.inner.handle_request(request)
+        response.read()
+        self.cassette.record(request, response, time.perf_counter() - started)
+        return response
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.cassette.mode == "replay":
+            interaction = self.cassette.find(request)
+            delay = self.cassette.delay_for(interaction)
+            if delay:
+                await asyncio.sleep(delay)
+            return self.cassette.build_response(interaction, request)
+
+        if self.inner is None:
+            self.inner = httpx.AsyncHTTPTransport()
+        started = time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        await response.aread()
+        self.cassette.record(request, response, time.perf_counter() - started)
+        return response
+
+    def close(self) -> None:
+        if isinstance(self.inner, httpx.BaseTransport):
+            self.inner.close()
+
+    async def aclose(self) -> None:
+        if isinstance(self.inner, httpx.AsyncBaseTransport):
+            await self.inner.aclose()
+
+_cassettes: Dict[str, Cassette] = {}
+
+def get_cassette(name: str) -> Optional[Cassette]:
+    """Get the shared cassette for a service, or None when CASSETTE_MODE is off
+
+    Read from CASSETTE_DIR (default "cassettes"), with replay delays scaled
+    by CASSETTE_TIME_SCALE (1.0 keeps recorded timings, 0 replays instantly)
+    and the fields in CASSETTE_IGNORE_FIELDS left out of request matching.
+    """
+    mode = cassette_mode()
+    if mode == "off":
+        return None
+    cassette = _cassettes.get(name)
+    if cassette is None:
+        ignored = [field.strip() for field in os.getenv("CASSETTE_IGNORE_FIELDS", "lease_holder").split(",")
+                   if field.strip()]
+        cassette = _cassettes[name] = Cassette(name, os.getenv("CASSETTE_DIR", "cassettes"), mode,
+                                               float(os.getenv("CASSETTE_TIME_SCALE", 1.0)), ignored)
+        logger.info(f"Cassette {cassette.path} in {mode} mode")
+    return cassette
+
+def cassette_transport(name: str, inner=None) -> Optional[CassetteTransport]:
+    """A transport for the named service's cassette, or None when cassettes are off"""
+    cassette = get_cassette(name)
+    return CassetteTransport(cassette, inner) if cassette is not None else None
+
+def attach_cassette(client: httpx.Client, name: str) -> bool:
+    """Route an existing httpx client through the named cassette, returning whether one was attached
+
+    For clients built inside an SDK, where no transport can be passed in.
+    """
+    transport = cassette_transport(name, client._transport)
+    if transport is None:
+        return False
+    client._transport = transport
+    return True
+
+def get_cassette_stats() -> Dict[str, Any]:
+    """Stats for every cassette in use"""
+    return {"mode": cassette_mode(), "cassettes": {name: cassette.get_stats() for name, cassette in _cassettes.items()}}
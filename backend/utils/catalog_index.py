@@ -0,0 +1,235 @@
+"""
+Catalog Index for AgriVoice
+In-process multilingual inverted index over product listings
+"""
+
+import os
+import re
+import json
+import logging
+import unicodedata
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Whitespace, ASCII punctuation, the Indic danda marks, the rupee sign and
+# general punctuation. Anything else (letters, vowel signs, viramas, digits)
+# is part of a token, which keeps Indic words intact.
+TOKEN_SEPARATORS = re.compile(r"[\s!-/:-@\[-`{-~\u0964\u0965\u20b9\u2000-\u206f]+")
+
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized, case-folded tokens in any script"""
+    if not text:
+        return []
+    text = unicodedata.normalize("NFC", text).casefold()
+    return [token for token in TOKEN_SEPARATORS.split(text) if token]
+
+def trigrams(word: str) -> Set[str]:
+    """The three-character substrings of a word"""
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+def _load_json(value: Any) -> Dict[str, Any]:
+    """Decode a JSON column that may already be a dict"""
+    if isinstance(value, dict):
+        return value
+    try:
+        return json.loads(value) if value else {}
+    except (TypeError, ValueError):
+        return {}
+
+def _to_utc(value: Any) -> Optional[datetime]:
+    """Parse a timestamp, treating naive values as local time"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return value.astimezone(timezone.utc)
+
+def _to_float(value: Any) -> Optional[float]:
+    """Convert a NUMERIC column value, which may arrive as a string"""
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+def summarize_product(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a catalog listing from a stored product row"""
+    product_info = _load_json(row.get("product_info"))
+    ai_suggestions = _load_json(row.get("ai_suggestions"))
+
+    return {
+        "id": row.get("id"),
+        "farmer_mobile": row.get("farmer_mobile"),
+        "product": product_info.get("product", ""),
+        "quantity": product_info.get("quantity", ""),
+        "price": product_info.get("price", ""),
+        "quantity_kg": _to_float(row.get("quantity_kg")),
+        "price_per_kg_inr": _to_float(row.get("price_per_kg_inr")),
+        "description": ai_suggestions.get("description", ""),
+        "language": row.get("language"),
+        "status": row.get("status", "pending"),
+        "created_at": row.get("created_at")
+    }
+
+class CatalogIndex:
+    """In-process inverted index answering hot catalog searches without a database round-trip
+
+    The index only answers a search when it is complete, which means it holds
+    every listing that the last warm-up found. New listings are added as they
+    are stored. If the index has to evict listings to stay within
+    max_documents, it stops answering until the next warm-up.
+
+    A listing matches when every query token appears inside some word of
+    its product name or description, so "tom" and "mato" both find
+    "tomato". The database searches apply the same rule with LIKE over the
+    same tokens, so a query finds the same listings from either source.
+    Words are found through their trigrams, as pg_trgm does for LIKE;
+    tokens shorter than three characters scan the vocabulary.
+    """
+
+    def __init__(self, max_documents: Optional[int] = None):
+        self.max_documents = max_documents or int(os.getenv("CATALOG_INDEX_MAX_DOCUMENTS", 50000))
+        self.complete = False
+        self._documents: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+        self._trigrams: Dict[str, Set[str]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    async def warm(self, storage_client) -> None:
+        """Rebuild the index from the most recent stored products
+
+        If the read fails, the index keeps its contents but stops answering
+        until a later warm-up succeeds.
+        """
+        try:
+            products = await storage_client.get_recent_products(limit=self.max_documents + 1)
+            self.load(products[:self.max_documents], complete=len(products) <= self.max_documents)
+            logger.info(f"Catalog index warmed with {len(self)} products (complete: {self.complete})")
+        except Exception as e:
+            logger.error(f"Error warming catalog index: {e}")
+            self.complete = False
+
+    def load(self, products: List[Dict[str, Any]], complete: bool) -> None:
+        """Replace the index contents with the given product rows"""
+        self._documents.clear()
+        self._postings.clear()
+        self._trigrams.clear()
+        # Oldest first so eviction in add_product drops the oldest listing
+        for product in reversed(products):
+            self._add(product)
+        self.complete = complete
+
+    def add_product(self, product: Dict[str, Any]) -> None:
+        """Index a newly stored product"""
+        if not product or not product.get("id"):
+            return
+        self._add(product)
+
+        while len(self._documents) > self.max_documents:
+            product_id, document = self._documents.popitem(last=False)
+            self._remove_postings(product_id, document)
+            self.complete = False
+
+    def update_status(self, product_id: str, status: str) -> None:
+        """Keep an indexed listing's status current"""
+        document = self._documents.get(product_id)
+        if document:
+            document["status"] = status
+
+    def search(self, query: Optional[str] = None, language: Optional[str] = None,
+               status: Optional[str] = None, min_price: Optional[float] = None,
+               max_price: Optional[float] = None, created_after: Optional[datetime] = None,
+               limit: int = 20) -> List[Dict[str, Any]]:
+        """Find listings with a word containing every query token and matching every filter, newest first"""
+        tokens = tokenize(query or "")
+        if tokens:
+            postings = sorted((self._substring_postings(token) for token in set(tokens)), key=len)
+            candidate_ids = set.intersection(*postings)
+            candidates = (self._documents[product_id] for product_id in candidate_ids)
+        else:
+            candidates = self._documents.values()
+
+        since = _to_utc(created_after)
+        matches = []
+        for document in candidates:
+            if language and document["language"] != language:
+                continue
+            if status and document["status"] != status:
+                continue
+            price = document["price_per_kg_inr"]
+            if min_price is not None and (price is None or price < min_price):
+                continue
+            if max_price is not None and (price is None or price > max_price):
+                continue
+            if since and (document["_created"] is None or document["_created"] < since):
+                continue
+            matches.append(document)
+
+        epoch = datetime.min.replace(tzinfo=timezone.utc)
+        matches.sort(key=lambda document: document["_created"] or epoch, reverse=True)
+        return [self._public(document) for document in matches[:limit]]
+
+    def _substring_postings(self, token: str) -> Set[str]:
+        """IDs of the listings with a word containing token"""
+        grams = trigrams(token)
+        if grams:
+            words = set.intersection(*(self._trigrams.get(gram, set()) for gram in grams))
+        else:
+            words = self._postings.keys()
+        ids: Set[str] = set()
+        for word in words:
+            if token in word:
+                ids |= self._postings[word]
+        return ids
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index size and completeness"""
+        return {
+            "documents": len(self._documents),
+            "tokens": len(self._postings),
+            "complete": self.complete,
+            "max_documents": self.max_documents
+        }
+
+    def _add(self, product: Dict[str, Any]) -> None:
+        """Add or replace one listing and its postings"""
+        product_id = product["id"]
+        previous = self._documents.pop(product_id, None)
+        if previous:
+            self._remove_postings(product_id, previous)
+
+        document = summarize_product(product)
+        document["_created"] = _to_utc(document["created_at"])
+        document["_tokens"] = set(tokenize(document["product"]) + tokenize(document["description"]))
+
+        self._documents[product_id] = document
+        for token in document["_tokens"]:
+            if token not in self._postings:
+                for gram in trigrams(token):
+                    self._trigrams[gram].add(token)
+            self._postings[token].add(product_id)
+
+    def _remove_postings(self, product_id: str, document: Dict[str, Any]) -> None:
+        """Drop a listing from the postings lists"""
+        for token in document["_tokens"]:
+            ids = self._postings.get(token)
+            if ids is not None:
+                ids.discard(product_id)
+                if not ids:
+                    del self._postings[token]
+                    for gram in trigrams(token):
+                        words = self._trigrams[gram]
+                        words.discard(token)
+                        if not words:
+                            del self._trigrams[gram]
+
+    def _public(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Strip internal fields from an indexed listing"""
+        return {key: value for key, value in document.items() if not key.startswith("_")}
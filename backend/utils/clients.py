@@ -0,0 +1,44 @@
+"""
+Shared Clients for AgriVoice
+Lazily built, process-wide AI, audio and storage clients
+"""
+
+import importlib
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Third-party SDKs that dominate import time, loaded by preload_modules()
+HEAVY_MODULES = ("google.generativeai", "supabase", "speech_recognition")
+
+@lru_cache(maxsize=None)
+def get_ai_client():
+    """Get the shared Gemini client, building it on first use"""
+    from utils.ai_client import GeminiAIClient
+    return GeminiAIClient()
+
+@lru_cache(maxsize=None)
+def get_audio_processor():
+    """Get the shared audio processor, building it on first use"""
+    from utils.audio_tools import AudioProcessor
+    return AudioProcessor()
+
+@lru_cache(maxsize=None)
+def get_storage_client():
+    """Get the shared storage client for STORAGE_BACKEND, building it on first use"""
+    from utils.storage import create_storage_client
+    return create_storage_client()
+
+def preload_modules() -> None:
+    """Import the heavy SDKs without building any clients
+
+    Safe to call before forking workers: modules are shared copy-on-write,
+    while clients, with their threads and connections, are built in each
+    worker's lifespan.
+    """
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"Could not preload {name}: {e}")
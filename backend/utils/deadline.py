@@ -0,0 +1,53 @@
+"""
+Latency Budgets for AgriVoice
+A per-request deadline passed down through the audio, AI and storage clients
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Optional, TypeVar
+
+T = TypeVar("T")
+
+class DeadlineExceeded(Exception):
+    """Raised when a stage cannot finish inside the request's latency budget"""
+
+class Deadline:
+    """A point in time by which a request must respond
+
+    Clients take an optional deadline; with none they behave exactly as
+    before. Deadlines are monotonic-clock based and cheap to copy with
+    reserve() so a caller can hold back time for later stages.
+    """
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        """Seconds left, never negative"""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def reserve(self, seconds: float) -> "Deadline":
+        """An earlier deadline that leaves `seconds` of this one for later work"""
+        return Deadline(self.expires_at - seconds)
+
+    def check(self, stage: str) -> None:
+        """Raise DeadlineExceeded if no time is left to start a stage"""
+        if self.expired():
+            raise DeadlineExceeded(f"Latency budget exhausted before {stage}")
+
+async def run_within(deadline: Optional[Deadline], awaitable: Awaitable[T], stage: str) -> T:
+    """Await something, giving up with DeadlineExceeded when the deadline passes"""
+    if deadline is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, deadline.remaining())
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"Latency budget exhausted during {stage}")
@@ -0,0 +1,71 @@
+"""
+Gemini REST Transport for AgriVoice
+Calls the generateContent REST API over httpx instead of the SDK's gRPC channel
+"""
+
+import logging
+from typing import Dict, Any, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ENDPOINT = "https://generativelanguage.googleapis.com"
+
+class GeminiRESTResponse:
+    """The subset of the SDK's GenerateContentResponse the AI client reads"""
+
+    def __init__(self, payload: Dict[str, Any]):
+        self.payload = payload
+
+    @property
+    def text(self) -> str:
+        candidates = self.payload.get("candidates") or []
+        if not candidates:
+            raise ValueError("Gemini response has no candidates")
+        parts = (candidates[0].get("content") or {}).get("parts") or []
+        return "".join(part.get("text", "") for part in parts)
+
+class GeminiRESTModel:
+    """Drop-in for genai.GenerativeModel's generate_content_async over plain HTTP
+
+    Used when GEMINI_API_ENDPOINT is set: the public endpoint
+    (https://generativelanguage.googleapis.com), a proxy, or a local stub
+    server for load tests. One pooled httpx client is reused for all calls.
+    """
+
+    def __init__(self, endpoint: str, api_key: str, model_name: str = "gemini-pro",
+                 timeout: float = 60.0, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.endpoint = endpoint.rstrip("/")
+        self.api_key = api_key
+        self.model_name = f"models/{model_name}"
+        self.timeout = timeout
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.endpoint,
+                headers={"x-goog-api-key": self.api_key},
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                transport=self.transport
+            )
+        return self._client
+
+    async def generate_content_async(self, prompt: str,
+                                     request_options: Optional[Dict[str, Any]] = None) -> GeminiRESTResponse:
+        timeout = (request_options or {}).get("timeout") or self.timeout
+        response = await self.client.post(
+            f"/v1beta/{self.model_name}:generateContent",
+            json={"contents": [{"role": "user", "parts": [{"text": prompt}]}]},
+            timeout=timeout
+        )
+        response.raise_for_status()
+        return GeminiRESTResponse(response.json())
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,143 @@
+"""
+Idempotency Keys for AgriVoice
+Replays the recorded response when a client retries a request with the same Idempotency-Key
+"""
+
+import os
+import json
+import time
+import hashlib
+import asyncio
+import logging
+from functools import lru_cache
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple
+
+from fastapi import HTTPException, Response
+
+from utils.job_queue import MemoryJobStore, SQLiteJobStore
+
+logger = logging.getLogger(__name__)
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+class IdempotencyConflict(Exception):
+    """Raised when a key is reused with a different request body"""
+
+def create_record_store(ttl: float):
+    """Create the record store selected by IDEMPOTENCY_STORE_BACKEND (memory or sqlite)
+
+    Records have the same shape as job records, so the job stores are reused.
+    """
+    backend = os.getenv("IDEMPOTENCY_STORE_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        return SQLiteJobStore(os.getenv("IDEMPOTENCY_STORE_PATH", "idempotency.db"), ttl)
+    if backend != "memory":
+        logger.warning(f"Unknown IDEMPOTENCY_STORE_BACKEND '{backend}', falling back to memory")
+    return MemoryJobStore(ttl)
+
+def fingerprint(payload: Dict[str, Any]) -> str:
+    """Stable hash of a request body, to catch a key reused for a different request"""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+class IdempotencyManager:
+    """Runs each (route, farmer, Idempotency-Key) at most once within the TTL
+
+    The first request runs and its successful response is recorded;
+    failures are not recorded, so a retry after an error runs again.
+    Partial responses (pending_stages still running in the background) are
+    not recorded either, since the product changes once they finish.
+    Duplicates that arrive while the first is still running wait for it
+    rather than starting a second run. If the first is cancelled, they get
+    a 503 to retry. Keys are scoped to the farmer, like
+    the product table's unique (farmer_mobile, idempotency_key), so two
+    farmers' clients that pick the same key never see each other's
+    responses or products. In-flight tracking is per worker; across workers
+    that unique index stops a second row from being inserted.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, store=None):
+        self.ttl = ttl or float(os.getenv("IDEMPOTENCY_TTL", 86400))
+        self.store = store or create_record_store(self.ttl)
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.stats = {"executed": 0, "replayed": 0, "joined": 0, "conflicts": 0}
+
+    async def run(self, scope: str, key: str, payload: Dict[str, Any],
+                  execute: Callable[[], Awaitable[Dict[str, Any]]],
+                  owner: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+        """Return (response, replayed) for a request carrying an idempotency key
+
+        owner is the farmer the request acts for; keys are only shared within it.
+        """
+        record_id = f"{scope}:{owner or '-'}:{key}"
+        request_hash = fingerprint(payload)
+
+        in_flight = self._in_flight.get(record_id)
+        if in_flight is not None:
+            self.stats["joined"] += 1
+            first_hash, result = await asyncio.shield(in_flight)
+            self._check(first_hash, request_hash, key)
+            return result, True
+
+        record = await self.store.get(record_id)
+        if record is not None:
+            self._check(record["fingerprint"], request_hash, key)
+            self.stats["replayed"] += 1
+            return record["response"], True
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[record_id] = future
+        try:
+            result = await execute()
+            if not result.get("pending_stages"):
+                await self.store.save({
+                    "id": record_id,
+                    "fingerprint": request_hash,
+                    "response": result,
+                    "updated_at": time.time()
+                })
+            future.set_result((request_hash, result))
+            self.stats["executed"] += 1
+            return result, False
+        except asyncio.CancelledError:
+            # Cancelling the future would raise CancelledError in the joined
+            # requests, which skips their error handling; ask them to retry
+            future.set_exception(HTTPException(
+                status_code=503, headers={"Retry-After": "1"},
+                detail=f"The first request with Idempotency-Key {key} was cancelled, please retry"
+            ))
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters re-raise it; mark it retrieved so an unwaited future doesn't log
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[record_id]
+
+    async def respond(self, scope: str, key: Optional[str], payload: Dict[str, Any], response: Response,
+                      execute: Callable[[], Awaitable[Dict[str, Any]]],
+                      owner: Optional[str] = None) -> Dict[str, Any]:
+        """Route helper: run idempotently when a key was sent, flagging replays in a header"""
+        if not key:
+            return await execute()
+        try:
+            result, replayed = await self.run(scope, key, payload, execute, owner)
+        except IdempotencyConflict as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        if replayed:
+            response.headers[REPLAYED_HEADER] = "true"
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"ttl_seconds": self.ttl, "in_flight": len(self._in_flight), **self.stats}
+
+    def _check(self, recorded_hash: str, request_hash: str, key: str) -> None:
+        if recorded_hash != request_hash:
+            self.stats["conflicts"] += 1
+            raise IdempotencyConflict(f"Idempotency-Key {key} was already used for a different request")
+
+@lru_cache(maxsize=None)
+def get_idempotency_manager() -> IdempotencyManager:
+    """Get the shared idempotency manager, building it on first use"""
+    return IdempotencyManager()
@@ -0,0 +1,295 @@
+"""
+Job Queue for AgriVoice
+Runs long pipelines on a bounded in-process worker pool with TTL'd job results
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+class MemoryJobQueue:
+    """Queue backend holding pending jobs in an asyncio.Queue
+
+    Any object with the same put_nowait/get/task_done/join/qsize methods can
+    be passed to JobManager instead, e.g. one backed by Redis.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._queue: "asyncio.Queue[Tuple[str, Dict[str, Any]]]" = asyncio.Queue(maxsize)
+
+    def put_nowait(self, job_id: str, payload: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait((job_id, payload))
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Job queue is full ({self.maxsize} pending)")
+
+    async def get(self) -> Tuple[str, Dict[str, Any]]:
+        return await self._queue.get()
+
+    def task_done(self) -> None:
+        self._queue.task_done()
+
+    async def join(self) -> None:
+        await self._queue.join()
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+class MemoryJobStore:
+    """Job records kept in this process, dropped ttl seconds after their last update"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    async def save(self, job: Dict[str, Any]) -> None:
+        self._jobs.pop(job["id"], None)
+        self._jobs[job["id"]] = dict(job)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        self.purge()
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    def purge(self) -> int:
+        """Drop expired jobs; records are kept in update order, so stop at the first live one"""
+        cutoff = time.time() - self.ttl
+        expired = 0
+        while self._jobs:
+            job_id, job = next(iter(self._jobs.items()))
+            if job["updated_at"] >= cutoff:
+                break
+            del self._jobs[job_id]
+            expired += 1
+        return expired
+
+class SQLiteJobStore:
+    """Job records in a SQLite file, shared by every worker process on the host"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        record TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_jobs_updated_at ON jobs(updated_at);
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def _save(self, job: Dict[str, Any]) -> None:
+        self._connection().execute(
+            "INSERT OR REPLACE INTO jobs (id, record, updated_at) VALUES (?, ?, ?)",
+            (job["id"], json.dumps(job, ensure_ascii=False, default=str), job["updated_at"])
+        )
+
+    def _get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            "SELECT record FROM jobs WHERE id = ? AND updated_at >= ?", (job_id, time.time() - self.ttl)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def save(self, job: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self._save, job)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._get, job_id)
+
+    def purge(self) -> int:
+        cursor = self._connection().execute("DELETE FROM jobs WHERE updated_at < ?", (time.time() - self.ttl,))
+        return cursor.rowcount
+
+def create_job_store(ttl: float):
+    """Create the job store selected by JOB_STORE_BACKEND (memory or sqlite)"""
+    backend = os.getenv("JOB_STORE_BACKEND", "memory").lower()
+    if backend == "sqlite":
+        return SQLiteJobStore(os.getenv("JOB_STORE_PATH", "jobs.db"), ttl)
+    if backend != "memory":
+        logger.warning(f"Unknown JOB_STORE_BACKEND '{backend}', falling back to memory")
+    return MemoryJobStore(ttl)
+
+class JobManager:
+    """Bounded worker pool that runs submitted jobs and records their progress
+
+    submit() stores a queued record and returns immediately. One of `workers`
+    tasks then runs the handler, which can report its current stage through
+    the callback it receives. Status, stage, result and error are saved to the
+    job store, where they stay readable for `ttl` seconds.
+    """
+
+    def __init__(self, handler: Callable[[Dict[str, Any], Callable[[str], None]], Awaitable[Dict[str, Any]]],
+                 workers: Optional[int] = None, queue_size: Optional[int] = None, ttl: Optional[float] = None,
+                 queue=None, store=None):
+        self.handler = handler
+        self.workers = workers or int(os.getenv("JOB_WORKERS", 4))
+        self.queue_size = queue_size or int(os.getenv("JOB_QUEUE_SIZE", 100))
+        self.ttl = ttl or float(os.getenv("JOB_RESULT_TTL", 3600))
+        self._queue = queue
+        self._store = store
+        self._tasks = []
+        # Change events exist only while someone waits on the job
+        self._changed: Dict[str, asyncio.Event] = {}
+        self._waiters: Dict[str, int] = {}
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = create_job_store(self.ttl)
+        return self._store
+
+    def start(self) -> None:
+        """Start the worker tasks on the running event loop"""
+        if self._queue is None:
+            self._queue = MemoryJobQueue(self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._purge_periodically()))
+        logger.info(f"Job queue started with {self.workers} workers")
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """Let queued jobs finish (up to timeout seconds), then stop the workers"""
+        if self._queue is not None and self._queue.qsize():
+            logger.info(f"Finishing {self._queue.qsize()} queued jobs")
+        try:
+            if self._queue is not None:
+                await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Job queue still had {self._queue.qsize()} jobs at shutdown")
+        for task in self._tasks:
+            task.cancel()
+
+    async def submit(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue a job and return its initial record"""
+        if self._queue is None:
+            raise RuntimeError("Job queue is not running")
+        now = time.time()
+        job = {
+            "id": str(uuid.uuid4()),
+            "status": "queued",
+            "stage": None,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now
+        }
+        if self._queue.qsize() >= self.queue_size:
+            raise QueueFullError(f"Job queue is full ({self.queue_size} pending)")
+        # Save before queueing so a worker never picks up a job it cannot find
+        await self.store.save(job)
+        try:
+            self._queue.put_nowait(job["id"], payload)
+        except QueueFullError:
+            await self._update(job, status="failed", error="Job queue is full")
+            raise
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job record, or None if it is unknown or expired"""
+        return await self.store.get(job_id)
+
+    async def wait_for_change(self, job_id: str, timeout: float) -> None:
+        """Wait until a job handled by this process changes, or timeout passes
+
+        Jobs run by another worker process are not signalled here, so callers
+        re-read the store after the timeout either way. The job's event is
+        dropped when its last waiter leaves, so polling jobs run elsewhere or
+        already finished leaves nothing behind.
+        """
+        event = self._changed.setdefault(job_id, asyncio.Event())
+        self._waiters[job_id] = self._waiters.get(job_id, 0) + 1
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._waiters[job_id] -= 1
+            if not self._waiters[job_id]:
+                del self._waiters[job_id]
+                self._changed.pop(job_id, None)
+        event.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth and pool size"""
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "queue_size": self.queue_size,
+            "result_ttl": self.ttl
+        }
+
+    async def _update(self, job: Dict[str, Any], **changes) -> None:
+        job.update(changes, updated_at=time.time())
+        await self.store.save(job)
+        self._signal(job["id"])
+
+    def _signal(self, job_id: str) -> None:
+        event = self._changed.get(job_id)
+        if event:
+            event.set()
+
+    async def _worker(self) -> None:
+        while True:
+            job_id, payload = await self._queue.get()
+            try:
+                job = await self.store.get(job_id)
+                if job is None:
+                    continue
+                await self._update(job, status="running")
+
+                # Handlers report stages synchronously; save each in the background
+                stage_saves = []
+                def on_stage(stage: str) -> None:
+                    job.update(stage=stage, updated_at=time.time())
+                    stage_saves.append(asyncio.create_task(self.store.save(dict(job))))
+                    self._signal(job_id)
+
+                try:
+                    result = await self.handler(payload, on_stage)
+                    await asyncio.gather(*stage_saves, return_exceptions=True)
+                    await self._update(job, status="succeeded", result=result)
+                except Exception as e:
+                    logger.error(f"Job {job_id} failed: {e}")
+                    await asyncio.gather(*stage_saves, return_exceptions=True)
+                    await self._update(job, status="failed", error=str(e))
+            except Exception as e:
+                logger.error(f"Job worker error: {e}")
+            finally:
+                self._changed.pop(job_id, None)
+                self._queue.task_done()
+
+    async def _purge_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(min(self.ttl, 300))
+            try:
+                expired = self.store.purge()
+                if expired:
+                    logger.info(f"Purged {expired} expired jobs")
+            except Exception as e:
+                logger.error(f"Job purge error: {e}")
@@ -0,0 +1,120 @@
+"""
+Event Loop Monitor for AgriVoice
+Measures event loop scheduling lag and captures the stack of callbacks that block the loop
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+from typing import Dict, Any, Optional
+
+from utils.metrics import LOOP_LAG, LOOP_BLOCKED
+
+logger = logging.getLogger(__name__)
+
+class LoopMonitor:
+    """Heartbeat task plus watchdog thread for one event loop
+
+    The heartbeat sleeps for interval and records how late it woke up as
+    the loop's lag. The watchdog thread notices when no heartbeat has landed
+    for interval plus block_threshold, which means a callback is holding
+    the loop. It then logs the loop thread's stack and the running task once
+    per stall. When the loop recovers, the heartbeat's lag (a lower bound on
+    the stall) is added to the capture. The most recent captures are kept
+    for the maintenance endpoint.
+    """
+
+    def __init__(self, interval_ms: Optional[float] = None, block_threshold_ms: Optional[float] = None,
+                 max_captures: int = 20):
+        self.interval = (interval_ms or float(os.getenv("LOOP_MONITOR_INTERVAL_MS", 100))) / 1000
+        self.block_threshold = (block_threshold_ms or float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", 250))) / 1000
+        self.captures: "deque[Dict[str, Any]]" = deque(maxlen=max_captures)
+        self.max_lag = 0.0
+        self.beats = 0
+        self.blocked = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._current: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - expected, 0.0)
+            LOOP_LAG.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            self.beats += 1
+            self._last_beat = now
+            current = self._current
+            if current is not None:
+                # The stall the watchdog caught is over; its length is at least the lag
+                current["blocked_ms"] = round(lag * 1000, 1)
+                self._current = None
+                logger.warning(f"Event loop was blocked for {current['blocked_ms']:.0f}ms in {current['task']}")
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.block_threshold / 2):
+            stalled = time.monotonic() - self._last_beat
+            if stalled < self.interval + self.block_threshold or self._current is not None:
+                continue
+            self._capture(stalled)
+
+    def _capture(self, stalled: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread)
+        stack = traceback.format_stack(frame) if frame is not None else []
+        task = asyncio.current_task(self._loop)
+        capture = {
+            "detected_at": time.time(),
+            "stalled_ms": round(stalled * 1000, 1),
+            "blocked_ms": None,
+            "task": task.get_name() + f" ({task.get_coro().__qualname__})" if task is not None else "callback",
+            "stack": [line.rstrip() for line in stack[-25:]]
+        }
+        self._current = capture
+        self.captures.append(capture)
+        self.blocked += 1
+        LOOP_BLOCKED.inc()
+        logger.warning(
+            f"Event loop blocked for over {capture['stalled_ms']:.0f}ms in {capture['task']}, stack:\n"
+            + "".join(stack[-25:])
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "interval_ms": self.interval * 1000,
+            "block_threshold_ms": self.block_threshold * 1000,
+            "beats": self.beats,
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "blocked": self.blocked,
+            "recent_blocks": list(self.captures)
+        }
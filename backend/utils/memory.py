@@ -0,0 +1,230 @@
+"""
+Memory Instrumentation for AgriVoice
+tracemalloc control, snapshot diffs by file and line, process RSS and per-route allocation deltas
+"""
+
+import os
+import sys
+import hmac
+import time
+import itertools
+import logging
+import tracemalloc
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+GROUPINGS = ("lineno", "filename", "traceback")
+
+# Allocations made by the instrumentation itself
+IGNORED_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", "<unknown>")
+
+def rss_bytes() -> Dict[str, Optional[int]]:
+    """Current and peak resident set size of this process"""
+    current = None
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    peak = None
+    try:
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        peak = maxrss if sys.platform == "darwin" else maxrss * 1024
+    except ImportError:
+        pass
+    if current is not None and peak is not None:
+        # ru_maxrss is only updated at some page faults, so it can trail statm
+        peak = max(peak, current)
+    return {"rss_bytes": current, "peak_rss_bytes": peak}
+
+def _stat_dict(stat, group_by: str) -> Dict[str, Any]:
+    frames = [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback]
+    entry = {
+        "location": frames[0] if group_by != "filename" else stat.traceback[0].filename,
+        "size_bytes": stat.size,
+        "count": stat.count
+    }
+    if hasattr(stat, "size_diff"):
+        entry.update(size_diff_bytes=stat.size_diff, count_diff=stat.count_diff)
+    if group_by == "traceback":
+        entry["traceback"] = frames
+    return entry
+
+class MemoryTracker:
+    """Starts and stops tracemalloc, keeps named snapshots and tracks allocation per route
+
+    Snapshots are held in memory, oldest dropped beyond max_snapshots, and
+    filtered of allocations made by tracemalloc and the import system.
+
+    Two numbers are kept per route. The peak is how far traced memory rose
+    above its level at the start of the request, so a body that is decoded
+    and freed again still shows up. It is only measured for requests that
+    ran alone, since the peak counter is process-wide. The net delta is
+    the change from start to end. It is recorded for every request, and
+    concurrent requests are charged for each other's allocations, so it is
+    only meaningful as an average over many requests.
+
+    Starting and stopping tracing and taking snapshots are admin actions,
+    allowed only with MEMORY_ADMIN_TOKEN.
+    """
+
+    def __init__(self, max_snapshots: Optional[int] = None):
+        self.max_snapshots = max_snapshots or int(os.getenv("MEMORY_MAX_SNAPSHOTS", 5))
+        self.snapshots: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.routes: Dict[str, Dict[str, float]] = {}
+        self._ids = itertools.count(1)
+        self.started_at: Optional[float] = None
+        self.admin_token = os.getenv("MEMORY_ADMIN_TOKEN") or None
+        self.in_flight = 0
+        self.request_starts = 0
+
+    def is_admin(self, token: Optional[str]) -> bool:
+        return self.admin_token is not None and token is not None and hmac.compare_digest(token, self.admin_token)
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: Optional[int] = None) -> Dict[str, Any]:
+        """Start tracing with this many frames per allocation (1 is cheapest)"""
+        frames = frames or int(os.getenv("MEMORY_TRACE_FRAMES", 1))
+        if not self.tracing:
+            tracemalloc.start(frames)
+            self.started_at = time.time()
+            self.routes.clear()
+            logger.info(f"tracemalloc started with {frames} frame(s)")
+        return self.get_stats()
+
+    def stop(self) -> Dict[str, Any]:
+        """Stop tracing; snapshots already taken are kept"""
+        if self.tracing:
+            tracemalloc.stop()
+            self.started_at = None
+            logger.info("tracemalloc stopped")
+        return self.get_stats()
+
+    def take_snapshot(self) -> Dict[str, Any]:
+        """Take a snapshot and keep it under a new id"""
+        if not self.tracing:
+            raise RuntimeError("tracemalloc is not tracing; start it first")
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, filename) for filename in IGNORED_FILES]
+        )
+        snapshot_id = f"s{next(self._ids)}"
+        self.snapshots[snapshot_id] = {"snapshot": snapshot, "taken_at": time.time(),
+                                       "traced_bytes": tracemalloc.get_traced_memory()[0]}
+        while len(self.snapshots) > self.max_snapshots:
+            self.snapshots.popitem(last=False)
+        return {"id": snapshot_id, **self._describe(snapshot_id)}
+
+    def top(self, snapshot_id: str, group_by: str = "lineno", limit: int = 20) -> Dict[str, Any]:
+        """Largest allocation sites in one snapshot"""
+        snapshot = self._get(snapshot_id)["snapshot"]
+        stats = snapshot.statistics(group_by)
+        return {
+            "id": snapshot_id,
+            **self._describe(snapshot_id),
+            "group_by": group_by,
+            "total_bytes": sum(stat.size for stat in stats),
+            "top": [_stat_dict(stat, group_by) for stat in stats[:limit]]
+        }
+
+    def diff(self, base_id: str, target_id: str, group_by: str = "lineno", limit: int = 20) -> Dict[str, Any]:
+        """Allocation sites that grew (or shrank) most from base to target"""
+        base = self._get(base_id)["snapshot"]
+        target = self._get(target_id)["snapshot"]
+        stats = target.compare_to(base, group_by)
+        return {
+            "base": base_id,
+            "target": target_id,
+            "group_by": group_by,
+            "size_diff_bytes": sum(stat.size_diff for stat in stats),
+            "top": [_stat_dict(stat, group_by) for stat in stats[:limit]]
+        }
+
+    def record_request(self, route: str, delta: int, peak: Optional[int]) -> None:
+        """Record a request's net delta, and its peak when it ran alone (else None)"""
+        stats = self.routes.get(route)
+        if stats is None:
+            stats = self.routes[route] = {"requests": 0, "total_delta_bytes": 0, "max_delta_bytes": 0,
+                                          "peak_samples": 0, "total_peak_bytes": 0, "max_peak_bytes": 0}
+        stats["requests"] += 1
+        stats["total_delta_bytes"] += delta
+        stats["max_delta_bytes"] = max(stats["max_delta_bytes"], delta)
+        if peak is not None:
+            stats["peak_samples"] += 1
+            stats["total_peak_bytes"] += peak
+            stats["max_peak_bytes"] = max(stats["max_peak_bytes"], peak)
+
+    def get_stats(self) -> Dict[str, Any]:
+        current, peak = tracemalloc.get_traced_memory() if self.tracing else (0, 0)
+        routes = {
+            route: {
+                **stats,
+                "avg_delta_bytes": round(stats["total_delta_bytes"] / stats["requests"]),
+                "avg_peak_bytes": round(stats["total_peak_bytes"] / stats["peak_samples"]) if stats["peak_samples"] else None
+            }
+            for route, stats in sorted(self.routes.items(), key=lambda item: -item[1]["max_peak_bytes"])
+        }
+        return {
+            "admin_enabled": self.admin_token is not None,
+            "tracing": self.tracing,
+            "traceback_frames": tracemalloc.get_traceback_limit() if self.tracing else None,
+            "tracing_since": self.started_at,
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            **rss_bytes(),
+            "snapshots": {snapshot_id: self._describe(snapshot_id) for snapshot_id in self.snapshots},
+            "routes": routes
+        }
+
+    def _get(self, snapshot_id: str) -> Dict[str, Any]:
+        entry = self.snapshots.get(snapshot_id)
+        if entry is None:
+            raise KeyError(f"Unknown snapshot {snapshot_id}")
+        return entry
+
+    def _describe(self, snapshot_id: str) -> Dict[str, Any]:
+        entry = self.snapshots[snapshot_id]
+        return {"taken_at": entry["taken_at"], "traced_bytes": entry["traced_bytes"]}
+
+class MemoryMiddleware:
+    """ASGI middleware recording each request's traced memory peak and delta by route template
+
+    Does nothing unless tracemalloc is tracing. The peak counter is reset
+    only when a request starts with no other in flight, and the peak is
+    only recorded if no other request started before it finished.
+    """
+
+    def __init__(self, app, tracker: MemoryTracker):
+        self.app = app
+        self.tracker = tracker
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracemalloc.is_tracing():
+            await self.app(scope, receive, send)
+            return
+
+        tracker = self.tracker
+        tracker.in_flight += 1
+        tracker.request_starts += 1
+        starts = tracker.request_starts
+        alone = tracker.in_flight == 1
+        if alone:
+            tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            tracker.in_flight -= 1
+            if tracemalloc.is_tracing():
+                current, peak = tracemalloc.get_traced_memory()
+                isolated = alone and tracker.request_starts == starts
+                route = scope.get("route")
+                label = getattr(route, "path", None) or "unmatched"
+                tracker.record_request(f"{scope['method']} {label}", current - before,
+                                       peak - before if isolated else None)
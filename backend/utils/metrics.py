@@ -0,0 +1,285 @@
+"""
+Metrics for AgriVoice
+Counters, gauges and histograms rendered in the Prometheus text format without a client library
+"""
+
+import time
+import logging
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Any, List, Callable, Iterable, Tuple, Optional
+
+from utils.deadline import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, wide enough for Gemini round trips
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Collector callbacks return (name, type, help, [(labels, value), ...]) tuples
+CollectedMetric = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}", *self._samples()]
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    """Monotonically increasing count per label set"""
+
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = defaultdict(float)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] += amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def total(self) -> float:
+        return sum(self._values.values())
+
+    def items(self) -> List[Tuple[Dict[str, str], float]]:
+        """(labels, value) for every label set seen so far"""
+        return [(dict(zip(self.labels, key)), value) for key, value in list(self._values.items())]
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+                for key, value in sorted(self._values.items())]
+
+class Gauge(_Metric):
+    """Point-in-time value per label set"""
+
+    type = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+                for key, value in sorted(self._values.items())]
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, sum and count per label set"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block, including when it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Dict[str, Any]]:
+        """Bucket counts per label set, for percentile estimates outside Prometheus"""
+        return {key: {"buckets": self.buckets, "counts": list(counts), "sum": total}
+                for key, (counts, total) in self._values.items()}
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+class Registry:
+    """The metrics of one worker process plus collectors read at scrape time"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[CollectedMetric]]] = []
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[CollectedMetric]]) -> None:
+        """Add a callback producing gauges from component stats on each scrape"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Everything in the Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                collected = list(collector())
+            except Exception as e:
+                logger.error(f"Metrics collector error: {e}")
+                continue
+            for name, metric_type, help, samples in collected:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    names = tuple(labels)
+                    lines.append(f"{name}{_format_labels(names, tuple(labels[n] for n in names))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            return self._metrics[metric.name]
+        self._metrics[metric.name] = metric
+        return metric
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "agrivoice_http_requests_total", "HTTP requests by route template, method and status", ("route", "method", "status")
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "agrivoice_http_request_duration_seconds", "HTTP request latency by route template", ("route", "method")
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge("agrivoice_http_requests_in_flight", "HTTP requests being handled")
+STAGE_LATENCY = REGISTRY.histogram(
+    "agrivoice_voice_stage_duration_seconds",
+    "Voice pipeline stage latency (decode, stt, extract, suggest, store) by language", ("stage", "language")
+)
+VOICE_ERRORS = REGISTRY.counter(
+    "agrivoice_voice_errors_total", "Voice pipeline failures by language and stage", ("language", "stage")
+)
+GEMINI_ERRORS = REGISTRY.counter(
+    "agrivoice_gemini_errors_total", "Failed Gemini calls answered with a fallback, by language and work class",
+    ("language", "priority")
+)
+VOICE_PARTIAL = REGISTRY.counter(
+    "agrivoice_voice_partial_total", "Voice responses returned partial because the latency budget ran out", ("language",)
+)
+LOOP_LAG = REGISTRY.histogram(
+    "agrivoice_event_loop_lag_seconds", "How late the event loop heartbeat ran",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+LOOP_BLOCKED = REGISTRY.counter(
+    "agrivoice_event_loop_blocked_total", "Times a callback held the event loop past LOOP_BLOCK_THRESHOLD_MS"
+)
+STARTED_AT = time.time()
+
+@contextmanager
+def stage_timer(stage: str, language: Optional[str]):
+    """Time a voice pipeline stage, counting an error for the language if it fails
+
+    Running out of latency budget is not an error; the response is partial.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except DeadlineExceeded:
+        raise
+    except Exception:
+        VOICE_ERRORS.inc(language=language or "unknown", stage=stage)
+        raise
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - started, stage=stage, language=language or "unknown")
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests and timing them by route template
+
+    The route template (e.g. /api/voice-jobs/{job_id}) rather than the raw
+    path is used as the label, so ids don't create new series. Requests that
+    match no route are labelled "unmatched".
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get("route")
+            label = getattr(route, "path", None) or scope.get("root_path") or "unmatched"
+            HTTP_LATENCY.observe(time.perf_counter() - started, route=label, method=scope["method"])
+            HTTP_REQUESTS.inc(route=label, method=scope["method"], status=status["code"])
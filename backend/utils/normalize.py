@@ -0,0 +1,187 @@
+"""
+Quantity and Price Normalization for AgriVoice
+Converts free-text quantities and prices into canonical kilograms and rupees per kg
+"""
+
+import re
+import logging
+import unicodedata
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Every Unicode decimal digit in the Indic blocks (Devanagari .. Malayalam) mapped to ASCII
+INDIC_DIGITS = {
+    code: str(unicodedata.decimal(chr(code)))
+    for code in range(0x0966, 0x0D70)
+    if unicodedata.category(chr(code)) == "Nd"
+}
+
+# Unit synonyms in all supported languages, with their size in kilograms
+UNIT_SYNONYMS = {
+    1.0: [
+        "kg", "kgs", "kilo", "kilos", "kilogram", "kilograms", "kilogramme",
+        "किलो", "किलोग्राम", "किग्रा",                      # hi, mr
+        "கிலோ", "கிலோகிராம்",                               # ta
+        "కిలో", "కేజీ",                                      # te
+        "ಕಿಲೋ", "ಕೆಜಿ",                                      # kn
+        "കിലോ", "കിലോഗ്രാം",                                 # ml
+        "કિલો", "કિલોગ્રામ",                                 # gu
+        "কিলো", "কেজি",                                      # bn
+        "କିଲୋ", "କିଗ୍ରା",                                    # or
+        "ਕਿਲੋ", "ਕਿੱਲੋ",                                     # pa
+    ],
+    0.001: [
+        "g", "gm", "gms", "gram", "grams", "gramme",
+        "ग्राम", "கிராம்", "గ్రాము", "గ్రాములు", "ಗ್ರಾಂ", "ഗ്രാം",
+        "ગ્રામ", "গ্রাম", "ଗ୍ରାମ", "ਗ੍ਰਾਮ",
+    ],
+    100.0: [
+        "quintal", "quintals", "qtl", "qtls",
+        "क्विंटल", "कुंतल", "குவிண்டால்", "క్వింటాల్", "ಕ್ವಿಂಟಾಲ್", "ക്വിന്റൽ",
+        "ક્વિન્ટલ", "কুইন্টাল", "କ୍ୱିଣ୍ଟାଲ", "ਕੁਇੰਟਲ",
+    ],
+    1000.0: [
+        "ton", "tons", "tonne", "tonnes",
+        "टन", "டன்", "టన్ను", "టన్నులు", "ಟನ್", "ടൺ", "ટન", "টন", "ଟନ", "ਟਨ",
+    ],
+}
+
+# Number words that scale the preceding amount
+MULTIPLIER_WORDS = {
+    100: ["hundred", "सौ", "நூறு", "వంద", "ನೂರು", "നൂറ്", "સો", "শো", "ଶହ", "ਸੌ"],
+    1000: [
+        "thousand", "k", "हजार", "हज़ार", "ஆயிரம்", "వేలు", "వెయ్యి", "ಸಾವಿರ", "ആയിരം",
+        "હજાર", "হাজার", "ହଜାର", "ਹਜ਼ਾਰ", "ਹਜਾਰ",
+    ],
+    100000: [
+        "lakh", "lakhs", "lac", "lacs", "लाख", "லட்சம்", "லட்சம", "లక్ష", "లక్షలు",
+        "ಲಕ್ಷ", "ലക്ഷം", "લાખ", "লাখ", "ଲକ୍ଷ", "ਲੱਖ", "ਲਖ",
+    ],
+    10000000: ["crore", "crores", "cr", "करोड़", "கோடி", "కోటి", "ಕೋಟಿ", "കോടി", "કરોડ", "কোটি", "କୋଟି", "ਕਰੋੜ"],
+}
+
+# Words that mark a price as "per unit" when next to a unit
+PER_UNIT_WORDS = {"per", "a", "each", "every", "प्रति", "प्रती", "हर", "दर", "दीठ", "દીઠ", "প্রতি", "ପିଛା", "ପ୍ରତି", "ਪ੍ਰਤੀ", "ਪ੍ਰਤਿ"}
+
+# Dative case endings attached to a unit word that mean "per unit", e.g. கிலோவுக்கு, కిలోకి
+PER_UNIT_SUFFIXES = ("வுக்கு", "க்கு", "కి", "కు", "ಗೆ", "ಕ್ಕೆ", "യ്ക്ക്", "ക്ക്", "ला")
+
+def _build_lookup(table: Dict[Any, list]) -> Dict[str, Any]:
+    """Invert a value -> synonyms table into an NFC-normalized word -> value lookup"""
+    return {unicodedata.normalize("NFC", word).casefold(): value for value, words in table.items() for word in words}
+
+UNIT_LOOKUP = _build_lookup(UNIT_SYNONYMS)
+MULTIPLIER_LOOKUP = _build_lookup(MULTIPLIER_WORDS)
+# Longest first so "kilogram" wins over "kilo" when matching Indic words with case endings
+INDIC_UNIT_PREFIXES = sorted((word for word in UNIT_LOOKUP if not word.isascii()), key=len, reverse=True)
+
+TOKEN_PATTERN = re.compile(r"\d+(?:\.\d+)?|/|[^\s\d/₹.,:;()\-–]+")
+DIGIT_GROUPING = re.compile(r"(?<=\d),(?=\d)")
+
+def _match_unit(token: str) -> Optional[tuple]:
+    """Match a unit word, returning (kg per unit, has per-unit case ending)"""
+    if token in UNIT_LOOKUP:
+        return UNIT_LOOKUP[token], False
+    if token.isascii():
+        return None
+    for prefix in INDIC_UNIT_PREFIXES:
+        if token.startswith(prefix):
+            ending = token[len(prefix):]
+            return UNIT_LOOKUP[prefix], any(ending.endswith(suffix) for suffix in PER_UNIT_SUFFIXES)
+    return None
+
+def parse_measure(text: Any) -> Dict[str, Any]:
+    """Parse the first amount in text along with its unit and whether it is per unit
+
+    Returns a dict with "amount" (float or None), "unit_kg" (size of the unit
+    in kg, or None when no weight unit was found) and "per_unit".
+    """
+    result = {"amount": None, "unit_kg": None, "per_unit": False}
+    if text is None:
+        return result
+
+    text = unicodedata.normalize("NFC", str(text)).translate(INDIC_DIGITS).casefold()
+    text = DIGIT_GROUPING.sub("", text)
+    tokens = TOKEN_PATTERN.findall(text)
+
+    per_marker = False
+    amount_end = None
+    for index, token in enumerate(tokens):
+        if token[0].isdigit():
+            if result["amount"] is None:
+                result["amount"] = float(token)
+                amount_end = index
+            per_marker = False
+            continue
+
+        multiplier = MULTIPLIER_LOOKUP.get(token)
+        if multiplier and index - 1 == amount_end:
+            result["amount"] *= multiplier
+            amount_end = index
+            continue
+
+        if token == "/" or token in PER_UNIT_WORDS:
+            per_marker = True
+            continue
+
+        unit = _match_unit(token)
+        if unit:
+            unit_kg, has_per_ending = unit
+            next_is_marker = index + 1 < len(tokens) and tokens[index + 1] in PER_UNIT_WORDS
+            if result["unit_kg"] is None or has_per_ending or per_marker or next_is_marker:
+                result["unit_kg"] = unit_kg
+            if has_per_ending or per_marker or next_is_marker:
+                result["per_unit"] = True
+                if result["amount"] is not None:
+                    break
+        per_marker = False
+
+    return result
+
+def normalize_quantity(quantity: Any) -> Optional[float]:
+    """Convert a quantity like "10 kg", "2 क्विंटल" or "500 ग्राम" to kilograms"""
+    measure = parse_measure(quantity)
+    if measure["amount"] is None or measure["unit_kg"] is None:
+        return None
+    return round(measure["amount"] * measure["unit_kg"], 3)
+
+def normalize_price(price: Any, quantity_kg: Optional[float] = None,
+                    price_per_unit: Any = None, transcribed_text: str = "") -> Optional[float]:
+    """Convert a listed price to rupees per kilogram
+
+    An explicit per-unit price ("₹30/kg", "₹40 प्रति किलो") is used directly.
+    A bare amount ("₹40") counts as per kg when the transcript quotes a
+    per-unit rate; otherwise it is the total for the whole quantity.
+    """
+    for candidate in (price_per_unit, price):
+        measure = parse_measure(candidate)
+        if measure["amount"] is not None and measure["unit_kg"] and measure["per_unit"]:
+            return round(measure["amount"] / measure["unit_kg"], 2)
+
+    measure = parse_measure(price)
+    if measure["amount"] is None:
+        return None
+
+    spoken = parse_measure(transcribed_text)
+    if spoken["per_unit"] and spoken["unit_kg"]:
+        return round(measure["amount"] / spoken["unit_kg"], 2)
+
+    if quantity_kg:
+        return round(measure["amount"] / quantity_kg, 2)
+    return None
+
+def normalize_product_info(product_info: Dict[str, Any], transcribed_text: str = "") -> Dict[str, Optional[float]]:
+    """Compute the canonical quantity_kg and price_per_kg_inr columns for a product"""
+    try:
+        quantity_kg = normalize_quantity(product_info.get("quantity"))
+        price_per_kg_inr = normalize_price(
+            product_info.get("price"),
+            quantity_kg=quantity_kg,
+            price_per_unit=product_info.get("price_per_unit"),
+            transcribed_text=transcribed_text or ""
+        )
+        return {"quantity_kg": quantity_kg, "price_per_kg_inr": price_per_kg_inr}
+    except Exception as e:
+        logger.error(f"Error normalizing product info: {e}")
+        return {"quantity_kg": None, "price_per_kg_inr": None}
@@ -0,0 +1,162 @@
+"""
+Page Cache for AgriVoice
+Serves frontend HTML pages from memory with precompressed variants and ETags
+"""
+
+import gzip
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from fastapi import Request
+from fastapi.responses import HTMLResponse, Response
+
+try:
+    import brotli
+except ImportError:  # listed in requirements.txt; without it gzip still covers every browser
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+def negotiate_encoding(accept_encoding: str, available: List[str]) -> str:
+    """Pick the best content encoding the client accepts, preferring brotli"""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        key, _, value = params.strip().partition("=")
+        if key.strip() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding)
+
+    for coding in ("br", "gzip"):
+        if coding in available and (coding in accepted or "*" in accepted):
+            return coding
+    return "identity"
+
+def etag_matches(if_none_match: str, etags: List[str]) -> bool:
+    """Check an If-None-Match header against a resource's ETags"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return any(etag in candidates for etag in etags)
+
+def compress_variants(body: bytes) -> Dict[str, Dict[str, Any]]:
+    """Precompute the identity, gzip and (if available) brotli encodings of a body
+
+    Each encoding is a separate representation, so each gets its own strong
+    ETag. Compressed variants are dropped when they would not be smaller.
+    """
+    digest = hashlib.sha256(body).hexdigest()[:20]
+    variants = {"identity": {"body": body, "etag": f'"{digest}"'}}
+    gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+    if len(gzipped) < len(body):
+        variants["gzip"] = {"body": gzipped, "etag": f'"{digest}-gz"'}
+    if brotli is not None:
+        compressed = brotli.compress(body, quality=11)
+        if len(compressed) < len(body):
+            variants["br"] = {"body": compressed, "etag": f'"{digest}-br"'}
+    return variants
+
+class CachedPage:
+    """One HTML page held in memory with every encoding precomputed"""
+
+    def __init__(self, html: str, mtime: float, assets_version: int = 0):
+        self.mtime = mtime
+        self.assets_version = assets_version
+        self.variants = compress_variants(html.encode("utf-8"))
+
+    @property
+    def etags(self) -> List[str]:
+        return [variant["etag"] for variant in self.variants.values()]
+
+class PageCache:
+    """In-memory cache of the frontend HTML pages
+
+    Pages are read once and kept in memory. With reload enabled (DEBUG=True),
+    each hit checks the file's mtime and reloads edited pages, so the dev
+    workflow is unchanged. When an asset manifest is given, asset references
+    in each page are rewritten to their fingerprinted URLs.
+    """
+
+    def __init__(self, directory: Path, reload: Optional[bool] = None, assets=None):
+        self.directory = Path(directory)
+        self.reload = reload if reload is not None else os.getenv("DEBUG", "False").lower() == "true"
+        self.assets = assets
+        self._pages: Dict[str, CachedPage] = {}
+
+    def preload(self) -> None:
+        """Load every HTML page in the frontend directory"""
+        for path in sorted(self.directory.glob("*.html")):
+            self._load(path.name)
+        logger.info(f"Page cache loaded {len(self._pages)} pages (brotli: {brotli is not None})")
+        if brotli is None:
+            logger.warning("brotli is not installed; pages are served with gzip only (pip install -r requirements.txt)")
+
+    def get(self, name: str) -> Optional[CachedPage]:
+        """Get a cached page, loading or reloading it if needed"""
+        page = self._pages.get(name)
+        if page is None:
+            return self._load(name)
+        if self.reload:
+            if self.assets is not None and self.assets.refresh() != page.assets_version:
+                return self._load(name)
+            try:
+                if (self.directory / name).stat().st_mtime != page.mtime:
+                    return self._load(name)
+            except FileNotFoundError:
+                self._pages.pop(name, None)
+                return None
+        return page
+
+    def response(self, request: Request, name: str, not_found_message: str) -> Response:
+        """Build the response for a page request, honouring If-None-Match and Accept-Encoding"""
+        page = self.get(name)
+        if page is None:
+            return HTMLResponse(content=not_found_message, status_code=404)
+
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""), list(page.variants))
+        variant = page.variants[encoding]
+        headers = {
+            "ETag": variant["etag"],
+            "Vary": "Accept-Encoding",
+            "Cache-Control": "no-cache"
+        }
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, page.etags):
+            return Response(status_code=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return HTMLResponse(content=variant["body"], headers=headers)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache size information"""
+        return {
+            "pages": len(self._pages),
+            "bytes": sum(len(variant["body"]) for page in self._pages.values() for variant in page.variants.values()),
+            "brotli": brotli is not None,
+            "reload": self.reload
+        }
+
+    def _load(self, name: str) -> Optional[CachedPage]:
+        """Read a page from disk and precompute its variants"""
+        path = self.directory / name
+        try:
+            html = path.read_text(encoding="utf-8")
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+        if self.assets is not None:
+            page = CachedPage(self.assets.rewrite(html), mtime, self.assets.version)
+        else:
+            page = CachedPage(html, mtime)
+        self._pages[name] = page
+        return page
@@ -0,0 +1,319 @@
+"""
+Request Profiling for AgriVoice
+Opt-in statistical profiler for single requests, written as speedscope or collapsed-stack flamegraph files
+"""
+
+import os
+import re
+import sys
+import hmac
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+from utils.tracing import current_trace_id
+
+logger = logging.getLogger(__name__)
+
+TOKEN_HEADER = b"x-profile-token"
+PROFILE_HEADER = b"x-profile-file"
+
+def sign_profile_token(secret: str, ttl_seconds: int = 300) -> str:
+    """Build an X-Profile-Token value, valid for ttl_seconds, for the given PROFILE_SECRET"""
+    expires = int(time.time()) + ttl_seconds
+    signature = hmac.new(secret.encode(), str(expires).encode(), hashlib.sha256).hexdigest()
+    return f"{expires}.{signature}"
+
+def verify_profile_token(secret: str, token: str) -> bool:
+    expires, _, signature = token.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    expected = hmac.new(secret.encode(), expires.encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class RequestSampler:
+    """Samples the event loop thread's stack while one request's task is running
+
+    A background thread wakes every interval and records the loop thread's
+    stack when the request's task is the one on the loop. Samples taken while
+    another task runs, or while the loop is idle and the request is awaiting
+    I/O, are only counted. Sampling stops after max_seconds.
+    """
+
+    def __init__(self, task: asyncio.Task, interval: float, max_seconds: float):
+        self.task = task
+        self.loop = task.get_loop()
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.thread_id = threading.get_ident()
+        self.stacks: Counter = Counter()
+        self.counts = {"on_cpu": 0, "other_task": 0, "waiting": 0}
+        self.started = time.time()
+        self.ended: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.ended = time.time()
+
+    def _run(self) -> None:
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            running = asyncio.current_task(self.loop)
+            if running is not self.task:
+                self.counts["other_task" if running is not None else "waiting"] += 1
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += 1
+            self.counts["on_cpu"] += 1
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed-stack format, for flamegraph.pl or speedscope"""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def speedscope(self, name: str) -> Dict[str, Any]:
+        """A sampled profile in speedscope's file format, weighted in milliseconds"""
+        frames: List[Dict[str, str]] = []
+        index: Dict[str, int] = {}
+        samples, weights = [], []
+        for stack, count in self.stacks.items():
+            sample = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({"name": frame})
+                sample.append(index[frame])
+            samples.append(sample)
+            weights.append(round(count * self.interval * 1000, 3))
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(sum(weights), 3),
+                "samples": samples,
+                "weights": weights
+            }],
+            "name": name,
+            "exporter": "agrivoice"
+        }
+
+class RequestProfiler:
+    """Decides which requests are profiled and writes their profiles
+
+    A request to one of the profiled routes is profiled when it carries a
+    valid X-Profile-Token signed with PROFILE_SECRET, or at random with
+    probability PROFILE_SAMPLE_RATE. Overhead is capped by profiling at most
+    PROFILE_MAX_CONCURRENT requests per worker, sampled ones at most once per
+    PROFILE_MIN_INTERVAL seconds, each for at most PROFILE_MAX_SECONDS. Disk
+    use is capped by deleting the oldest files in PROFILE_DIR once they
+    exceed PROFILE_MAX_DISK_MB.
+    """
+
+    def __init__(self):
+        self.secret = os.getenv("PROFILE_SECRET") or None
+        self.sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+        self.routes = {route.strip() for route in
+                       os.getenv("PROFILE_ROUTES", "/api/complete-voice-process").split(",") if route.strip()}
+        self.directory = os.getenv("PROFILE_DIR", "profiles")
+        self.format = os.getenv("PROFILE_FORMAT", "speedscope").lower()
+        self.interval = float(os.getenv("PROFILE_INTERVAL_MS", 5)) / 1000
+        self.max_seconds = float(os.getenv("PROFILE_MAX_SECONDS", 30))
+        self.max_concurrent = int(os.getenv("PROFILE_MAX_CONCURRENT", 1))
+        self.min_interval = float(os.getenv("PROFILE_MIN_INTERVAL", 10))
+        self.max_disk_bytes = int(float(os.getenv("PROFILE_MAX_DISK_MB", 200)) * 1024 * 1024)
+        self.active = 0
+        self._last_sampled = 0.0
+        self.stats = {"profiled": 0, "signed": 0, "sampled": 0, "skipped_busy": 0,
+                      "bad_tokens": 0, "files_deleted": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.routes) and (self.secret is not None or self.sample_rate > 0)
+
+    def wants(self, path: str) -> bool:
+        return self.enabled and path in self.routes
+
+    def should_profile(self, token: Optional[str]) -> Optional[str]:
+        """The trigger ("signed" or "sampled") if this request is profiled, else None"""
+        trigger = None
+        if token and self.secret:
+            if verify_profile_token(self.secret, token):
+                trigger = "signed"
+            else:
+                self.stats["bad_tokens"] += 1
+        if trigger is None and self.sample_rate > 0 and random.random() < self.sample_rate:
+            if time.monotonic() - self._last_sampled >= self.min_interval:
+                trigger = "sampled"
+        if trigger is None:
+            return None
+        if self.active >= self.max_concurrent:
+            self.stats["skipped_busy"] += 1
+            return None
+        if trigger == "sampled":
+            self._last_sampled = time.monotonic()
+        return trigger
+
+    def file_name(self, route: str, language: str, trace_id: Optional[str]) -> str:
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", route).strip("-") or "root"
+        language = re.sub(r"[^A-Za-z0-9_-]", "", language) or "unknown"
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        extension = "speedscope.json" if self.format == "speedscope" else "collapsed.txt"
+        return f"{stamp}-{slug}-{language}-{trace_id or 'notrace'}.{extension}"
+
+    def write(self, sampler: RequestSampler, file_name: str, tags: Dict[str, Any]) -> str:
+        """Write one profile and enforce the disk cap; runs off the event loop"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, file_name)
+        if self.format == "speedscope":
+            profile = sampler.speedscope(f"{tags['route']} [{tags['language']}] {tags['trace_id']}")
+            profile["agrivoice"] = tags
+            content = json.dumps(profile)
+        else:
+            content = f"# {json.dumps(tags)}\n" + sampler.collapsed()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        self._enforce_disk_cap()
+        return path
+
+    def _profile_files(self) -> List[Tuple[float, int, str]]:
+        if not os.path.isdir(self.directory):
+            return []
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith((".speedscope.json", ".collapsed.txt")):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(files)
+
+    def _enforce_disk_cap(self) -> None:
+        files = self._profile_files()
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.stats["files_deleted"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        files = self._profile_files()
+        return {
+            "enabled": self.enabled,
+            "signed_header": self.secret is not None,
+            "sample_rate": self.sample_rate,
+            "routes": sorted(self.routes),
+            "format": self.format,
+            "directory": self.directory,
+            "active": self.active,
+            "files": len(files),
+            "disk_bytes": sum(size for _, size, _ in files),
+            "max_disk_bytes": self.max_disk_bytes,
+            **self.stats
+        }
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling selected requests with a RequestProfiler
+
+    The profile file name is returned in an X-Profile-File response header.
+    The request body is read (and replayed) only for profiled requests, to
+    tag the file with the request's language.
+    """
+
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.wants(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        token = dict(scope["headers"]).get(TOKEN_HEADER, b"").decode("latin-1") or None
+        trigger = self.profiler.should_profile(token)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        receive, language = await self._language(receive)
+        trace_id = current_trace_id()
+        file_name = self.profiler.file_name(scope["path"], language, trace_id)
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_HEADER, file_name.encode())]
+            await send(message)
+
+        sampler = RequestSampler(asyncio.current_task(), self.profiler.interval, self.profiler.max_seconds)
+        self.profiler.active += 1
+        self.profiler.stats[trigger] += 1
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            sampler.stop()
+            self.profiler.active -= 1
+            self.profiler.stats["profiled"] += 1
+            tags = {
+                "route": scope["path"],
+                "method": scope["method"],
+                "language": language,
+                "trace_id": trace_id,
+                "trigger": trigger,
+                "interval_ms": self.profiler.interval * 1000,
+                "duration_ms": round((sampler.ended - sampler.started) * 1000, 1),
+                "samples": sampler.counts
+            }
+            try:
+                path = await asyncio.to_thread(self.profiler.write, sampler, file_name, tags)
+                logger.info(f"Wrote {trigger} profile {path}")
+            except OSError as e:
+                logger.error(f"Could not write profile {file_name}: {e}")
+
+    @staticmethod
+    async def _language(receive):
+        messages, chunks = [], []
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+
+        try:
+            language = str(json.loads(b"".join(chunks)).get("language") or "en")
+        except (ValueError, AttributeError):
+            language = "unknown"
+
+        async def replay():
+            if messages:
+                return messages.pop(0)
+            return await receive()
+
+        return replay, language
@@ -0,0 +1,54 @@
+"""
+Rate Limiting for AgriVoice
+Token buckets for pacing calls against upstream quotas
+"""
+
+import asyncio
+import time
+from typing import Optional
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second up to `capacity`
+
+    try_acquire() never waits; acquire() sleeps until enough tokens exist.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0, minimum: Optional[float] = None) -> bool:
+        """Take tokens if available right now
+
+        With a minimum, tokens are taken once that many are available and the
+        balance may go negative; the debt is repaid by later refills.
+        """
+        self._refill()
+        if self._tokens >= (tokens if minimum is None else minimum):
+            self._tokens -= tokens
+            return True
+        return False
+
+    def give(self, tokens: float) -> None:
+        """Return tokens taken for work that did not go ahead"""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + tokens)
+
+    def wait_time(self, tokens: float = 1.0) -> float:
+        """Seconds until `tokens` would be available"""
+        self._refill()
+        return max(tokens - self._tokens, 0.0) / self.rate if self.rate > 0 else float("inf")
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Wait for tokens; waiters are served in arrival order"""
+        async with self._lock:
+            while not self.try_acquire(tokens):
+                await asyncio.sleep(self.wait_time(tokens))
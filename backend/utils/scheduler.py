@@ -0,0 +1,187 @@
+"""
+Maintenance Scheduler for AgriVoice
+Periodically generates improvement suggestions for unsold products
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+from utils.ai_dispatcher import ai_work
+from utils.clients import get_ai_client, get_storage_client
+from utils.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+SWEEP_LEASE_NAME = "unsold_product_sweep"
+
+class UnsoldProductSweeper:
+    """Runs the unsold-product sweep on a timer with bounded AI usage
+
+    Each scheduled run first takes a lease through the storage client, so
+    only one worker across all processes and hosts sweeps per interval.
+    The lease is renewed every third of its TTL while the sweep runs, so a
+    sweep longer than the interval is never joined by a second one. If a
+    renewal fails, the lease may have passed to another worker, and the
+    sweep stops after the products already started.
+    Within a run, at most `concurrency` products are processed at once and
+    Gemini calls are paced by a token bucket at `ai_rate_per_minute` and run
+    in the AI dispatcher's maintenance class, behind all farmer-facing work.
+    Products that already have improvement suggestions are skipped unless a
+    run is forced. The last `history_size` runs are kept for metrics.
+    """
+
+    def __init__(self, interval: Optional[float] = None, days: Optional[int] = None,
+                 concurrency: Optional[int] = None, ai_rate_per_minute: Optional[float] = None,
+                 history_size: int = 20):
+        self.interval = interval or float(os.getenv("UNSOLD_SWEEP_INTERVAL", 3600))
+        self.days = days or int(os.getenv("UNSOLD_SWEEP_DAYS", 7))
+        self.concurrency = concurrency or int(os.getenv("UNSOLD_SWEEP_CONCURRENCY", 4))
+        ai_rate_per_minute = ai_rate_per_minute or float(os.getenv("UNSOLD_SWEEP_AI_RATE", 30))
+        self.ai_bucket = TokenBucket(rate=ai_rate_per_minute / 60, capacity=self.concurrency)
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.history = deque(maxlen=history_size)
+        self.totals = {"runs": 0, "skipped_runs": 0, "processed": 0, "failed": 0}
+        self._run_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._manual_task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def start(self) -> None:
+        """Start the periodic sweep on the running event loop"""
+        self._task = asyncio.create_task(self._run_periodically())
+
+    def trigger(self) -> bool:
+        """Start a forced sweep in the background, unless one is already running here"""
+        if self._run_lock.locked() or self._stopping:
+            return False
+        self._manual_task = asyncio.create_task(self.run_once(trigger="manual", force=True))
+        return True
+
+    async def stop(self) -> None:
+        """Stop scheduling; a sweep in progress finishes the products already started"""
+        self._stopping = True
+        if self._task:
+            self._task.cancel()
+        async with self._run_lock:
+            pass
+
+    async def run_once(self, trigger: str = "schedule", force: bool = False) -> Dict[str, Any]:
+        """Run one sweep and record it in the history
+
+        Scheduled runs need the lease. Forced runs (manual triggers) skip the
+        lease and reprocess products that already have suggestions, but never
+        overlap another run in this process.
+        """
+        ttl = max(int(self.interval * 0.9), 1)
+        if not force:
+            if not await get_storage_client().try_acquire_lease(SWEEP_LEASE_NAME, self.holder, ttl):
+                self.totals["skipped_runs"] += 1
+                return {"trigger": trigger, "status": "skipped", "reason": "another worker holds the sweep lease"}
+
+        async with self._run_lock:
+            lease_lost = asyncio.Event()
+            heartbeat = None if force else asyncio.create_task(self._renew_lease(ttl, lease_lost))
+            run = {
+                "trigger": trigger,
+                "holder": self.holder,
+                "started_at": datetime.now(timezone.utc).isoformat(),
+                "status": "running",
+                "found": 0,
+                "processed": 0,
+                "skipped": 0,
+                "failed": 0
+            }
+            self.history.append(run)
+            started = time.perf_counter()
+            try:
+                products = await get_storage_client().get_unsold_products(days=self.days)
+                run["found"] = len(products)
+                if not force:
+                    products = [product for product in products if not product.get("improvement_suggestions")]
+                run["skipped"] = run["found"] - len(products)
+                await self._process(products, run, lease_lost)
+                if lease_lost.is_set():
+                    run["status"] = "lease_lost"
+                else:
+                    run["status"] = "interrupted" if self._stopping else "completed"
+            except Exception as e:
+                logger.error(f"Unsold product sweep error: {e}")
+                run["status"] = "failed"
+                run["error"] = str(e)
+            finally:
+                if heartbeat:
+                    heartbeat.cancel()
+            run["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            self.totals["runs"] += 1
+            self.totals["processed"] += run["processed"]
+            self.totals["failed"] += run["failed"]
+            logger.info(f"Unsold product sweep {run['status']}: {run['processed']} processed, "
+                        f"{run['failed']} failed, {run['skipped']} skipped in {run['duration_ms']}ms")
+            return run
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get configuration, totals and recent run history"""
+        return {
+            "interval_seconds": self.interval,
+            "days": self.days,
+            "concurrency": self.concurrency,
+            "ai_rate_per_minute": self.ai_bucket.rate * 60,
+            "holder": self.holder,
+            "running": self._run_lock.locked(),
+            "totals": dict(self.totals),
+            "history": list(self.history)
+        }
+
+    async def _renew_lease(self, ttl: int, lease_lost: asyncio.Event) -> None:
+        """Renew the sweep lease every third of its TTL until cancelled, or set lease_lost when renewal fails"""
+        while True:
+            await asyncio.sleep(ttl / 3)
+            if not await get_storage_client().try_acquire_lease(SWEEP_LEASE_NAME, self.holder, ttl):
+                logger.warning("Could not renew the unsold product sweep lease; stopping the sweep")
+                lease_lost.set()
+                return
+
+    async def _process(self, products: List[Dict[str, Any]], run: Dict[str, Any], lease_lost: asyncio.Event) -> None:
+        """Process products with a fixed pool of workers pulling from a shared iterator"""
+        pending = iter(products)
+
+        async def worker():
+            for product in pending:
+                if self._stopping or lease_lost.is_set():
+                    return
+                await self.ai_bucket.acquire()
+                try:
+                    # Stored as a JSON string by both backends
+                    product_info = product["product_info"]
+                    if isinstance(product_info, str):
+                        product_info = json.loads(product_info)
+                    with ai_work("maintenance", product["language"], product.get("farmer_mobile")):
+                        suggestions = await get_ai_client().generate_improvement_suggestions(
+                            product_info, product["language"]
+                        )
+                    result = await get_storage_client().update_product_suggestions(product["id"], suggestions)
+                    if result.get("success"):
+                        run["processed"] += 1
+                    else:
+                        run["failed"] += 1
+                except Exception as e:
+                    logger.error(f"Error generating improvement suggestions for {product.get('id')}: {e}")
+                    run["failed"] += 1
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(products)))))
+
+    async def _run_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Unsold product sweep scheduling error: {e}")
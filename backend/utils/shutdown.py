@@ -0,0 +1,81 @@
+"""
+Graceful Shutdown for AgriVoice
+Lets in-flight pipelines finish and flushes queues before a worker exits
+"""
+
+import asyncio
+import inspect
+import logging
+import os
+import time
+from typing import Callable, List, Set
+
+logger = logging.getLogger(__name__)
+
+# Seconds /api/health reports "draining" before the listener closes, so load balancers stop routing first
+HEALTH_GRACE_SECONDS = float(os.getenv("SHUTDOWN_HEALTH_GRACE", 5))
+
+# Allowance for the flushes that have no timeout of their own (sweeper, tracer, storage close)
+FLUSH_MARGIN_SECONDS = 10
+
+def worker_exit_budget(graceful_timeout: float) -> float:
+    """Longest a worker can take to exit after SIGTERM, for the supervisor's kill deadline
+
+    The health grace period, then uvicorn finishing open requests (up to
+    graceful_timeout), then the lifespan drain: tracked tasks (up to
+    graceful_timeout), the job queue flush (up to graceful_timeout again)
+    and the remaining flushes.
+    """
+    return HEALTH_GRACE_SECONDS + 3 * graceful_timeout + FLUSH_MARGIN_SECONDS
+
+class GracefulDrain:
+    """Tracks in-flight work so a stopping worker can finish it before exiting
+
+    Pipelines started outside a request's lifetime are registered with
+    track(). Anything that buffers work (queues, writer threads) registers a
+    flush callback. drain() runs from the lifespan shutdown, once the server
+    has stopped accepting connections and open requests have completed.
+    """
+
+    def __init__(self, timeout: float = None):
+        self.timeout = timeout if timeout is not None else float(os.getenv("GRACEFUL_TIMEOUT", 30))
+        self.draining = False
+        self._tasks: Set[asyncio.Task] = set()
+        self._flushes: List[Callable] = []
+
+    def track(self, task: asyncio.Task) -> asyncio.Task:
+        """Keep a reference to an in-flight task until it completes"""
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def register_flush(self, callback: Callable) -> None:
+        """Run a callback (sync or async) after tracked tasks finish, in registration order"""
+        self._flushes.append(callback)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+    async def drain(self) -> None:
+        """Wait for tracked tasks up to the timeout, cancel stragglers, then run the flushes"""
+        self.draining = True
+        started = time.monotonic()
+
+        if self._tasks:
+            logger.info(f"Draining {len(self._tasks)} in-flight tasks")
+            done, pending = await asyncio.wait(set(self._tasks), timeout=self.timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                logger.warning(f"Cancelled {len(pending)} tasks still running after {self.timeout}s")
+
+        for callback in self._flushes:
+            try:
+                result = callback()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Error flushing on shutdown: {e}")
+
+        logger.info(f"Shutdown drain finished in {time.monotonic() - started:.2f}s")
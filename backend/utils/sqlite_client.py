@@ -0,0 +1,844 @@
+"""
+SQLite Client for AgriVoice
+Embedded storage backend for offline and edge deployments
+"""
+
+import os
+import re
+import json
+import uuid
+import sqlite3
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Callable
+from datetime import datetime, timedelta
+
+from utils.catalog_index import tokenize
+from utils.deadline import Deadline
+from utils.normalize import normalize_product_info
+from utils.tracing import traced_client, record_fallback
+
+logger = logging.getLogger(__name__)
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version.
+# Mirrors supabase_config/schema.sql; JSONB columns are JSON1-validated TEXT.
+MIGRATIONS = [
+    """
+    CREATE TABLE IF NOT EXISTS farmers (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        phone TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        language TEXT DEFAULT 'en',
+        village_city TEXT,
+        created_at TEXT NOT NULL,
+        updated_at TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS products (
+        id TEXT PRIMARY KEY,
+        farmer_mobile TEXT NOT NULL,
+        product_info TEXT NOT NULL CHECK (json_valid(product_info)),
+        ai_suggestions TEXT NOT NULL CHECK (json_valid(ai_suggestions)),
+        transcribed_text TEXT NOT NULL,
+        language TEXT NOT NULL,
+        audio_url TEXT,
+        status TEXT DEFAULT 'pending' CHECK (status IN ('pending', 'sold', 'expired', 'cancelled')),
+        improvement_suggestions TEXT CHECK (improvement_suggestions IS NULL OR json_valid(improvement_suggestions)),
+        created_at TEXT NOT NULL,
+        updated_at TEXT
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_products_farmer_mobile ON products(farmer_mobile);
+    CREATE INDEX IF NOT EXISTS idx_products_status ON products(status);
+    CREATE INDEX IF NOT EXISTS idx_products_created_at ON products(created_at);
+    CREATE INDEX IF NOT EXISTS idx_products_language ON products(language);
+
+    CREATE INDEX IF NOT EXISTS idx_farmers_phone ON farmers(phone);
+    CREATE INDEX IF NOT EXISTS idx_farmers_email ON farmers(email);
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS farmer_product_stats (
+        farmer_mobile TEXT PRIMARY KEY,
+        total_products INTEGER NOT NULL DEFAULT 0,
+        sold_products INTEGER NOT NULL DEFAULT 0,
+        pending_products INTEGER NOT NULL DEFAULT 0,
+        expired_products INTEGER NOT NULL DEFAULT 0,
+        total_revenue REAL NOT NULL DEFAULT 0,
+        updated_at TEXT
+    );
+
+    CREATE TRIGGER IF NOT EXISTS farmer_stats_insert AFTER INSERT ON products BEGIN
+        INSERT INTO farmer_product_stats
+            (farmer_mobile, total_products, sold_products, pending_products, expired_products, total_revenue, updated_at)
+        VALUES (NEW.farmer_mobile, 1, NEW.status = 'sold', NEW.status = 'pending', NEW.status = 'expired',
+                CASE WHEN NEW.status = 'sold' THEN COALESCE(price_amount(NEW.product_info), 0) ELSE 0 END,
+                datetime('now'))
+        ON CONFLICT (farmer_mobile) DO UPDATE SET
+            total_products = total_products + excluded.total_products,
+            sold_products = sold_products + excluded.sold_products,
+            pending_products = pending_products + excluded.pending_products,
+            expired_products = expired_products + excluded.expired_products,
+            total_revenue = total_revenue + excluded.total_revenue,
+            updated_at = excluded.updated_at;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS farmer_stats_delete AFTER DELETE ON products BEGIN
+        UPDATE farmer_product_stats SET
+            total_products = total_products - 1,
+            sold_products = sold_products - (OLD.status = 'sold'),
+            pending_products = pending_products - (OLD.status = 'pending'),
+            expired_products = expired_products - (OLD.status = 'expired'),
+            total_revenue = total_revenue
+                - CASE WHEN OLD.status = 'sold' THEN COALESCE(price_amount(OLD.product_info), 0) ELSE 0 END,
+            updated_at = datetime('now')
+        WHERE farmer_mobile = OLD.farmer_mobile;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS farmer_stats_update
+    AFTER UPDATE OF status, farmer_mobile, product_info ON products BEGIN
+        UPDATE farmer_product_stats SET
+            total_products = total_products - 1,
+            sold_products = sold_products - (OLD.status = 'sold'),
+            pending_products = pending_products - (OLD.status = 'pending'),
+            expired_products = expired_products - (OLD.status = 'expired'),
+            total_revenue = total_revenue
+                - CASE WHEN OLD.status = 'sold' THEN COALESCE(price_amount(OLD.product_info), 0) ELSE 0 END
+        WHERE farmer_mobile = OLD.farmer_mobile;
+
+        INSERT INTO farmer_product_stats
+            (farmer_mobile, total_products, sold_products, pending_products, expired_products, total_revenue, updated_at)
+        VALUES (NEW.farmer_mobile, 1, NEW.status = 'sold', NEW.status = 'pending', NEW.status = 'expired',
+                CASE WHEN NEW.status = 'sold' THEN COALESCE(price_amount(NEW.product_info), 0) ELSE 0 END,
+                datetime('now'))
+        ON CONFLICT (farmer_mobile) DO UPDATE SET
+            total_products = total_products + excluded.total_products,
+            sold_products = sold_products + excluded.sold_products,
+            pending_products = pending_products + excluded.pending_products,
+            expired_products = expired_products + excluded.expired_products,
+            total_revenue = total_revenue + excluded.total_revenue,
+            updated_at = excluded.updated_at;
+    END;
+
+    INSERT INTO farmer_product_stats
+        (farmer_mobile, total_products, sold_products, pending_products, expired_products, total_revenue, updated_at)
+    SELECT farmer_mobile, COUNT(*), SUM(status = 'sold'), SUM(status = 'pending'), SUM(status = 'expired'),
+           COALESCE(SUM(CASE WHEN status = 'sold' THEN price_amount(product_info) END), 0), datetime('now')
+    FROM products WHERE true GROUP BY farmer_mobile
+    ON CONFLICT (farmer_mobile) DO NOTHING;
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_products_catalog ON products(status, language, created_at DESC);
+    """,
+    """
+    ALTER TABLE products ADD COLUMN quantity_kg REAL;
+    ALTER TABLE products ADD COLUMN price_per_kg_inr REAL;
+
+    CREATE INDEX IF NOT EXISTS idx_products_quantity_kg ON products(quantity_kg);
+    CREATE INDEX IF NOT EXISTS idx_products_price_per_kg ON products(price_per_kg_inr);
+
+    -- Revenue becomes normalized price x quantity, falling back to the listed price
+    DROP TRIGGER IF EXISTS farmer_stats_insert;
+    DROP TRIGGER IF EXISTS farmer_stats_delete;
+    DROP TRIGGER IF EXISTS farmer_stats_update;
+
+    CREATE TRIGGER farmer_stats_insert AFTER INSERT ON products BEGIN
+        INSERT INTO farmer_product_stats
+            (farmer_mobile, total_products, sold_products, pending_products, expired_products, total_revenue, updated_at)
+        VALUES (NEW.farmer_mobile, 1, NEW.status = 'sold', NEW.status = 'pending', NEW.status = 'expired',
+                CASE WHEN NEW.status = 'sold' THEN COALESCE(COALESCE(NEW.price_per_kg_inr * NEW.quantity_kg, price_amount(NEW.product_info)), 0) ELSE 0 END,
+                datetime('now'))
+        ON CONFLICT (farmer_mobile) DO UPDATE SET
+            total_products = total_products + excluded.total_products,
+            sold_products = sold_products + excluded.sold_products,
+            pending_products = pending_products + excluded.pending_products,
+            expired_products = expired_products + excluded.expired_products,
+            total_revenue = total_revenue + excluded.total_revenue,
+            updated_at = excluded.updated_at;
+    END;
+
+    CREATE TRIGGER farmer_stats_delete AFTER DELETE ON products BEGIN
+        UPDATE farmer_product_stats SET
+            total_products = total_products - 1,
+            sold_products = sold_products - (OLD.status = 'sold'),
+            pending_products = pending_products - (OLD.status = 'pending'),
+            expired_products = expired_products - (OLD.status = 'expired'),
+            total_revenue = total_revenue
+                - CASE WHEN OLD.status = 'sold' THEN COALESCE(COALESCE(OLD.price_per_kg_inr * OLD.quantity_kg, price_amount(OLD.product_info)), 0) ELSE 0 END,
+            updated_at = datetime('now')
+        WHERE farmer_mobile = OLD.farmer_mobile;
+    END;
+
+    CREATE TRIGGER farmer_stats_update
+    AFTER UPDATE OF status, farmer_mobile, product_info, quantity_kg, price_per_kg_inr ON products BEGIN
+        UPDATE farmer_product_stats SET
+            total_products = total_products - 1,
+            sold_products = sold_products - (OLD.status = 'sold'),
+            pending_products = pending_products - (OLD.status = 'pending'),
+            expired_products = expired_products - (OLD.status = 'expired'),
+            total_revenue = total_revenue
+                - CASE WHEN OLD.status = 'sold' THEN COALESCE(COALESCE(OLD.price_per_kg_inr * OLD.quantity_kg, price_amount(OLD.product_info)), 0) ELSE 0 END
+        WHERE farmer_mobile = OLD.farmer_mobile;
+
+        INSERT INTO farmer_product_stats
+            (farmer_mobile, total_products, sold_products, pending_products, expired_products, total_revenue, updated_at)
+        VALUES (NEW.farmer_mobile, 1, NEW.status = 'sold', NEW.status = 'pending', NEW.status = 'expired',
+                CASE WHEN NEW.status = 'sold' THEN COALESCE(COALESCE(NEW.price_per_kg_inr * NEW.quantity_kg, price_amount(NEW.product_info)), 0) ELSE 0 END,
+                datetime('now'))
+        ON CONFLICT (farmer_mobile) DO UPDATE SET
+            total_products = total_products + excluded.total_products,
+            sold_products = sold_products + excluded.sold_products,
+            pending_products = pending_products + excluded.pending_products,
+            expired_products = expired_products + excluded.expired_products,
+            total_revenue = total_revenue + excluded.total_revenue,
+            updated_at = excluded.updated_at;
+    END;
+    """,
+    # 5: leases for periodic jobs that one worker should own
+    """
+    CREATE TABLE scheduler_leases (
+        name TEXT PRIMARY KEY,
+        holder TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    """,
+    # 6: client idempotency keys, so a retried store cannot insert a second row
+    """
+    ALTER TABLE products ADD COLUMN idempotency_key TEXT;
+
+    CREATE UNIQUE INDEX idx_products_idempotency_key ON products(idempotency_key);
+    """,
+    # 7: idempotency keys are unique per farmer, not across all farmers
+    """
+    DROP INDEX idx_products_idempotency_key;
+
+    CREATE UNIQUE INDEX idx_products_farmer_idempotency_key ON products(farmer_mobile, idempotency_key);
+    """,
+]
+
+# Tries at taking the write lock to migrate, on top of busy_timeout's wait
+MIGRATION_LOCK_ATTEMPTS = 5
+
+# Statements are kept as constants so sqlite3's per-connection statement
+# cache compiles each one once and reuses the prepared statement.
+INSERT_PRODUCT_SQL = """
+    INSERT INTO products (id, farmer_mobile, product_info, ai_suggestions, transcribed_text,
+                          language, audio_url, status, quantity_kg, price_per_kg_inr, created_at, idempotency_key)
+    VALUES (?, ?, json(?), json(?), ?, ?, ?, 'pending', ?, ?, ?, ?)
+    ON CONFLICT (farmer_mobile, idempotency_key) DO NOTHING
+"""
+SELECT_PRODUCT_SQL = "SELECT * FROM products WHERE id = ?"
+SELECT_PRODUCT_BY_IDEMPOTENCY_KEY_SQL = "SELECT * FROM products WHERE farmer_mobile = ? AND idempotency_key = ?"
+SELECT_PRODUCTS_BY_MOBILE_SQL = "SELECT * FROM products WHERE farmer_mobile = ?"
+UPDATE_STATUS_SQL = "UPDATE products SET status = ?, updated_at = ? WHERE id = ?"
+BULK_UPDATE_STATUS_SQL = """
+    UPDATE products
+    SET status = json_extract(u.value, '$.status'), updated_at = ?
+    FROM json_each(?) AS u
+    WHERE products.id = json_extract(u.value, '$.product_id')
+    RETURNING products.id
+"""
+SELECT_UNSOLD_SQL = "SELECT * FROM products WHERE status = 'pending' AND created_at < ?"
+UPDATE_SUGGESTIONS_SQL = "UPDATE products SET improvement_suggestions = json(?), updated_at = ? WHERE id = ?"
+UPDATE_DETAILS_SQL = """
+    UPDATE products
+    SET product_info = json(?), ai_suggestions = json(?), quantity_kg = ?, price_per_kg_inr = ?, updated_at = ?
+    WHERE id = ?
+    RETURNING *
+"""
+INSERT_FARMER_SQL = """
+    INSERT INTO farmers (id, name, email, phone, password_hash, language, village_city, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+SELECT_FARMER_BY_EMAIL_SQL = "SELECT * FROM farmers WHERE email = ?"
+SEARCH_PRODUCTS_SQL = """
+    SELECT * FROM products
+    WHERE NOT EXISTS (
+        SELECT 1 FROM json_each(?1) AS term
+        WHERE NOT (COALESCE(json_extract(product_info, '$.product'), '') LIKE '%' || term.value || '%'
+                   OR COALESCE(json_extract(ai_suggestions, '$.description'), '') LIKE '%' || term.value || '%'))
+    AND (?2 IS NULL OR language = ?2)
+    AND (?3 IS NULL OR status = ?3)
+    AND (?4 IS NULL OR price_per_kg_inr >= ?4)
+    AND (?5 IS NULL OR price_per_kg_inr <= ?5)
+    AND (?6 IS NULL OR created_at >= ?6)
+    ORDER BY created_at DESC
+    LIMIT ?7
+"""
+SELECT_RECENT_PRODUCTS_SQL = "SELECT * FROM products ORDER BY created_at DESC LIMIT ?"
+SELECT_UNNORMALIZED_PRODUCTS_SQL = """
+    SELECT id, product_info, transcribed_text FROM products
+    WHERE (quantity_kg IS NULL OR price_per_kg_inr IS NULL) AND id > ?
+    ORDER BY id
+    LIMIT ?
+"""
+BULK_UPDATE_NORMALIZATION_SQL = """
+    UPDATE products
+    SET quantity_kg = json_extract(u.value, '$.quantity_kg'),
+        price_per_kg_inr = json_extract(u.value, '$.price_per_kg_inr')
+    FROM json_each(?) AS u
+    WHERE products.id = json_extract(u.value, '$.product_id')
+"""
+ACQUIRE_LEASE_SQL = """
+    INSERT INTO scheduler_leases (name, holder, expires_at) VALUES (?1, ?2, ?3 + ?4)
+    ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+    WHERE scheduler_leases.expires_at < ?3 OR scheduler_leases.holder = excluded.holder
+    RETURNING holder
+"""
+SELECT_FARMER_STATS_SQL = "SELECT * FROM farmer_product_stats WHERE farmer_mobile = ?"
+RECONCILE_FARMER_STATS_SQL = """
+    INSERT INTO farmer_product_stats
+        (farmer_mobile, total_products, sold_products, pending_products, expired_products, total_revenue, updated_at)
+    SELECT farmer_mobile, COUNT(*), SUM(status = 'sold'), SUM(status = 'pending'), SUM(status = 'expired'),
+           COALESCE(SUM(CASE WHEN status = 'sold'
+                             THEN COALESCE(price_per_kg_inr * quantity_kg, price_amount(product_info)) END), 0),
+           datetime('now')
+    FROM products WHERE ?1 IS NULL OR farmer_mobile = ?1 GROUP BY farmer_mobile
+    ON CONFLICT (farmer_mobile) DO UPDATE SET
+        total_products = excluded.total_products,
+        sold_products = excluded.sold_products,
+        pending_products = excluded.pending_products,
+        expired_products = excluded.expired_products,
+        total_revenue = excluded.total_revenue,
+        updated_at = excluded.updated_at
+    WHERE (total_products, sold_products, pending_products, expired_products, total_revenue)
+        IS NOT (excluded.total_products, excluded.sold_products, excluded.pending_products,
+                excluded.expired_products, excluded.total_revenue)
+"""
+DELETE_ORPHAN_FARMER_STATS_SQL = """
+    DELETE FROM farmer_product_stats
+    WHERE (?1 IS NULL OR farmer_mobile = ?1)
+    AND NOT EXISTS (SELECT 1 FROM products p WHERE p.farmer_mobile = farmer_product_stats.farmer_mobile)
+"""
+
+PRICE_AMOUNT_PATTERN = re.compile(r"[0-9]+(?:\.[0-9]+)?")
+
+
+def _price_amount(product_info: Optional[str]) -> Optional[float]:
+    """Numeric amount of a product's listed price, e.g. 40.0 for "₹40"
+
+    Registered as the SQL function price_amount() used by the stats triggers.
+    """
+    try:
+        price = json.loads(product_info).get("price") or ""
+        match = PRICE_AMOUNT_PATTERN.search(str(price))
+        return float(match.group()) if match else None
+    except Exception:
+        return None
+
+
+def _split_statements(script: str) -> List[str]:
+    """Split a migration script into statements, keeping trigger bodies whole"""
+    statements, current = [], ""
+    for line in script.splitlines(keepends=True):
+        current += line
+        if sqlite3.complete_statement(current):
+            statements.append(current.strip())
+            current = ""
+    if current.strip():
+        statements.append(current.strip())
+    return statements
+
+def _hash_password(password: str, salt: Optional[bytes] = None) -> str:
+    """Hash a password with PBKDF2 for storage"""
+    salt = salt or os.urandom(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, 100_000)
+    return f"{salt.hex()}${digest.hex()}"
+
+
+def _verify_password(password: str, password_hash: str) -> bool:
+    """Check a password against a stored PBKDF2 hash"""
+    try:
+        salt, _ = password_hash.split("$", 1)
+    except ValueError:
+        return False
+    return _hash_password(password, bytes.fromhex(salt)) == password_hash
+
+
+@traced_client("sqlite")
+class SQLiteClient:
+    """Embedded database client with the same interface as SupabaseClient
+
+    All sqlite3 calls run on worker threads so the event loop never blocks.
+    Writes go through a single writer thread; reads use a small pool of
+    threads, each with its own connection, which WAL mode lets proceed
+    concurrently with the writer.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, read_threads: Optional[int] = None):
+        self.db_path = db_path or os.getenv("SQLITE_PATH", "agrivoice.db")
+        self.read_threads = read_threads or int(os.getenv("SQLITE_READ_THREADS", 4))
+
+        self._start_threads()
+        # Threads and connections do not survive fork, so preforked workers start their own
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._start_threads)
+
+        try:
+            self._writer.submit(self._migrate).result()
+            self.connected = True
+            logger.info(f"SQLite client initialized at {self.db_path}")
+        except Exception as e:
+            logger.error(f"Failed to initialize SQLite database: {e}")
+            self.connected = False
+
+    def _start_threads(self) -> None:
+        """Create the writer and reader threads with fresh per-thread connections"""
+        self._local = threading.local()
+        self._pending = {"read": 0, "write": 0}
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+        self._readers = ThreadPoolExecutor(max_workers=self.read_threads, thread_name_prefix="sqlite-reader")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get the calling thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, isolation_level=None, cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            conn.create_function("price_amount", 1, _price_amount, deterministic=True)
+            # Set first, so the WAL switch below waits for other processes opening the file
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _migrate(self) -> None:
+        """Apply pending schema migrations
+
+        Workers opening a fresh database at the same time all get here. The
+        version is read inside a write transaction, so the first worker
+        applies the migrations and the others wait, then find nothing to do.
+        """
+        conn = self._connection()
+        for attempt in range(MIGRATION_LOCK_ATTEMPTS):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                break
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) or attempt == MIGRATION_LOCK_ATTEMPTS - 1:
+                    raise
+                time.sleep(0.1 * (attempt + 1))
+
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for index, script in enumerate(MIGRATIONS[version:], start=version + 1):
+                # Not executescript(), which would commit the open transaction first
+                for statement in _split_statements(script):
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {index}")
+                logger.info(f"Applied SQLite migration {index}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def _write(self, fn: Callable, *args) -> Any:
+        """Run a write function on the writer thread"""
+        loop = asyncio.get_running_loop()
+        self._pending["write"] += 1
+        try:
+            return await loop.run_in_executor(self._writer, fn, *args)
+        finally:
+            self._pending["write"] -= 1
+
+    async def _read(self, fn: Callable, *args) -> Any:
+        """Run a read function on the reader pool"""
+        loop = asyncio.get_running_loop()
+        self._pending["read"] += 1
+        try:
+            return await loop.run_in_executor(self._readers, fn, *args)
+        finally:
+            self._pending["read"] -= 1
+
+    async def store_product(self, product_info: Dict[str, Any],
+                          ai_suggestions: Dict[str, Any],
+                          transcribed_text: str,
+                          language: str,
+                          farmer_mobile: str,
+                          audio_url: Optional[str] = None,
+                          deadline: Optional[Deadline] = None,
+                          idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """Store product information in database
+
+        With an idempotency_key that is already on one of this farmer's
+        products, nothing is inserted and the existing product is returned.
+        """
+        if deadline is not None:
+            deadline.check("store")
+        normalized = normalize_product_info(product_info, transcribed_text)
+
+        def _store():
+            conn = self._connection()
+            product_id = str(uuid.uuid4())
+            cursor = conn.execute(INSERT_PRODUCT_SQL, (
+                product_id, farmer_mobile, json.dumps(product_info), json.dumps(ai_suggestions),
+                transcribed_text, language, audio_url, normalized["quantity_kg"],
+                normalized["price_per_kg_inr"], datetime.now().isoformat(), idempotency_key
+            ))
+            if not cursor.rowcount:
+                return dict(conn.execute(SELECT_PRODUCT_BY_IDEMPOTENCY_KEY_SQL, (farmer_mobile, idempotency_key)).fetchone())
+            return dict(conn.execute(SELECT_PRODUCT_SQL, (product_id,)).fetchone())
+
+        try:
+            product = await self._write(_store)
+            logger.info(f"Product stored successfully with ID: {product['id']}")
+            return product
+        except Exception as e:
+            logger.error(f"Error storing product: {e}")
+            raise
+
+    async def bulk_store_products(self, products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Store many products in one transaction, returning the stored rows in order
+
+        Each product has the keyword arguments of store_product. A product
+        whose idempotency_key is already stored for its farmer is not
+        inserted again; the existing row is returned in its place.
+        """
+        rows = []
+        for product in products:
+            normalized = normalize_product_info(product["product_info"], product["transcribed_text"])
+            rows.append((
+                str(uuid.uuid4()), product["farmer_mobile"], json.dumps(product["product_info"]),
+                json.dumps(product["ai_suggestions"]), product["transcribed_text"], product["language"],
+                product.get("audio_url"), normalized["quantity_kg"], normalized["price_per_kg_inr"],
+                datetime.now().isoformat(), product.get("idempotency_key")
+            ))
+
+        def _store():
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                stored = []
+                for row in rows:
+                    if conn.execute(INSERT_PRODUCT_SQL, row).rowcount:
+                        stored.append(dict(conn.execute(SELECT_PRODUCT_SQL, (row[0],)).fetchone()))
+                    else:
+                        stored.append(dict(conn.execute(SELECT_PRODUCT_BY_IDEMPOTENCY_KEY_SQL, (row[1], row[-1])).fetchone()))
+                conn.execute("COMMIT")
+                return stored
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        try:
+            stored = await self._write(_store)
+            logger.info(f"Bulk stored {len(stored)} products")
+            return stored
+        except Exception as e:
+            logger.error(f"Error bulk storing products: {e}")
+            raise
+
+    async def get_products_by_mobile(self, mobile: str) -> List[Dict[str, Any]]:
+        """Get products by farmer mobile number"""
+        def _select():
+            rows = self._connection().execute(SELECT_PRODUCTS_BY_MOBILE_SQL, (mobile,)).fetchall()
+            return [dict(row) for row in rows]
+
+        try:
+            products = await self._read(_select)
+            logger.info(f"Retrieved {len(products)} products for mobile: {mobile}")
+            return products
+        except Exception as e:
+            logger.error(f"Error getting products: {e}")
+            record_fallback(e)
+            return []
+
+    async def update_product_status(self, product_id: str, status: str) -> Dict[str, Any]:
+        """Update product status"""
+        def _update():
+            cursor = self._connection().execute(UPDATE_STATUS_SQL, (status, datetime.now().isoformat(), product_id))
+            return cursor.rowcount
+
+        try:
+            if await self._write(_update):
+                logger.info(f"Product {product_id} status updated to: {status}")
+                return {"success": True, "message": "Status updated successfully"}
+            else:
+                raise Exception("Failed to update product status")
+        except Exception as e:
+            logger.error(f"Error updating product status: {e}")
+            record_fallback(e)
+            return {"success": False, "message": str(e)}
+
+    async def bulk_update_product_status(self, updates: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """Update the status of many products in a single statement
+
+        IDs are reported in canonical form (lowercase, hyphenated), the form
+        they are stored in, as in the Supabase client.
+        """
+        # Later entries for the same product win, matching sequential taps.
+        # Key on the canonical UUID so "{ABC...}" and "abc..." are one product.
+        pending = {}
+        invalid = set()
+        for update in updates:
+            try:
+                product_id = str(uuid.UUID(update["product_id"]))
+            except ValueError:
+                product_id = update["product_id"]
+                invalid.add(product_id)
+            pending[product_id] = update["status"]
+
+        results = {product_id: {"product_id": product_id, "status": pending[product_id],
+                                "success": False, "message": "Invalid product ID"} for product_id in invalid}
+        valid = [{"product_id": product_id, "status": status}
+                 for product_id, status in pending.items() if product_id not in invalid]
+        payload = json.dumps(valid)
+
+        def _update():
+            rows = self._connection().execute(BULK_UPDATE_STATUS_SQL, (datetime.now().isoformat(), payload)).fetchall()
+            return {row[0] for row in rows}
+
+        try:
+            if valid:
+                updated = await self._write(_update)
+                for item in valid:
+                    if item["product_id"] in updated:
+                        results[item["product_id"]] = {**item, "success": True, "message": "Status updated successfully"}
+                    else:
+                        results[item["product_id"]] = {**item, "success": False, "message": "Product not found"}
+                logger.info(f"Bulk status update applied to {len(updated)} of {len(valid)} products")
+        except Exception as e:
+            logger.error(f"Error bulk updating product status: {e}")
+            record_fallback(e)
+            for item in valid:
+                results[item["product_id"]] = {**item, "success": False, "message": str(e)}
+
+        return [results[product_id] for product_id in pending]
+
+    async def get_unsold_products(self, days: int = 7) -> List[Dict[str, Any]]:
+        """Get unsold products older than specified days"""
+        cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
+
+        def _select():
+            rows = self._connection().execute(SELECT_UNSOLD_SQL, (cutoff_date,)).fetchall()
+            return [dict(row) for row in rows]
+
+        try:
+            products = await self._read(_select)
+            logger.info(f"Retrieved {len(products)} unsold products older than {days} days")
+            return products
+        except Exception as e:
+            logger.error(f"Error getting unsold products: {e}")
+            record_fallback(e)
+            return []
+
+    async def update_product_suggestions(self, product_id: str, suggestions: Dict[str, Any]) -> Dict[str, Any]:
+        """Update product with improvement suggestions"""
+        def _update():
+            cursor = self._connection().execute(
+                UPDATE_SUGGESTIONS_SQL, (json.dumps(suggestions), datetime.now().isoformat(), product_id)
+            )
+            return cursor.rowcount
+
+        try:
+            if await self._write(_update):
+                logger.info(f"Product {product_id} suggestions updated")
+                return {"success": True, "message": "Suggestions updated successfully"}
+            else:
+                raise Exception("Failed to update product suggestions")
+        except Exception as e:
+            logger.error(f"Error updating product suggestions: {e}")
+            record_fallback(e)
+            return {"success": False, "message": str(e)}
+
+    async def update_product_details(self, product_id: str, product_info: Dict[str, Any],
+                                     ai_suggestions: Dict[str, Any], transcribed_text: str) -> Optional[Dict[str, Any]]:
+        """Replace a stored product's extracted info and AI suggestions, e.g. after a partial response"""
+        normalized = normalize_product_info(product_info, transcribed_text)
+
+        def _update():
+            row = self._connection().execute(UPDATE_DETAILS_SQL, (
+                json.dumps(product_info), json.dumps(ai_suggestions), normalized["quantity_kg"],
+                normalized["price_per_kg_inr"], datetime.now().isoformat(), product_id
+            )).fetchone()
+            return dict(row) if row else None
+
+        try:
+            product = await self._write(_update)
+            if product:
+                logger.info(f"Product {product_id} details updated")
+            return product
+        except Exception as e:
+            logger.error(f"Error updating product details: {e}")
+            record_fallback(e)
+            return None
+
+    async def register_farmer(self, farmer_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Register a new farmer"""
+        def _insert():
+            conn = self._connection()
+            farmer_id = str(uuid.uuid4())
+            conn.execute(INSERT_FARMER_SQL, (
+                farmer_id, farmer_data["name"], farmer_data["email"], farmer_data["phone"],
+                _hash_password(farmer_data.get("password", "")), farmer_data.get("language", "en"),
+                farmer_data.get("village_city"), datetime.now().isoformat()
+            ))
+            return dict(conn.execute("SELECT * FROM farmers WHERE id = ?", (farmer_id,)).fetchone())
+
+        try:
+            farmer = await self._write(_insert)
+            farmer.pop("password_hash", None)
+            logger.info(f"Farmer registered successfully: {farmer['id']}")
+            return farmer
+        except Exception as e:
+            logger.error(f"Error registering farmer: {e}")
+            raise
+
+    async def login_farmer(self, credentials: Dict[str, str]) -> Dict[str, Any]:
+        """Login farmer"""
+        def _select():
+            row = self._connection().execute(SELECT_FARMER_BY_EMAIL_SQL, (credentials["email"],)).fetchone()
+            return dict(row) if row else None
+
+        farmer = await self._read(_select)
+        if not farmer or not _verify_password(credentials.get("password", ""), farmer.pop("password_hash")):
+            logger.error("Error logging in farmer: Invalid credentials")
+            raise Exception("Invalid credentials")
+
+        logger.info(f"Farmer logged in: {farmer['id']}")
+        return farmer
+
+    async def search_products(self, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Search product listings across all farmers"""
+        query = filters.get("query")
+        created_after = filters.get("created_after")
+        if created_after and created_after.tzinfo:
+            # created_at is stored as naive local time
+            created_after = created_after.astimezone().replace(tzinfo=None)
+
+        # Every token must appear in the name or description, as in the catalog index
+        params = (
+            json.dumps(tokenize(query or "")),
+            filters.get("language"),
+            filters.get("status"),
+            filters.get("min_price"),
+            filters.get("max_price"),
+            created_after.isoformat() if created_after else None,
+            filters.get("limit", 20)
+        )
+
+        def _select():
+            return [dict(row) for row in self._connection().execute(SEARCH_PRODUCTS_SQL, params).fetchall()]
+
+        try:
+            products = await self._read(_select)
+            logger.info(f"Catalog search returned {len(products)} products")
+            return products
+        except Exception as e:
+            logger.error(f"Error searching products: {e}")
+            record_fallback(e)
+            return []
+
+    async def get_recent_products(self, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Get the most recently listed products across all farmers; errors are raised for the catalog index"""
+        def _select():
+            return [dict(row) for row in self._connection().execute(SELECT_RECENT_PRODUCTS_SQL, (limit,)).fetchall()]
+
+        try:
+            return await self._read(_select)
+        except Exception as e:
+            logger.error(f"Error getting recent products: {e}")
+            raise
+
+    async def get_products_for_normalization(self, after_id: str = "", limit: int = 500) -> List[Dict[str, Any]]:
+        """Get a page of products missing normalized quantity/price, ordered by ID"""
+        def _select():
+            rows = self._connection().execute(SELECT_UNNORMALIZED_PRODUCTS_SQL, (after_id, limit)).fetchall()
+            return [dict(row) for row in rows]
+
+        return await self._read(_select)
+
+    async def bulk_update_product_normalization(self, updates: List[Dict[str, Any]]) -> int:
+        """Write normalized quantity/price columns for many products in one statement"""
+        def _update():
+            return self._connection().execute(BULK_UPDATE_NORMALIZATION_SQL, (json.dumps(updates),)).rowcount
+
+        updated = await self._write(_update)
+        logger.info(f"Normalized quantity/price for {updated} products")
+        return updated
+
+    async def get_farmer_stats(self, mobile: str) -> Dict[str, Any]:
+        """Get the incrementally maintained product counters for a farmer"""
+        def _select():
+            row = self._connection().execute(SELECT_FARMER_STATS_SQL, (mobile,)).fetchone()
+            return dict(row) if row else None
+
+        try:
+            stats = await self._read(_select)
+            return stats or self._empty_farmer_stats(mobile)
+        except Exception as e:
+            logger.error(f"Error getting farmer stats: {e}")
+            record_fallback(e)
+            return self._empty_farmer_stats(mobile)
+
+    async def try_acquire_lease(self, name: str, holder: str, ttl_seconds: int) -> bool:
+        """Take or renew a named lease, returning True when holder now holds it"""
+        def _acquire():
+            row = self._connection().execute(ACQUIRE_LEASE_SQL, (name, holder, time.time(), ttl_seconds)).fetchone()
+            return row is not None
+
+        try:
+            return await self._write(_acquire)
+        except Exception as e:
+            logger.error(f"Error acquiring lease {name}: {e}")
+            record_fallback(e)
+            return False
+
+    async def reconcile_farmer_stats(self, mobile: Optional[str] = None) -> int:
+        """Recompute farmer counters from the products table, returning rows corrected"""
+        def _reconcile():
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                corrected = conn.execute(RECONCILE_FARMER_STATS_SQL, (mobile,)).rowcount
+                conn.execute(DELETE_ORPHAN_FARMER_STATS_SQL, (mobile,))
+                conn.execute("COMMIT")
+                return corrected
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+        try:
+            corrected = await self._write(_reconcile)
+            if corrected:
+                logger.warning(f"Reconciled {corrected} drifted farmer stats rows")
+            return corrected
+        except Exception as e:
+            logger.error(f"Error reconciling farmer stats: {e}")
+            record_fallback(e)
+            return 0
+
+    def _empty_farmer_stats(self, mobile: str) -> Dict[str, Any]:
+        """Counters for a farmer with no products"""
+        return {
+            "farmer_mobile": mobile,
+            "total_products": 0,
+            "sold_products": 0,
+            "pending_products": 0,
+            "expired_products": 0,
+            "total_revenue": 0
+        }
+
+    def get_connection_status(self) -> Dict[str, Any]:
+        """Get database connection status"""
+        return {
+            "connected": self.connected,
+            "backend": "sqlite",
+            "path": self.db_path,
+            "sqlite_version": sqlite3.sqlite_version,
+            "read_threads": self.read_threads,
+            "pending_reads": self._pending["read"],
+            "pending_writes": self._pending["write"]
+        }
+
+    def close(self) -> None:
+        """Shut down the worker threads"""
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
@@ -0,0 +1,25 @@
+"""
+Storage backend selection for AgriVoice
+Chooses between the remote Supabase and embedded SQLite clients
+"""
+
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKENDS = ("supabase", "sqlite")
+
+def create_storage_client(backend: str = None):
+    """Create the storage client selected by STORAGE_BACKEND"""
+    backend = (backend or os.getenv("STORAGE_BACKEND", "supabase")).lower()
+
+    if backend == "sqlite":
+        from utils.sqlite_client import SQLiteClient
+        return SQLiteClient()
+
+    if backend != "supabase":
+        logger.warning(f"Unknown STORAGE_BACKEND '{backend}', falling back to supabase")
+
+    from utils.supabase_client import SupabaseClient
+    return SupabaseClient()
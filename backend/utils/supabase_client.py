@@ -5,26 +5,50 @@ Handles database operations for products and farmers
 
 import os
 import json
+import uuid
 import logging
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
-from supabase import create_client, Client
+
+from utils.catalog_index import tokenize
+from utils.deadline import Deadline
+from utils.normalize import normalize_product_info
+from utils.tracing import traced_client, record_fallback
 
 logger = logging.getLogger(__name__)
 
+# Rows requested per page by get_recent_products; PostgREST's default max-rows
+RECENT_PRODUCTS_PAGE_SIZE = 1000
+
+@traced_client("supabase", offline=lambda client: client.client is None)
 class SupabaseClient:
     """Client for interacting with Supabase database"""
     
     def __init__(self):
         self.supabase_url = os.getenv("SUPABASE_URL")
-        self.supabase_key = os.getenv("SUPABASE_ANON_KEY")
+        # The service_role key may call the definer functions (catalog search,
+        # scheduler leases, stats reconciliation) that schema.sql keeps from anon clients
+        self.supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_ANON_KEY")
+        if self.supabase_key and not os.getenv("SUPABASE_SERVICE_ROLE_KEY"):
+            logger.warning("SUPABASE_SERVICE_ROLE_KEY is not set; catalog search, scheduler leases and "
+                           "stats reconciliation are not callable with the anon key")
+
+        from utils.cassette import cassette_mode, attach_cassette
+        if cassette_mode() == "replay":
+            # Replays need no real project; the host is not part of the match
+            self.supabase_url = self.supabase_url or "http://supabase.cassette"
+            self.supabase_key = self.supabase_key or "cassette.replay.key"
         
         if not self.supabase_url or not self.supabase_key:
             logger.warning("Supabase credentials not found in environment variables")
             self.client = None
         else:
             try:
+                # Imported here so the SQLite backend and demo mode never pay for it
+                from supabase import create_client
                 self.client = create_client(self.supabase_url, self.supabase_key)
+                if attach_cassette(self.client.postgrest.session, "supabase"):
+                    logger.info("Supabase requests go through a cassette")
                 logger.info("Supabase client initialized successfully")
             except Exception as e:
                 logger.error(f"Failed to initialize Supabase client: {e}")
@@ -35,8 +59,18 @@ class SupabaseClient:
                           transcribed_text: str,
                           language: str,
                           farmer_mobile: str,
-                          audio_url: Optional[str] = None) -> Dict[str, Any]:
-        """Store product information in database"""
+                          audio_url: Optional[str] = None,
+                          deadline: Optional[Deadline] = None,
+                          idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """Store product information in database
+
+        With an idempotency_key that is already on one of this farmer's
+        products, nothing is inserted and the existing product is returned.
+        Without a configured client a mock product is returned; with one,
+        database errors are raised, as in the SQLite client.
+        """
+        if deadline is not None:
+            deadline.check("store")
         try:
             if not self.client:
                 return self._mock_store_product(product_info, ai_suggestions, transcribed_text, language, farmer_mobile)
@@ -49,10 +83,20 @@ class SupabaseClient:
                 "language": language,
                 "audio_url": audio_url,
                 "status": "pending",
+                **normalize_product_info(product_info, transcribed_text),
                 "created_at": datetime.now().isoformat()
             }
             
-            result = self.client.table("products").insert(data).execute()
+            if idempotency_key:
+                data["idempotency_key"] = idempotency_key
+                result = self.client.table("products").upsert(
+                    data, on_conflict="farmer_mobile,idempotency_key", ignore_duplicates=True
+                ).execute()
+                if not result.data:
+                    result = self.client.table("products").select("*").eq("farmer_mobile", farmer_mobile) \
+                        .eq("idempotency_key", idempotency_key).execute()
+            else:
+                result = self.client.table("products").insert(data).execute()
             
             if result.data:
                 logger.info(f"Product stored successfully with ID: {result.data[0]['id']}")
@@ -61,9 +105,77 @@ class SupabaseClient:
                 raise Exception("Failed to store product")
                 
         except Exception as e:
+            # A made-up product here would be recorded under the idempotency key
+            # and replayed to every retry, so the product would never be stored
             logger.error(f"Error storing product: {e}")
-            return self._mock_store_product(product_info, ai_suggestions, transcribed_text, language, farmer_mobile)
+            raise
     
+    async def bulk_store_products(self, products: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Store many products in one insert (two with idempotency keys), returning the stored rows in order
+
+        Each product has the keyword arguments of store_product. A product
+        whose idempotency_key is already stored for its farmer is not
+        inserted again; the existing row is returned in its place.
+        """
+        if not self.client:
+            return [self._mock_store_product(product["product_info"], product["ai_suggestions"],
+                                             product["transcribed_text"], product["language"],
+                                             product["farmer_mobile"]) for product in products]
+
+        created_at = datetime.now().isoformat()
+        keyed, unkeyed = [], []
+        for position, product in enumerate(products):
+            data = {
+                "farmer_mobile": product["farmer_mobile"],
+                "product_info": json.dumps(product["product_info"]),
+                "ai_suggestions": json.dumps(product["ai_suggestions"]),
+                "transcribed_text": product["transcribed_text"],
+                "language": product["language"],
+                "audio_url": product.get("audio_url"),
+                "status": "pending",
+                **normalize_product_info(product["product_info"], product["transcribed_text"]),
+                "created_at": created_at
+            }
+            if product.get("idempotency_key"):
+                data["idempotency_key"] = product["idempotency_key"]
+                keyed.append((position, data))
+            else:
+                unkeyed.append((position, data))
+
+        try:
+            stored: List[Optional[Dict[str, Any]]] = [None] * len(products)
+            if unkeyed:
+                result = self.client.table("products").insert([data for _, data in unkeyed]).execute()
+                # PostgREST returns inserted rows in the order they were sent
+                for (position, _), row in zip(unkeyed, result.data or []):
+                    stored[position] = row
+
+            if keyed:
+                result = self.client.table("products").upsert(
+                    [data for _, data in keyed], on_conflict="farmer_mobile,idempotency_key", ignore_duplicates=True
+                ).execute()
+                by_key = {(row["farmer_mobile"], row["idempotency_key"]): row for row in result.data or []}
+                missing = [(data["farmer_mobile"], data["idempotency_key"]) for _, data in keyed
+                           if (data["farmer_mobile"], data["idempotency_key"]) not in by_key]
+                if missing:
+                    # Stored earlier; return those rows instead. The key alone can match
+                    # other farmers' products, which the pair lookup below skips.
+                    result = self.client.table("products").select("*") \
+                        .in_("farmer_mobile", sorted({mobile for mobile, _ in missing})) \
+                        .in_("idempotency_key", sorted({key for _, key in missing})).execute()
+                    by_key.update({(row["farmer_mobile"], row["idempotency_key"]): row for row in result.data or []})
+                for position, data in keyed:
+                    stored[position] = by_key.get((data["farmer_mobile"], data["idempotency_key"]))
+
+            if any(row is None for row in stored):
+                raise Exception("Failed to store products")
+            logger.info(f"Bulk stored {len(stored)} products")
+            return stored
+
+        except Exception as e:
+            logger.error(f"Error bulk storing products: {e}")
+            raise
+
     async def get_products_by_mobile(self, mobile: str) -> List[Dict[str, Any]]:
         """Get products by farmer mobile number"""
         try:
@@ -80,6 +192,7 @@ class SupabaseClient:
                 
         except Exception as e:
             logger.error(f"Error getting products: {e}")
+            record_fallback(e)
             return self._mock_get_products(mobile)
     
     async def update_product_status(self, product_id: str, status: str) -> Dict[str, Any]:
@@ -103,8 +216,58 @@ class SupabaseClient:
                 
         except Exception as e:
             logger.error(f"Error updating product status: {e}")
+            record_fallback(e)
             return {"success": False, "message": str(e)}
     
+    async def bulk_update_product_status(self, updates: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """Update the status of many products in a single RPC round-trip
+
+        IDs are reported in canonical form (lowercase, hyphenated), which is
+        how Postgres returns the updated rows.
+        """
+        # Later entries for the same product win, matching sequential taps.
+        # Key on the canonical UUID so "{ABC...}" and "abc..." are one product.
+        pending = {}
+        invalid = set()
+        for update in updates:
+            try:
+                product_id = str(uuid.UUID(update["product_id"]))
+            except ValueError:
+                # Malformed IDs would abort the whole statement on the UUID cast
+                product_id = update["product_id"]
+                invalid.add(product_id)
+            pending[product_id] = update["status"]
+
+        if not self.client:
+            return [{"product_id": product_id, "status": status, "success": True,
+                     "message": "Status updated (demo mode)"} for product_id, status in pending.items()]
+
+        results = {product_id: {"product_id": product_id, "status": pending[product_id],
+                                "success": False, "message": "Invalid product ID"} for product_id in invalid}
+        valid = [{"product_id": product_id, "status": status}
+                 for product_id, status in pending.items() if product_id not in invalid]
+
+        try:
+            if valid:
+                result = self.client.rpc("bulk_update_product_status", {"updates": valid}).execute()
+                updated = {str(uuid.UUID(row["product_id"])) for row in (result.data or [])}
+
+                for item in valid:
+                    if item["product_id"] in updated:
+                        results[item["product_id"]] = {**item, "success": True, "message": "Status updated successfully"}
+                    else:
+                        results[item["product_id"]] = {**item, "success": False, "message": "Product not found"}
+
+                logger.info(f"Bulk status update applied to {len(updated)} of {len(valid)} products")
+
+        except Exception as e:
+            logger.error(f"Error bulk updating product status: {e}")
+            record_fallback(e)
+            for item in valid:
+                results[item["product_id"]] = {**item, "success": False, "message": str(e)}
+
+        return [results[product_id] for product_id in pending]
+
     async def get_unsold_products(self, days: int = 7) -> List[Dict[str, Any]]:
         """Get unsold products older than specified days"""
         try:
@@ -123,6 +286,7 @@ class SupabaseClient:
                 
         except Exception as e:
             logger.error(f"Error getting unsold products: {e}")
+            record_fallback(e)
             return self._mock_get_unsold_products(days)
     
     async def update_product_suggestions(self, product_id: str, suggestions: Dict[str, Any]) -> Dict[str, Any]:
@@ -146,8 +310,35 @@ class SupabaseClient:
                 
         except Exception as e:
             logger.error(f"Error updating product suggestions: {e}")
+            record_fallback(e)
             return {"success": False, "message": str(e)}
     
+    async def update_product_details(self, product_id: str, product_info: Dict[str, Any],
+                                     ai_suggestions: Dict[str, Any], transcribed_text: str) -> Optional[Dict[str, Any]]:
+        """Replace a stored product's extracted info and AI suggestions, e.g. after a partial response"""
+        try:
+            if not self.client:
+                return None
+            
+            data = {
+                "product_info": json.dumps(product_info),
+                "ai_suggestions": json.dumps(ai_suggestions),
+                **normalize_product_info(product_info, transcribed_text),
+                "updated_at": datetime.now().isoformat()
+            }
+            
+            result = self.client.table("products").update(data).eq("id", product_id).execute()
+            
+            if result.data:
+                logger.info(f"Product {product_id} details updated")
+                return result.data[0]
+            return None
+                
+        except Exception as e:
+            logger.error(f"Error updating product details: {e}")
+            record_fallback(e)
+            return None
+    
     async def register_farmer(self, farmer_data: Dict[str, Any]) -> Dict[str, Any]:
         """Register a new farmer"""
         try:
@@ -173,6 +364,7 @@ class SupabaseClient:
                 
         except Exception as e:
             logger.error(f"Error registering farmer: {e}")
+            record_fallback(e)
             return self._mock_register_farmer(farmer_data)
     
     async def login_farmer(self, credentials: Dict[str, str]) -> Dict[str, Any]:
@@ -193,12 +385,157 @@ class SupabaseClient:
                 
         except Exception as e:
             logger.error(f"Error logging in farmer: {e}")
+            record_fallback(e)
             return self._mock_login_farmer(credentials)
     
+    async def search_products(self, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Search product listings across all farmers"""
+        try:
+            if not self.client:
+                return self._mock_get_products("9876543210")
+            
+            created_after = filters.get("created_after")
+            params = {
+                # Every token must appear in the name or description, as in the catalog index
+                "search_terms": tokenize(filters.get("query") or "") or None,
+                "search_language": filters.get("language"),
+                "search_status": filters.get("status"),
+                "min_price": filters.get("min_price"),
+                "max_price": filters.get("max_price"),
+                "created_after": created_after.isoformat() if created_after else None,
+                "result_limit": filters.get("limit", 20)
+            }
+            
+            result = self.client.rpc("search_products", params).execute()
+            logger.info(f"Catalog search returned {len(result.data or [])} products")
+            return result.data or []
+            
+        except Exception as e:
+            logger.error(f"Error searching products: {e}")
+            record_fallback(e)
+            return []
+    
+    async def get_recent_products(self, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Get the most recently listed products across all farmers
+
+        Read in pages, since PostgREST cuts each response to its max-rows
+        setting. A page is only taken as the last one when it is empty, so a
+        max-rows below the page size still returns every row. Errors are
+        raised, so the catalog index never mistakes a failed read for an
+        empty catalog.
+        """
+        if not self.client:
+            return self._mock_get_products("9876543210")
+
+        products: List[Dict[str, Any]] = []
+        try:
+            while len(products) < limit:
+                start = len(products)
+                end = min(limit, start + RECENT_PRODUCTS_PAGE_SIZE) - 1
+                result = self.client.table("products").select("*").order("created_at", desc=True) \
+                    .range(start, end).execute()
+                if not result.data:
+                    break
+                products.extend(result.data)
+            return products[:limit]
+
+        except Exception as e:
+            logger.error(f"Error getting recent products: {e}")
+            raise
+    
+    async def get_products_for_normalization(self, after_id: str = "", limit: int = 500) -> List[Dict[str, Any]]:
+        """Get a page of products missing normalized quantity/price, ordered by ID"""
+        if not self.client:
+            return []
+        
+        query = self.client.table("products").select("id, product_info, transcribed_text")
+        query = query.or_("quantity_kg.is.null,price_per_kg_inr.is.null")
+        if after_id:
+            query = query.gt("id", after_id)
+        
+        result = query.order("id").limit(limit).execute()
+        return result.data or []
+    
+    async def bulk_update_product_normalization(self, updates: List[Dict[str, Any]]) -> int:
+        """Write normalized quantity/price columns for many products in one RPC"""
+        if not self.client:
+            return 0
+        
+        result = self.client.rpc("bulk_update_product_normalization", {"updates": updates}).execute()
+        updated = result.data or 0
+        logger.info(f"Normalized quantity/price for {updated} products")
+        return updated
+    
+    async def get_farmer_stats(self, mobile: str) -> Dict[str, Any]:
+        """Get the incrementally maintained product counters for a farmer"""
+        try:
+            if not self.client:
+                return self._mock_get_farmer_stats(mobile)
+            
+            result = self.client.table("farmer_product_stats").select("*").eq("farmer_mobile", mobile).execute()
+            
+            if result.data:
+                return result.data[0]
+            else:
+                return self._empty_farmer_stats(mobile)
+                
+        except Exception as e:
+            logger.error(f"Error getting farmer stats: {e}")
+            record_fallback(e)
+            return self._mock_get_farmer_stats(mobile)
+    
+    async def try_acquire_lease(self, name: str, holder: str, ttl_seconds: int) -> bool:
+        """Take or renew a named lease, returning True when holder now holds it"""
+        try:
+            if not self.client:
+                return True
+            
+            result = self.client.rpc("try_acquire_lease", {
+                "lease_name": name,
+                "lease_holder": holder,
+                "ttl_seconds": ttl_seconds
+            }).execute()
+            return bool(result.data)
+            
+        except Exception as e:
+            logger.error(f"Error acquiring lease {name}: {e}")
+            record_fallback(e)
+            return False
+    
+    async def reconcile_farmer_stats(self, mobile: Optional[str] = None) -> int:
+        """Recompute farmer counters from the products table, returning rows corrected"""
+        try:
+            if not self.client:
+                return 0
+            
+            result = self.client.rpc("reconcile_farmer_stats", {"farmer_phone": mobile}).execute()
+            corrected = result.data or 0
+            
+            if corrected:
+                logger.warning(f"Reconciled {corrected} drifted farmer stats rows")
+            return corrected
+            
+        except Exception as e:
+            logger.error(f"Error reconciling farmer stats: {e}")
+            record_fallback(e)
+            return 0
+    
+    def _empty_farmer_stats(self, mobile: str) -> Dict[str, Any]:
+        """Counters for a farmer with no products"""
+        return {
+            "farmer_mobile": mobile,
+            "total_products": 0,
+            "sold_products": 0,
+            "pending_products": 0,
+            "expired_products": 0,
+            "total_revenue": 0
+        }
+    
     def get_connection_status(self) -> Dict[str, Any]:
         """Get database connection status"""
         return {
             "connected": self.client is not None,
+            "backend": "supabase",
             "url_configured": self.supabase_url is not None,
             "key_configured": self.supabase_key is not None
         }
@@ -236,6 +573,17 @@ class SupabaseClient:
             }
         ]
     
+    def _mock_get_farmer_stats(self, mobile: str) -> Dict[str, Any]:
+        """Mock farmer stats for demo"""
+        return {
+            "farmer_mobile": mobile,
+            "total_products": 1,
+            "sold_products": 0,
+            "pending_products": 1,
+            "expired_products": 0,
+            "total_revenue": 0
+        }
+    
     def _mock_get_unsold_products(self, days: int) -> List[Dict[str, Any]]:
         """Mock unsold products for demo"""
         return [
@@ -0,0 +1,371 @@
+"""
+Tracing for AgriVoice
+Nested spans with W3C trace context propagation and pluggable file exporters
+"""
+
+import os
+import json
+import time
+import queue
+import random
+import logging
+import functools
+import threading
+import inspect
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "agrivoice-api"
+
+class Span:
+    """One timed operation in a trace"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "sampled", "attributes",
+                 "status", "error", "start_ns", "end_ns", "_root")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool,
+                 attributes: Optional[Dict[str, Any]] = None, root: Optional["Span"] = None):
+        self.trace_id = trace_id
+        self.span_id = _random_hex(16)
+        self.parent_id = parent_id
+        self.name = name
+        self.sampled = sampled
+        self.attributes = dict(attributes or {})
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        # Spans of a local trace are collected on its root and exported together
+        self._root = root
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if self.sampled and value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, **attributes) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes
+        }
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+def _random_hex(length: int) -> str:
+    return f"{random.getrandbits(length * 4):0{length}x}"
+
+def parse_traceparent(header: Optional[str]):
+    """(trace_id, parent span id, sampled) from a W3C traceparent header, or None"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    trace_id, parent_id, flags = parts[1].lower(), parts[2].lower(), parts[3]
+    if trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    try:
+        int(trace_id, 16), int(parent_id, 16)
+        sampled = bool(int(flags, 16) & 1)
+    except ValueError:
+        return None
+    return trace_id, parent_id, sampled
+
+class JSONFileExporter:
+    """Writes each finished trace as JSON lines, one span per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Span]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps({"service": SERVICE_NAME, **span.to_dict()}, ensure_ascii=False, default=str) + "\n")
+
+class OTLPFileExporter:
+    """Writes each finished trace as one OTLP/JSON ExportTraceServiceRequest per line
+
+    This is the format of the OpenTelemetry Collector's file exporter, so the
+    files can be replayed into any OTLP-compatible backend.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Span]) -> None:
+        request = {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{
+                "scope": {"name": "agrivoice"},
+                "spans": [self._span(span) for span in spans]
+            }]
+        }]}
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(request, ensure_ascii=False, default=str) + "\n")
+
+    @staticmethod
+    def _span(span: Span) -> Dict[str, Any]:
+        otlp = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            # SERVER for request spans, INTERNAL for everything else
+            "kind": 2 if span.name.startswith("HTTP ") else 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.status == "error" else {"code": 1}
+        }
+        if span.parent_id:
+            otlp["parentSpanId"] = span.parent_id
+        return otlp
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+def create_exporter():
+    """Create the exporter selected by TRACE_EXPORTER (none, json or otlp-file)"""
+    exporter = os.getenv("TRACE_EXPORTER", "none").lower()
+    if exporter == "json":
+        return JSONFileExporter(os.getenv("TRACE_EXPORT_PATH", "traces.jsonl"))
+    if exporter == "otlp-file":
+        return OTLPFileExporter(os.getenv("TRACE_EXPORT_PATH", "traces.otlp.jsonl"))
+    if exporter != "none":
+        logger.warning(f"Unknown TRACE_EXPORTER '{exporter}', tracing export disabled")
+    return None
+
+class Tracer:
+    """Creates spans and hands finished traces to an exporter on a background thread
+
+    A trace is sampled when an incoming traceparent says so, or otherwise
+    with probability sample_rate at its root. Unsampled spans still carry
+    ids, so trace context reaches logs and responses, but nothing is
+    recorded or exported. Any object with an export(spans) method can be
+    used as the exporter.
+    """
+
+    def __init__(self, exporter=None, sample_rate: Optional[float] = None, max_queue: int = 1000):
+        self.exporter = exporter if exporter is not None else create_exporter()
+        rate = sample_rate if sample_rate is not None else float(os.getenv("TRACE_SAMPLE_RATE", 0.1))
+        self.sample_rate = min(max(rate, 0.0), 1.0) if self.exporter is not None else 0.0
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[List[Span]]]" = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._pending: Dict[str, List[Span]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def start_span(self, name: str, traceparent: Optional[str] = None, **attributes):
+        """Run the block in a child of the current span (or a new trace), ending it on exit"""
+        parent = _current_span.get()
+        if parent is not None:
+            span = Span(name, parent.trace_id, parent.span_id, parent.sampled, attributes, parent._root or parent)
+        else:
+            incoming = parse_traceparent(traceparent)
+            if incoming is not None:
+                trace_id, parent_id, sampled = incoming
+                sampled = sampled and self.exporter is not None
+            else:
+                trace_id, parent_id = _random_hex(32), None
+                sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+            span = Span(name, trace_id, parent_id, sampled, attributes)
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            self._finish(span)
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Wait until queued traces have been written"""
+        if self._thread is None:
+            return
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _finish(self, span: Span) -> None:
+        span.end_ns = time.time_ns()
+        if not span.sampled:
+            return
+        root = span._root or span
+        if span is not root and root.end_ns is not None:
+            # Outlived its trace's request, e.g. a background completion
+            self._enqueue([span])
+            return
+        with self._lock:
+            spans = self._pending.setdefault(root.span_id, [])
+            spans.append(span)
+            if span is not root:
+                return
+            del self._pending[root.span_id]
+        self._enqueue(spans)
+
+    def _enqueue(self, spans: List[Span]) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self.dropped += 1
+
+    def _export_loop(self) -> None:
+        while True:
+            spans = self._queue.get()
+            try:
+                self.exporter.export(spans)
+            except Exception as e:
+                logger.error(f"Trace export error: {e}")
+            finally:
+                self._queue.task_done()
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+@functools.lru_cache(maxsize=None)
+def get_tracer() -> Tracer:
+    """Get the shared tracer, configured from TRACE_EXPORTER and TRACE_SAMPLE_RATE"""
+    return Tracer()
+
+def start_span(name: str, **attributes):
+    """Start a span on the shared tracer"""
+    return get_tracer().start_span(name, **attributes)
+
+def record_fallback(error: BaseException) -> None:
+    """Mark the current storage span as failed but answered with a fallback (mock data, [] or False)
+
+    Storage clients call this where they catch a database error instead of
+    raising it, so the span is not reported as a success.
+    """
+    span = _current_span.get()
+    if span is not None:
+        span.record_error(error)
+        span.set_attribute("outcome", "fallback")
+
+def _payload_bytes(value: Any) -> int:
+    """Approximate size of a storage call's arguments or result, as UTF-8 JSON"""
+    try:
+        return len(json.dumps(value, default=str, ensure_ascii=False).encode())
+    except (TypeError, ValueError):
+        return 0
+
+def traced_client(prefix: str, offline: Optional[Callable[[Any], bool]] = None):
+    """Class decorator giving every public async method of a storage client its own span
+
+    offline(client) tells when the client answers with demo data instead of
+    a database; those calls get outcome "fallback".
+    """
+    def decorate(cls):
+        for name, method in list(vars(cls).items()):
+            if name.startswith("_") or not inspect.iscoroutinefunction(method):
+                continue
+            setattr(cls, name, _traced_method(f"{prefix}.{name}", prefix, method, offline))
+        return cls
+    return decorate
+
+def _traced_method(span_name: str, backend: str, method, offline: Optional[Callable[[Any], bool]]):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        with start_span(span_name, **{"db.system": backend}) as span:
+            if "language" in kwargs:
+                span.set_attribute("language", kwargs["language"])
+            if span.sampled:
+                # args[0] is the client
+                span.set_attribute("db.request_bytes", _payload_bytes([args[1:], kwargs]))
+            try:
+                result = await method(*args, **kwargs)
+            except Exception:
+                span.set_attribute("outcome", "error")
+                raise
+            if isinstance(result, list):
+                span.set_attribute("db.rows", len(result))
+            if span.sampled:
+                span.set_attribute("db.response_bytes", _payload_bytes(result))
+            if "outcome" not in span.attributes:
+                span.set_attribute("outcome", "fallback" if offline is not None and offline(args[0]) else "ok")
+            return result
+    return wrapper
+
+class TracingMiddleware:
+    """ASGI middleware opening a server span per request
+
+    Continues the caller's trace from a traceparent header and returns the
+    trace id in an X-Trace-Id response header.
+    """
+
+    def __init__(self, app, tracer: Optional[Tracer] = None):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tracer = self.tracer or get_tracer()
+        headers = dict(scope["headers"])
+        traceparent = headers.get(b"traceparent", b"").decode("latin-1") or None
+        content_length = headers.get(b"content-length", b"").decode("latin-1")
+
+        with tracer.start_span(f"HTTP {scope['method']}", traceparent=traceparent,
+                               **{"http.method": scope["method"], "http.target": scope["path"]}) as span:
+            if content_length.isdigit():
+                span.set_attribute("http.request_content_length", int(content_length))
+
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.status = "error"
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [(b"x-trace-id", span.trace_id.encode())]
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace)
+            route = scope.get("route")
+            if route is not None:
+                span.name = f"HTTP {scope['method']} {route.path}"
+                span.set_attribute("http.route", route.path)
@@ -0,0 +1,194 @@
+"""
+Voice Pipeline for AgriVoice
+Runs speech-to-text, product extraction, AI suggestions and storage for one voice listing
+"""
+
+import os
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Callable, Coroutine
+
+from utils.ai_dispatcher import ai_work
+from utils.clients import get_ai_client, get_audio_processor, get_storage_client
+from utils.deadline import Deadline, DeadlineExceeded
+from utils.metrics import stage_timer, VOICE_PARTIAL
+from utils.tracing import start_span
+
+logger = logging.getLogger(__name__)
+
+# Stage names reported to on_stage, in order
+STAGES = ("transcribe", "extract", "suggest", "store")
+
+# Part of the latency budget held back from the AI stages so the product can still be stored
+STORE_RESERVE_SECONDS = float(os.getenv("VOICE_STORE_RESERVE_MS", 300)) / 1000
+
+# Most of a budget the reserve may take, so short budgets still leave time for the AI stages
+STORE_RESERVE_MAX_FRACTION = 0.5
+
+# References to background completions started without a spawn function
+_background_tasks = set()
+
+def _spawn_default(coro: Coroutine) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+async def run_voice_pipeline(audio_data: Optional[str], transcribed_text: Optional[str], language: str,
+                             farmer_mobile: Optional[str], catalog_index=None,
+                             on_stage: Optional[Callable[[str], None]] = None,
+                             deadline: Optional[Deadline] = None,
+                             spawn: Optional[Callable[[Coroutine], asyncio.Task]] = None,
+                             priority: str = "interactive",
+                             idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+    """Process one voice listing end to end and build the API response
+
+    on_stage, if given, is called with each stage name as the stage starts.
+    priority is the AI dispatcher class for the Gemini calls: "interactive"
+    for a farmer waiting on the response, "batch" for queued jobs.
+    idempotency_key is saved on the product, so a retry never stores twice.
+
+    With a deadline, the AI stages give up when the budget (less a reserve
+    for storing) runs out. The product is then stored with what is known,
+    the response is flagged "partial" with the "pending_stages", and the
+    pending stages finish in a background task (started with spawn) that
+    updates the stored product. The reserve is capped at half the budget.
+    Transcription cannot be deferred, since every later stage needs its
+    text, so a deadline hit there raises DeadlineExceeded.
+    """
+    def enter(stage: str) -> None:
+        if on_stage:
+            on_stage(stage)
+
+    logger.info(f"Processing voice input in language: {language}")
+    ai_deadline = None
+    if deadline is not None:
+        ai_deadline = deadline.reserve(min(STORE_RESERVE_SECONDS, deadline.remaining() * STORE_RESERVE_MAX_FRACTION))
+    pending: List[str] = []
+    product_info: Dict[str, Any] = {}
+    ai_suggestions: Dict[str, Any] = {}
+    stored_product: Dict[str, Any] = {}
+
+    # Step 1: Speech-to-Text conversion
+    enter("transcribe")
+    if audio_data:
+        try:
+            transcribed_text = await get_audio_processor().process_audio(audio_data, language, deadline=deadline)
+        except DeadlineExceeded as e:
+            # Nothing can be stored or deferred without the text; the caller answers 504
+            logger.warning(f"{e}, giving up on the request")
+            raise
+    elif not transcribed_text:
+        raise ValueError("Either audio_data or transcribed_text must be provided")
+
+    logger.info(f"Transcribed text: {transcribed_text}")
+
+    with ai_work(priority, language, farmer_mobile or "demo"):
+        # Step 2: Extract product information
+        enter("extract")
+        try:
+            with stage_timer("extract", language), start_span("voice.extract", language=language):
+                product_info = await get_ai_client().extract_product_info(transcribed_text, language, deadline=ai_deadline)
+            logger.info(f"Extracted product info: {product_info}")
+        except DeadlineExceeded as e:
+            logger.warning(f"{e}, deferring extraction")
+            pending = ["extract", "suggest"]
+
+        # Step 3: Generate AI suggestions
+        if not pending:
+            enter("suggest")
+            try:
+                with stage_timer("suggest", language), start_span("voice.suggest", language=language):
+                    ai_suggestions = await get_ai_client().generate_suggestions(
+                        product_info, transcribed_text, language, deadline=ai_deadline
+                    )
+                logger.info(f"Generated AI suggestions: {ai_suggestions}")
+            except DeadlineExceeded as e:
+                logger.warning(f"{e}, deferring suggestions")
+                pending = ["suggest"]
+
+    # Step 4: Store in the configured database
+    enter("store")
+    try:
+        with stage_timer("store", language), start_span("voice.store", language=language):
+            stored_product = await get_storage_client().store_product(
+                product_info=product_info or {"original_text": transcribed_text},
+                ai_suggestions=ai_suggestions,
+                transcribed_text=transcribed_text,
+                language=language,
+                farmer_mobile=farmer_mobile or "demo",
+                deadline=deadline,
+                idempotency_key=idempotency_key
+            )
+        if catalog_index is not None:
+            catalog_index.add_product(stored_product)
+    except DeadlineExceeded as e:
+        logger.warning(f"{e}, deferring storage")
+        pending.append("store")
+
+    if pending:
+        VOICE_PARTIAL.inc(language=language)
+        (spawn or _spawn_default)(_finish_pending_stages(
+            pending, transcribed_text, language, farmer_mobile, product_info, ai_suggestions,
+            stored_product.get("id"), catalog_index, idempotency_key
+        ))
+
+    # Step 5: Return complete response
+    return build_voice_response(transcribed_text, language, product_info, ai_suggestions, stored_product, pending)
+
+def build_voice_response(transcribed_text: str, language: str, product_info: Dict[str, Any],
+                         ai_suggestions: Dict[str, Any], stored_product: Dict[str, Any],
+                         pending: List[str]) -> Dict[str, Any]:
+    """Assemble the /api/complete-voice-process response from the stage results"""
+    response = {
+        "success": True,
+        "transcribed_text": transcribed_text,
+        "product": product_info.get("product", ""),
+        "quantity": product_info.get("quantity", ""),
+        "price": product_info.get("price", ""),
+        "description": ai_suggestions.get("description", ""),
+        "suggested_price_range": ai_suggestions.get("price_range", ""),
+        "market_suggestion": ai_suggestions.get("where_to_sell", ""),
+        "selling_tip": ai_suggestions.get("selling_tip", ""),
+        "product_id": stored_product.get("id"),
+        "language": language,
+        "partial": bool(pending)
+    }
+    if pending:
+        response["pending_stages"] = pending
+    return response
+
+async def _finish_pending_stages(pending: List[str], transcribed_text: str, language: str,
+                                 farmer_mobile: Optional[str], product_info: Dict[str, Any],
+                                 ai_suggestions: Dict[str, Any], product_id: Optional[str],
+                                 catalog_index=None, idempotency_key: Optional[str] = None) -> None:
+    """Run the stages a partial response skipped, without a deadline, and save the results
+
+    Nobody is waiting on these, so the AI calls run in the batch class.
+    """
+    try:
+        with ai_work("batch", language, farmer_mobile or "demo"):
+            if "extract" in pending:
+                product_info = await get_ai_client().extract_product_info(transcribed_text, language)
+            if "suggest" in pending:
+                ai_suggestions = await get_ai_client().generate_suggestions(product_info, transcribed_text, language)
+
+        storage_client = get_storage_client()
+        if product_id:
+            product = await storage_client.update_product_details(
+                product_id, product_info, ai_suggestions, transcribed_text
+            )
+        else:
+            product = await storage_client.store_product(
+                product_info=product_info,
+                ai_suggestions=ai_suggestions,
+                transcribed_text=transcribed_text,
+                language=language,
+                farmer_mobile=farmer_mobile or "demo",
+                idempotency_key=idempotency_key
+            )
+        if product and catalog_index is not None:
+            catalog_index.add_product(product)
+        logger.info(f"Finished deferred stages {pending} for product {product_id or (product or {}).get('id')}")
+    except Exception as e:
+        logger.error(f"Error finishing deferred stages {pending}: {e}")
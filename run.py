@@ -2,6 +2,11 @@
 """
 AgriVoice - Simple Startup Script
 Run this to start the AgriVoice application
+
+    python run.py              # development server with auto-reload
+    python run.py --install    # install dependencies first
+
+Set SERVER_MODE=production to start the multi-worker server instead.
 """
 
 import subprocess
@@ -11,31 +16,35 @@ import os
 def main():
     print("🌾 AgriVoice - Voice-based Product Catalog")
     print("=" * 50)
-    
-    # Install dependencies
-    print("📦 Installing dependencies...")
-    try:
-        subprocess.run([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"], check=True)
-        print("✅ Dependencies installed!")
-    except subprocess.CalledProcessError:
-        print("⚠️  Some dependencies may not have installed properly")
-    
+
+    # Install dependencies only when asked
+    if "--install" in sys.argv[1:]:
+        print("📦 Installing dependencies...")
+        try:
+            subprocess.run([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"], check=True)
+            print("✅ Dependencies installed!")
+        except subprocess.CalledProcessError:
+            print("⚠️  Some dependencies may not have installed properly")
+
+    # Development defaults: local-only and reloading on code changes
+    env = os.environ.copy()
+    if env.get("SERVER_MODE", "development").lower() != "production":
+        env.setdefault("HOST", "127.0.0.1")
+        env.setdefault("DEBUG", "True")
+
     # Start the server
     print("\n🚀 Starting AgriVoice API server...")
     print("📱 Open http://localhost:8000 in your browser")
     print("📚 API Docs: http://localhost:8000/docs")
     print("🛑 Press Ctrl+C to stop")
     print("\n" + "="*50)
-    
+
     # Change to backend directory and start server
     os.chdir("backend")
-    subprocess.run([
-        sys.executable, "-m", "uvicorn", 
-        "main:app", 
-        "--host", "127.0.0.1", 
-        "--port", "8000",
-        "--reload"
-    ])
+    try:
+        subprocess.run([sys.executable, "start_server.py"], env=env)
+    except KeyboardInterrupt:
+        pass
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
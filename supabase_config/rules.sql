@@ -44,6 +44,9 @@ CREATE POLICY "Farmers can update their own products" ON products
 CREATE POLICY "Public read access for demo" ON products
     FOR SELECT USING (true);
 
+CREATE POLICY "Public read access to stats for demo" ON farmer_product_stats
+    FOR SELECT USING (true);
+
 -- Function to check if user is authenticated
 CREATE OR REPLACE FUNCTION is_authenticated()
 RETURNS BOOLEAN AS $$
@@ -64,4 +67,11 @@ $$ LANGUAGE plpgsql SECURITY DEFINER;
 GRANT USAGE ON SCHEMA public TO anon, authenticated;
 GRANT ALL ON ALL TABLES IN SCHEMA public TO anon, authenticated;
 GRANT ALL ON ALL SEQUENCES IN SCHEMA public TO anon, authenticated;
-GRANT ALL ON ALL FUNCTIONS IN SCHEMA public TO anon, authenticated; 
\ No newline at end of file
+GRANT ALL ON ALL FUNCTIONS IN SCHEMA public TO anon, authenticated;
+
+-- Definer functions that bypass RLS stay with the backend's service_role key
+-- (the blanket grant above would otherwise hand them back to anon)
+REVOKE EXECUTE ON FUNCTION search_products(TEXT[], VARCHAR, VARCHAR, NUMERIC, NUMERIC, TIMESTAMP WITH TIME ZONE, INTEGER)
+    FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION try_acquire_lease(TEXT, TEXT, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION reconcile_farmer_stats(VARCHAR) FROM PUBLIC, anon, authenticated;
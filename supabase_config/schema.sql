@@ -4,6 +4,9 @@
 -- Enable UUID extension
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 
+-- Enable trigram matching for catalog search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- Farmers table
 CREATE TABLE IF NOT EXISTS farmers (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -28,6 +31,9 @@ CREATE TABLE IF NOT EXISTS products (
     audio_url TEXT,
     status VARCHAR(20) DEFAULT 'pending',
     improvement_suggestions JSONB,
+    quantity_kg NUMERIC,
+    price_per_kg_inr NUMERIC,
+    idempotency_key TEXT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
@@ -40,11 +46,25 @@ ALTER TABLE products
 ALTER COLUMN status TYPE product_status 
 USING status::product_status;
 
+-- Normalized quantity/price columns for databases created before they existed
+-- (fill them with backend/backfill_normalization.py)
+ALTER TABLE products ADD COLUMN IF NOT EXISTS quantity_kg NUMERIC;
+ALTER TABLE products ADD COLUMN IF NOT EXISTS price_per_kg_inr NUMERIC;
+
+-- Client Idempotency-Key of the request that stored the product, unique per
+-- farmer so two farmers' clients picking the same key never share a product;
+-- NULLs don't conflict, so only keyed retries are deduplicated
+ALTER TABLE products ADD COLUMN IF NOT EXISTS idempotency_key TEXT;
+DROP INDEX IF EXISTS idx_products_idempotency_key;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_products_farmer_idempotency_key ON products(farmer_mobile, idempotency_key);
+
 -- Indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_products_farmer_mobile ON products(farmer_mobile);
 CREATE INDEX IF NOT EXISTS idx_products_status ON products(status);
 CREATE INDEX IF NOT EXISTS idx_products_created_at ON products(created_at);
 CREATE INDEX IF NOT EXISTS idx_products_language ON products(language);
+CREATE INDEX IF NOT EXISTS idx_products_quantity_kg ON products(quantity_kg);
+CREATE INDEX IF NOT EXISTS idx_products_price_per_kg ON products(price_per_kg_inr);
 
 CREATE INDEX IF NOT EXISTS idx_farmers_phone ON farmers(phone);
 CREATE INDEX IF NOT EXISTS idx_farmers_email ON farmers(email);
@@ -97,7 +117,33 @@ CREATE TRIGGER update_products_updated_at
     BEFORE UPDATE ON products 
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
--- Function to get product statistics
+-- product_info may hold a JSON object or a JSON-encoded string of one
+CREATE OR REPLACE FUNCTION product_info_json(info JSONB)
+RETURNS JSONB AS $$
+BEGIN
+    IF jsonb_typeof(info) = 'string' THEN
+        RETURN (info #>> '{}')::JSONB;
+    END IF;
+    RETURN info;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- Numeric amount of a product's listed price, e.g. 40 for "₹40"
+CREATE OR REPLACE FUNCTION product_price_amount(info JSONB)
+RETURNS NUMERIC AS $$
+    SELECT substring(product_info_json(info)->>'price' FROM '[0-9]+(?:\.[0-9]+)?')::NUMERIC;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Sale value of a product: normalized price x quantity, falling back to the
+-- listed price when the free-text fields could not be normalized
+CREATE OR REPLACE FUNCTION product_revenue(price_per_kg_inr NUMERIC, quantity_kg NUMERIC, info JSONB)
+RETURNS NUMERIC AS $$
+    SELECT COALESCE(price_per_kg_inr * quantity_kg, product_price_amount(info));
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Function to get product statistics (full scan of the farmer's products)
 CREATE OR REPLACE FUNCTION get_product_statistics(farmer_phone VARCHAR)
 RETURNS JSON AS $$
 DECLARE
@@ -108,6 +154,8 @@ BEGIN
         'sold_products', COUNT(*) FILTER (WHERE status = 'sold'),
         'pending_products', COUNT(*) FILTER (WHERE status = 'pending'),
         'expired_products', COUNT(*) FILTER (WHERE status = 'expired'),
+        'total_revenue', COALESCE(SUM(product_revenue(price_per_kg_inr, quantity_kg, product_info))
+                                  FILTER (WHERE status = 'sold'), 0),
         'sold_percentage', CASE 
             WHEN COUNT(*) > 0 THEN 
                 ROUND((COUNT(*) FILTER (WHERE status = 'sold')::DECIMAL / COUNT(*) * 100), 2)
@@ -121,6 +169,177 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- Per-farmer counters kept current by trigger, so dashboards read one row
+-- instead of aggregating every product
+CREATE TABLE IF NOT EXISTS farmer_product_stats (
+    farmer_mobile VARCHAR(15) PRIMARY KEY,
+    total_products INTEGER NOT NULL DEFAULT 0,
+    sold_products INTEGER NOT NULL DEFAULT 0,
+    pending_products INTEGER NOT NULL DEFAULT 0,
+    expired_products INTEGER NOT NULL DEFAULT 0,
+    total_revenue NUMERIC NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+ALTER TABLE farmer_product_stats ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Farmers can view their own stats" ON farmer_product_stats
+    FOR SELECT USING (farmer_mobile = (
+        SELECT phone FROM farmers WHERE id = auth.uid()::uuid
+    ));
+
+-- Add (sign = 1) or remove (sign = -1) one product from a farmer's counters
+CREATE OR REPLACE FUNCTION apply_farmer_stats_delta(phone VARCHAR, row_status product_status,
+                                                    revenue NUMERIC, sign INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO farmer_product_stats AS s
+        (farmer_mobile, total_products, sold_products, pending_products, expired_products, total_revenue)
+    VALUES (
+        phone,
+        sign,
+        CASE WHEN row_status = 'sold' THEN sign ELSE 0 END,
+        CASE WHEN row_status = 'pending' THEN sign ELSE 0 END,
+        CASE WHEN row_status = 'expired' THEN sign ELSE 0 END,
+        CASE WHEN row_status = 'sold' THEN sign * COALESCE(revenue, 0) ELSE 0 END
+    )
+    ON CONFLICT (farmer_mobile) DO UPDATE SET
+        total_products = s.total_products + EXCLUDED.total_products,
+        sold_products = s.sold_products + EXCLUDED.sold_products,
+        pending_products = s.pending_products + EXCLUDED.pending_products,
+        expired_products = s.expired_products + EXCLUDED.expired_products,
+        total_revenue = s.total_revenue + EXCLUDED.total_revenue,
+        updated_at = NOW();
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE OR REPLACE FUNCTION maintain_farmer_stats()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM apply_farmer_stats_delta(OLD.farmer_mobile, OLD.status,
+                                         product_revenue(OLD.price_per_kg_inr, OLD.quantity_kg, OLD.product_info), -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM apply_farmer_stats_delta(NEW.farmer_mobile, NEW.status,
+                                         product_revenue(NEW.price_per_kg_inr, NEW.quantity_kg, NEW.product_info), 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+CREATE TRIGGER maintain_farmer_product_stats
+    AFTER INSERT OR DELETE OR UPDATE OF status, farmer_mobile, product_info, quantity_kg, price_per_kg_inr ON products
+    FOR EACH ROW EXECUTE FUNCTION maintain_farmer_stats();
+
+-- Recompute counters from the products table and fix any drift.
+-- Uses the same aggregation as get_product_statistics; returns rows corrected.
+CREATE OR REPLACE FUNCTION reconcile_farmer_stats(farmer_phone VARCHAR DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    corrected INTEGER;
+BEGIN
+    WITH actual AS (
+        SELECT
+            farmer_mobile,
+            COUNT(*) AS total_products,
+            COUNT(*) FILTER (WHERE status = 'sold') AS sold_products,
+            COUNT(*) FILTER (WHERE status = 'pending') AS pending_products,
+            COUNT(*) FILTER (WHERE status = 'expired') AS expired_products,
+            COALESCE(SUM(product_revenue(price_per_kg_inr, quantity_kg, product_info))
+                     FILTER (WHERE status = 'sold'), 0) AS total_revenue
+        FROM products
+        WHERE farmer_phone IS NULL OR farmer_mobile = farmer_phone
+        GROUP BY farmer_mobile
+    ), fixed AS (
+        INSERT INTO farmer_product_stats AS s
+            (farmer_mobile, total_products, sold_products, pending_products, expired_products, total_revenue)
+        SELECT * FROM actual
+        ON CONFLICT (farmer_mobile) DO UPDATE SET
+            total_products = EXCLUDED.total_products,
+            sold_products = EXCLUDED.sold_products,
+            pending_products = EXCLUDED.pending_products,
+            expired_products = EXCLUDED.expired_products,
+            total_revenue = EXCLUDED.total_revenue,
+            updated_at = NOW()
+        WHERE (s.total_products, s.sold_products, s.pending_products, s.expired_products, s.total_revenue)
+            IS DISTINCT FROM (EXCLUDED.total_products, EXCLUDED.sold_products, EXCLUDED.pending_products,
+                              EXCLUDED.expired_products, EXCLUDED.total_revenue)
+        RETURNING 1
+    )
+    SELECT COUNT(*) INTO corrected FROM fixed;
+
+    DELETE FROM farmer_product_stats s
+    WHERE (farmer_phone IS NULL OR s.farmer_mobile = farmer_phone)
+    AND NOT EXISTS (SELECT 1 FROM products p WHERE p.farmer_mobile = s.farmer_mobile);
+
+    RETURN corrected;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- A full-table aggregate; only the backend's service_role runs it
+REVOKE EXECUTE ON FUNCTION reconcile_farmer_stats(VARCHAR) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION reconcile_farmer_stats(VARCHAR) TO service_role;
+
+-- Catalog search indexes (product_info_json also unwraps ai_suggestions)
+CREATE INDEX IF NOT EXISTS idx_products_name_trgm ON products
+    USING GIN ((product_info_json(product_info)->>'product') gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_products_description_trgm ON products
+    USING GIN ((product_info_json(ai_suggestions)->>'description') gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_products_info_gin ON products
+    USING GIN (product_info_json(product_info) jsonb_path_ops);
+CREATE INDEX IF NOT EXISTS idx_products_catalog ON products(status, language, created_at DESC);
+
+-- Cross-farmer catalog search for buyers. Runs as definer so listings are
+-- visible beyond the per-farmer RLS policies, which is why it returns only
+-- the catalog columns and only the backend's service_role may call it;
+-- anon clients would otherwise read every farmer's rows. search_terms are the query's
+-- tokens (utils.catalog_index.tokenize); every one must appear in the name
+-- or description, the same rule as the backend's in-memory index. The
+-- trigram indexes above serve these ILIKE patterns.
+DROP FUNCTION IF EXISTS search_products(TEXT, VARCHAR, VARCHAR, NUMERIC, NUMERIC, TIMESTAMP WITH TIME ZONE, INTEGER);
+DROP FUNCTION IF EXISTS search_products(TEXT[], VARCHAR, VARCHAR, NUMERIC, NUMERIC, TIMESTAMP WITH TIME ZONE, INTEGER);
+CREATE OR REPLACE FUNCTION search_products(
+    search_terms TEXT[] DEFAULT NULL,
+    search_language VARCHAR DEFAULT NULL,
+    search_status VARCHAR DEFAULT 'pending',
+    min_price NUMERIC DEFAULT NULL,
+    max_price NUMERIC DEFAULT NULL,
+    created_after TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+    result_limit INTEGER DEFAULT 20
+)
+RETURNS TABLE (
+    id UUID,
+    farmer_mobile VARCHAR,
+    product_info JSONB,
+    ai_suggestions JSONB,
+    language VARCHAR,
+    status product_status,
+    quantity_kg NUMERIC,
+    price_per_kg_inr NUMERIC,
+    created_at TIMESTAMP WITH TIME ZONE
+) AS $$
+    SELECT p.id, p.farmer_mobile, p.product_info, p.ai_suggestions, p.language, p.status,
+           p.quantity_kg, p.price_per_kg_inr, p.created_at
+    FROM products p
+    WHERE NOT EXISTS (
+        SELECT 1 FROM unnest(COALESCE(search_terms, '{}')) AS term
+        WHERE NOT (COALESCE(product_info_json(p.product_info)->>'product', '') ILIKE '%' || term || '%'
+                   OR COALESCE(product_info_json(p.ai_suggestions)->>'description', '') ILIKE '%' || term || '%'))
+    AND (search_language IS NULL OR p.language = search_language)
+    AND (search_status IS NULL OR p.status::TEXT = search_status)
+    AND (min_price IS NULL OR p.price_per_kg_inr >= min_price)
+    AND (max_price IS NULL OR p.price_per_kg_inr <= max_price)
+    AND (created_after IS NULL OR p.created_at >= created_after)
+    ORDER BY p.created_at DESC
+    LIMIT LEAST(GREATEST(result_limit, 1), 100);
+$$ LANGUAGE sql STABLE SECURITY DEFINER;
+
+REVOKE EXECUTE ON FUNCTION search_products(TEXT[], VARCHAR, VARCHAR, NUMERIC, NUMERIC, TIMESTAMP WITH TIME ZONE, INTEGER)
+    FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION search_products(TEXT[], VARCHAR, VARCHAR, NUMERIC, NUMERIC, TIMESTAMP WITH TIME ZONE, INTEGER)
+    TO service_role;
+
 -- Function to get unsold products older than specified days
 CREATE OR REPLACE FUNCTION get_unsold_products_older_than(days INTEGER)
 RETURNS TABLE (
@@ -140,6 +359,71 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- Function to update the status of many products in one statement
+-- Expects a JSON array of {"product_id": UUID, "status": TEXT} objects
+CREATE OR REPLACE FUNCTION bulk_update_product_status(updates JSONB)
+RETURNS TABLE (
+    product_id UUID,
+    new_status product_status
+) AS $$
+BEGIN
+    RETURN QUERY
+    UPDATE products p
+    SET status = u.status::product_status
+    FROM jsonb_to_recordset(updates) AS u(product_id UUID, status TEXT)
+    WHERE p.id = u.product_id
+    RETURNING p.id, p.status;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function to write normalized quantity/price columns for many products
+-- Expects a JSON array of {"product_id", "quantity_kg", "price_per_kg_inr"} objects
+CREATE OR REPLACE FUNCTION bulk_update_product_normalization(updates JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    updated INTEGER;
+BEGIN
+    UPDATE products p
+    SET quantity_kg = u.quantity_kg, price_per_kg_inr = u.price_per_kg_inr
+    FROM jsonb_to_recordset(updates) AS u(product_id UUID, quantity_kg NUMERIC, price_per_kg_inr NUMERIC)
+    WHERE p.id = u.product_id;
+
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    RETURN updated;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Leases that let one server worker (on any host) own a periodic job.
+-- A holder keeps its lease by re-acquiring it before expires_at.
+CREATE TABLE IF NOT EXISTS scheduler_leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+ALTER TABLE scheduler_leases ENABLE ROW LEVEL SECURITY;
+
+-- Take or renew a lease; returns TRUE when lease_holder now holds it
+CREATE OR REPLACE FUNCTION try_acquire_lease(lease_name TEXT, lease_holder TEXT, ttl_seconds INTEGER)
+RETURNS BOOLEAN AS $$
+DECLARE
+    acquired BOOLEAN;
+BEGIN
+    INSERT INTO scheduler_leases (name, holder, expires_at)
+    VALUES (lease_name, lease_holder, NOW() + make_interval(secs => ttl_seconds))
+    ON CONFLICT (name) DO UPDATE
+        SET holder = EXCLUDED.holder, expires_at = EXCLUDED.expires_at
+        WHERE scheduler_leases.expires_at < NOW() OR scheduler_leases.holder = EXCLUDED.holder
+    RETURNING TRUE INTO acquired;
+
+    RETURN COALESCE(acquired, FALSE);
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- Any client that could call this could hold a lease forever and stop the job
+REVOKE EXECUTE ON FUNCTION try_acquire_lease(TEXT, TEXT, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION try_acquire_lease(TEXT, TEXT, INTEGER) TO service_role;
+
 -- Views for easier querying
 CREATE VIEW product_summary AS
 SELECT 
@@ -148,6 +432,8 @@ SELECT
     p.product_info->>'product' as product_name,
     p.product_info->>'quantity' as quantity,
     p.product_info->>'price' as price,
+    p.quantity_kg,
+    p.price_per_kg_inr,
     p.ai_suggestions->>'description' as description,
     p.ai_suggestions->>'price_range' as suggested_price_range,
     p.status,
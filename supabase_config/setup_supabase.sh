@@ -74,6 +74,7 @@ cat > ../backend/.env << EOF
 GEMINI_API_KEY=your_gemini_api_key_here
 SUPABASE_URL=$PROJECT_URL
 SUPABASE_ANON_KEY=$ANON_KEY
+SUPABASE_SERVICE_ROLE_KEY=your_supabase_service_role_key_here
 HOST=0.0.0.0
 PORT=8000
 DEBUG=True
@@ -84,7 +85,7 @@ echo ""
 echo "🎉 Supabase setup completed!"
 echo ""
 echo "📝 Next steps:"
-echo "1. Add your Gemini API key to backend/.env"
+echo "1. Add your Gemini API key and service_role key (Project Settings > API) to backend/.env"
 echo "2. Start the backend server: cd backend && python start_server.py"
 echo "3. Start the frontend: cd frontend && python -m http.server 3000"
 echo ""